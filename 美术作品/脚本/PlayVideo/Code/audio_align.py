@@ -0,0 +1,158 @@
+import json
+import os
+from PySide6.QtCore import QThread, Signal
+
+from Code.media_cache import cache_dir, content_key, enforce_size_cap, temp_path, touch
+
+# PyAV和NumPy都是可选依赖，缺失时自动对齐不可用
+try:
+    import av
+except ImportError:
+    av = None
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 对齐只需要包络级别的信息，降采样到4kHz单声道
+ALIGN_SAMPLE_RATE = 4000
+# 只取开头一段音频，长视频也能在一秒内算完
+ALIGN_MAX_SECONDS = 180
+# 低于该电平（满幅为1）视为无声，无法对齐
+ALIGN_SILENCE_LEVEL = 1e-4
+# 互相关置信度低于该值时结果不太可靠
+ALIGN_MIN_CONFIDENCE = 5.0
+ALIGN_CACHE_VERSION = 1
+ALIGN_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+
+def alignment_available():
+    """是否安装了PyAV和NumPy"""
+    return av is not None and np is not None
+
+
+def decode_audio(file_path, sample_rate=ALIGN_SAMPLE_RATE, max_seconds=ALIGN_MAX_SECONDS):
+    """解码视频的音轨为单声道float32数组，max_seconds为None时解码整条音轨；没有音轨时抛出ValueError"""
+    container = av.open(str(file_path))
+    try:
+        if not container.streams.audio:
+            raise ValueError("视频没有音轨")
+        stream = container.streams.audio[0]
+        stream.thread_type = "AUTO"
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=sample_rate)
+        limit = int(sample_rate * max_seconds) if max_seconds else None
+        chunks = []
+        total = 0
+        for frame in container.decode(stream):
+            for resampled in resampler.resample(frame):
+                chunk = resampled.to_ndarray().reshape(-1)
+                chunks.append(chunk)
+                total += len(chunk)
+            if limit is not None and total >= limit:
+                break
+        for resampled in resampler.resample(None):
+            chunks.append(resampled.to_ndarray().reshape(-1))
+    finally:
+        container.close()
+    if not chunks:
+        raise ValueError("音轨中没有数据")
+    return np.concatenate(chunks)[:limit].astype(np.float32, copy=False)
+
+
+def decode_audible(file_path):
+    """解码用于对齐的音频，音轨无声时抛出ValueError"""
+    samples = decode_audio(file_path)
+    if samples.std() < ALIGN_SILENCE_LEVEL:
+        raise ValueError(f"{os.path.basename(str(file_path))} 的音轨没有声音，无法按音频对齐")
+    return samples
+
+
+def estimate_offset(reference, other, sample_rate=ALIGN_SAMPLE_RATE):
+    """用FFT互相关估计other相对reference的时间偏移
+
+    返回 (偏移毫秒, 置信度)：同一声音在other中出现的时间减去在reference中出现的时间；
+    置信度为相关峰值与相关序列标准差之比，低于ALIGN_MIN_CONFIDENCE时结果不太可靠。
+    """
+    a = reference - reference.mean()
+    b = other - other.mean()
+    size = 1 << int(len(a) + len(b) - 1).bit_length()
+    spectrum = np.conj(np.fft.rfft(a, size)) * np.fft.rfft(b, size)
+    corr = np.fft.irfft(spectrum, size)
+    peak = int(np.argmax(np.abs(corr)))
+    lag = peak if peak < size // 2 else peak - size
+    confidence = float(np.abs(corr[peak]) / (corr.std() + 1e-12))
+    return lag * 1000.0 / sample_rate, confidence
+
+
+def _cache_path(reference_key, other_key):
+    return cache_dir("align") / f"{reference_key}_{other_key}.json"
+
+
+def load_cached_offset(reference_key, other_key):
+    """读取缓存的对齐结果，没有时返回None"""
+    path = _cache_path(reference_key, other_key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != ALIGN_CACHE_VERSION:
+        return None
+    touch(path)
+    return data["offset_ms"], data["confidence"]
+
+
+def save_cached_offset(reference_key, other_key, offset_ms, confidence):
+    directory = cache_dir("align")
+    path = _cache_path(reference_key, other_key)
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": ALIGN_CACHE_VERSION, "offset_ms": offset_ms, "confidence": confidence}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    enforce_size_cap(directory, ALIGN_CACHE_MAX_BYTES, keep=(path,))
+
+
+class AudioAligner(QThread):
+    """后台线程：按音频把若干视频对齐到第一个（参考）视频
+
+    结果按两个文件的内容哈希缓存，同一对文件第二次对齐不再解码。
+    """
+
+    alignReady = Signal(object)  # {文件路径: (偏移毫秒, 置信度)}，参考视频偏移为0
+    alignFailed = Signal(str)
+
+    def __init__(self, reference_path, other_paths, parent=None):
+        super().__init__(parent)
+        self.reference_path = str(reference_path)
+        self.other_paths = [str(p) for p in other_paths]
+
+    def run(self):
+        try:
+            results = {self.reference_path: (0.0, float("inf"))}
+            reference_key = content_key(self.reference_path)
+            reference_audio = None
+            for path in self.other_paths:
+                if path == self.reference_path:
+                    continue
+                other_key = content_key(path)
+                cached = load_cached_offset(reference_key, other_key)
+                if cached is None:
+                    if reference_audio is None:
+                        reference_audio = decode_audible(self.reference_path)
+                    offset_ms, confidence = estimate_offset(reference_audio, decode_audible(path))
+                    try:
+                        save_cached_offset(reference_key, other_key, offset_ms, confidence)
+                    except OSError as e:
+                        print(f"无法保存对齐结果: {e}")
+                    cached = offset_ms, confidence
+                results[path] = cached
+            self.alignReady.emit(results)
+        except Exception as e:
+            self.alignFailed.emit(str(e))
@@ -1,11 +1,126 @@
+import importlib.util
 import os
-import sys
+import shutil
+import subprocess
+import time
 from pathlib import Path
-from typing import Optional
-from PySide6.QtCore import QFile,Qt
+from PySide6.QtCore import QFile, QMetaMethod
 from PySide6.QtUiTools import QUiLoader
 from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout
 
+from Code.media_cache import cache_dir
+
+
+def find_uic():
+    """PySide6自带的uic，找不到时返回None"""
+    try:
+        import PySide6
+    except ImportError:
+        return None
+    root = Path(PySide6.__file__).parent
+    for candidate in ("uic.exe", "uic", "Qt/libexec/uic", "Qt/bin/uic"):
+        path = root / candidate
+        if path.is_file():
+            return str(path)
+    return shutil.which("pyside6-uic")
+
+
+def compiled_ui_path(ui_file_path):
+    """把.ui编译成Python模块并缓存，返回模块路径；编译失败时返回None
+
+    缓存文件名带有.ui的修改时间和大小，.ui改动后自动重新编译，旧的编译结果随之删除。
+    """
+    stat = os.stat(ui_file_path)
+    stem = Path(ui_file_path).stem
+    directory = cache_dir("ui")
+    target = directory / f"{stem}_{stat.st_mtime_ns}_{stat.st_size}.py"
+    if target.is_file():
+        return target
+
+    uic = find_uic()
+    if uic is None:
+        return None
+    tmp_path = target.with_suffix(".tmp")
+    command = [uic, "-o", str(tmp_path), str(ui_file_path)]
+    if Path(uic).stem != "pyside6-uic":
+        command[1:1] = ["-g", "python"]
+    try:
+        subprocess.run(command, check=True, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.PIPE, timeout=30,
+                       creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+        os.replace(tmp_path, target)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"编译UI文件失败，改用QUiLoader: {e}")
+        return None
+    for old in directory.glob(f"{stem}_*.py"):
+        if old != target:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+    return target
+
+
+def load_ui_class(ui_file_path):
+    """导入编译好的UI模块，返回其中的Ui_类；不可用时返回None"""
+    try:
+        path = compiled_ui_path(ui_file_path)
+        if path is None:
+            return None
+        spec = importlib.util.spec_from_file_location(f"_ui_{path.stem}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        for name, value in vars(module).items():
+            if name.startswith("Ui_") and isinstance(value, type):
+                return value
+    except Exception as e:
+        print(f"加载编译后的UI失败，改用QUiLoader: {e}")
+    return None
+
+
+def record_startup(name, phases, warm):
+    """把启动耗时追加到缓存目录的startup/<name>.log，便于对比冷启动和热启动
+
+    phases为[(阶段名, 毫秒)]；warm表示本进程之前已经导入过这些模块（在Max里再次运行脚本）。
+    """
+    text = " ".join(f"{phase}={ms:.0f}ms" for phase, ms in phases)
+    try:
+        with open(cache_dir("startup") / f"{name}.log", "a", encoding="utf-8") as f:
+            f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')}\t{'warm' if warm else 'cold'}\t{text}\n")
+    except OSError as e:
+        print(f"写入启动耗时记录失败: {e}")
+
+
+def find_live_window(object_name):
+    """本进程里仍然打开着的、objectName为object_name的顶层窗口
+
+    Max里每次运行脚本都会重新定义窗口类，按类型找不到上一次的实例，所以按objectName查找。
+    """
+    app = QApplication.instance()
+    if app is None:
+        return None
+    for widget in app.topLevelWidgets():
+        if widget.objectName() == object_name and widget.isVisible():
+            return widget
+    return None
+
+
+def detach_thread(thread):
+    """让还在运行的后台线程脱离窗口，运行结束后自行释放，调用方不必等待
+
+    断开它的全部信号（结果不再送回即将删除的窗口），改由QApplication持有，
+    窗口删除时不会连带销毁仍在运行的QThread。
+    """
+    meta = thread.metaObject()
+    for i in range(meta.methodCount()):
+        method = meta.method(i)
+        if method.methodType() == QMetaMethod.Signal and thread.isSignalConnected(method):
+            getattr(thread, bytes(method.name()).decode()).disconnect()
+    thread.setParent(QApplication.instance())
+    thread.finished.connect(thread.deleteLater)
+    if thread.isFinished():
+        # 断开连接期间刚好结束，finished已经错过
+        thread.deleteLater()
 
 
 class MainWindow(QWidget):
@@ -18,6 +133,7 @@ class MainWindow(QWidget):
         self.script_path =""
         self.script_name =""
         self.ui = None
+        self.ui_load_ms = 0.0  # 加载UI的耗时，用于启动耗时记录
 
         # 查找并加载UI文件
         # self.load_ui()
@@ -34,6 +150,20 @@ class MainWindow(QWidget):
         if not os.path.exists(ui_file_path):
             raise FileNotFoundError(f"UI文件未找到: {ui_file_path}")
 
+        start = time.perf_counter()
+        # 优先使用编译好的UI模块，省去每次启动时解析XML
+        form_class = load_ui_class(ui_file_path)
+        if form_class is not None:
+            self.ui = QWidget(self)
+            form = form_class()
+            form.setupUi(self.ui)
+            # 与QUiLoader一致，控件和布局都能按objectName从self.ui上取到
+            for name, value in vars(form).items():
+                setattr(self.ui, name, value)
+            self._add_ui_widget()
+            self.ui_load_ms = (time.perf_counter() - start) * 1000
+            return
+
         # 加载UI文件
         loader = QUiLoader()
         ui_file = QFile(str(ui_file_path))
@@ -45,15 +175,17 @@ class MainWindow(QWidget):
             self.ui = loader.load(ui_file, self)
             # self.ui.setWindowFlags(Qt.WindowStaysOnTopHint)
             self.ui.setParent(self)
-
-            # 创建布局并添加UI组件
-            layout = QVBoxLayout(self)
-            layout.setContentsMargins(0, 0, 0, 0)
-            layout.addWidget(self.ui)
-            self.setLayout(layout)
-
+            self._add_ui_widget()
         finally:
             ui_file.close()
+        self.ui_load_ms = (time.perf_counter() - start) * 1000
+
+    def _add_ui_widget(self):
+        """创建布局并添加UI组件"""
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.ui)
+        self.setLayout(layout)
 
 
 # def main() -> None:
@@ -0,0 +1,251 @@
+import math
+import os
+import secrets
+import struct
+import subprocess
+import sys
+import threading
+from multiprocessing import connection, shared_memory
+from pathlib import Path
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtGui import QImage
+
+from Code.media_cache import cache_root
+
+# 共享内存中每个帧槽的头：(序号, 帧序号, 宽, 高, 行字节数, 时间毫秒)
+SLOT_HEADER = struct.Struct("<QiIIIi")
+SLOT_HEADER_BYTES = 64
+SLOT_COUNT = 4
+# 槽位按540p RGB888分配，足够放下解码器缩小后的帧
+SLOT_FRAME_BYTES = 960 * 540 * 3 * 2
+
+WORKER_SCRIPT = Path(__file__).with_name("engine_worker.py")
+
+
+def find_python():
+    """找到可以启动子进程的python可执行文件
+
+    在3ds Max里sys.executable是3dsmax.exe，真正的python.exe在Max安装目录的Python文件夹下。
+    """
+    executable = Path(sys.executable)
+    candidates = [
+        executable.parent / "Python" / "python.exe",
+        Path(sys.prefix) / "python.exe",
+        Path(sys.prefix) / "bin" / "python3",
+        Path(getattr(sys, "_base_executable", "") or executable),
+        executable,
+    ]
+    for candidate in candidates:
+        if candidate.name.lower().startswith("python") and candidate.is_file():
+            return str(candidate)
+    return None
+
+
+def child_environment():
+    """子进程环境：把宿主程序目录加进PATH，使子进程能找到Max自带的Qt动态库"""
+    env = dict(os.environ)
+    env["PATH"] = str(Path(sys.executable).parent) + os.pathsep + env.get("PATH", "")
+    return env
+
+
+def slot_offset(slot):
+    return slot * (SLOT_HEADER_BYTES + SLOT_FRAME_BYTES)
+
+
+def shared_memory_size():
+    return slot_offset(SLOT_COUNT)
+
+
+def slot_height(width, height):
+    """保持宽高比、画面能放进一个帧槽（RGB888，每行按4字节对齐）的最大高度"""
+    frame_bytes = max(1, (width * 3 + 3) // 4 * 4 * height)
+    scale = min(1.0, math.sqrt(SLOT_FRAME_BYTES / frame_bytes))
+    return max(2, int(height * scale) // 2 * 2)
+
+
+def _shutdown(process, reader, resources, shm):
+    """后台线程：等子进程退出（超时则强制结束）后释放管道和共享内存，不阻塞Max的UI线程"""
+    if process is not None:
+        try:
+            process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    if reader is not None:
+        # 子进程退出后管道断开，读取线程随之结束，之后才能释放它正在读的共享内存
+        reader.join(timeout=1)
+    for resource in resources:
+        if resource is not None:
+            try:
+                resource.close()
+            except OSError:
+                pass
+    if shm is not None:
+        try:
+            shm.close()
+            shm.unlink()
+        except (OSError, BufferError) as e:
+            print(f"释放独立解码进程的共享内存失败: {e}")
+
+
+class EngineClient(QObject):
+    """独立解码进程的客户端（在Max进程中运行）
+
+    解码、帧缓存和播放时钟都在子进程里；控制消息走本地管道（Windows命名管道/Unix套接字），
+    画面通过共享内存中的环形帧槽传回，Max的UI线程只做一次内存拷贝。
+    """
+
+    frameReady = Signal(int, int, QImage)  # (帧序号, 时间毫秒, 画面)
+    opened = Signal(dict)  # 视频信息：fps、frame_count、duration_ms、width、height
+    ended = Signal()
+    failed = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._process = None
+        self._listener = None
+        self._conn = None
+        self._shm = None
+        self._reader = None
+        self._send_lock = threading.Lock()
+        self._connected = threading.Event()
+        self._queued = []  # 子进程连接之前发出的消息，连接后按顺序补发
+        self._closing = False
+        self.playing = False
+
+    def start(self):
+        """创建共享内存和管道并启动子进程，失败时返回False"""
+        python = find_python()
+        if python is None:
+            print("找不到python.exe，无法启动独立解码进程")
+            return False
+
+        authkey = secrets.token_bytes(16)
+        family = "AF_PIPE" if sys.platform == "win32" else "AF_UNIX"
+        try:
+            self._shm = shared_memory.SharedMemory(create=True, size=shared_memory_size())
+            self._listener = connection.Listener(family=family, authkey=authkey)
+            log = open(cache_root() / "engine.log", "ab")
+            flags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+            self._process = subprocess.Popen(
+                [python, str(WORKER_SCRIPT),
+                 "--address", str(self._listener.address),
+                 "--family", family,
+                 "--authkey", authkey.hex(),
+                 "--shm", self._shm.name],
+                stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                env=child_environment(), creationflags=flags)
+            log.close()
+        except Exception as e:
+            print(f"启动独立解码进程失败: {e}")
+            self.stop()
+            return False
+
+        self._reader = threading.Thread(target=self._read_loop, name="PlayVideoEngineReader", daemon=True)
+        self._reader.start()
+        return True
+
+    def _read_loop(self):
+        """后台线程：等待子进程连接，之后接收消息"""
+        try:
+            conn = self._listener.accept()
+            with self._send_lock:
+                for message in self._queued:
+                    conn.send(message)
+                self._queued = []
+                self._conn = conn
+                self._connected.set()
+            while not self._closing:
+                message = conn.recv()
+                if self._closing:
+                    break
+                self._handle(message)
+        except (EOFError, OSError) as e:
+            if not self._closing:
+                self.failed.emit(f"独立解码进程已断开: {e}")
+        except Exception as e:
+            if not self._closing:
+                self.failed.emit(str(e))
+
+    def _handle(self, message):
+        event = message.get("event")
+        if event == "frame":
+            image = self._read_slot(message["slot"], message["seq"])
+            if image is not None:
+                self.frameReady.emit(message["index"], message["ms"], image)
+        elif event == "opened":
+            self.opened.emit(message)
+        elif event == "ended":
+            self.playing = False
+            self.ended.emit()
+        elif event == "error":
+            self.failed.emit(message.get("message", ""))
+
+    def _read_slot(self, slot, seq):
+        """从共享内存拷出一帧；读取期间被子进程覆盖时丢弃"""
+        offset = slot_offset(slot)
+        buf = self._shm.buf
+        header = SLOT_HEADER.unpack_from(buf, offset)
+        if header[0] != seq:
+            return None
+        width, height, stride = header[2], header[3], header[4]
+        start = offset + SLOT_HEADER_BYTES
+        data = bytes(buf[start:start + stride * height])
+        if SLOT_HEADER.unpack_from(buf, offset)[0] != seq:
+            return None
+        return QImage(data, width, height, stride, QImage.Format_RGB888).copy()
+
+    def send(self, command, **kwargs):
+        """发送控制消息；子进程尚未连接时先排队，连接后由读取线程补发，不阻塞UI线程"""
+        if self._closing:
+            return False
+        kwargs["cmd"] = command
+        try:
+            with self._send_lock:
+                if self._connected.is_set():
+                    self._conn.send(kwargs)
+                else:
+                    self._queued.append(kwargs)
+            return True
+        except (OSError, ValueError) as e:
+            print(f"发送消息到独立解码进程失败: {e}")
+            return False
+
+    # ========== 控制接口 ==========
+
+    def open(self, file_path, decode_path=None, use_index=True):
+        """打开视频；decode_path为代理文件时从代理解码"""
+        self.playing = False
+        return self.send("open", path=str(file_path), decode_path=str(decode_path or file_path),
+                         use_index=use_index)
+
+    def show(self, index):
+        """显示指定帧（暂停状态下拖动/逐帧）"""
+        self.playing = False
+        return self.send("show", index=int(index))
+
+    def play(self, position_ms, rate=1.0):
+        """从position_ms开始由子进程的时钟驱动播放，rate为负数时倒放"""
+        self.playing = True
+        return self.send("play", position_ms=int(position_ms), rate=float(rate))
+
+    def pause(self):
+        self.playing = False
+        return self.send("pause")
+
+    def stop(self):
+        """通知子进程退出；等待退出和释放资源交给后台线程，立即返回"""
+        if self._closing:
+            return
+        if self._connected.is_set():
+            self.send("quit")
+        self._closing = True
+        with self._send_lock:
+            self._queued = []
+        threading.Thread(target=_shutdown, name="PlayVideoEngineShutdown", daemon=True,
+                         args=(self._process, self._reader, (self._conn, self._listener), self._shm)).start()
+        self._process = None
+        self._reader = None
+        self._conn = None
+        self._listener = None
+        self._shm = None
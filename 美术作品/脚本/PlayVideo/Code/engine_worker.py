@@ -0,0 +1,198 @@
+"""PlayVideo 独立解码进程，由 Code/engine_process.py 的 EngineClient 启动，不要直接运行"""
+import argparse
+import sys
+import time
+from multiprocessing import connection, shared_memory
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Code.engine_process import SLOT_COUNT, SLOT_FRAME_BYTES, SLOT_HEADER, SLOT_HEADER_BYTES, slot_height, slot_offset
+from Code.frame_cache import FrameCache
+from Code.frame_index import FrameIndex
+from Code.frame_prefetcher import FramePrefetcher
+from Code.frame_store import FrameStore
+from Code.proxy_builder import proxy_index
+from Code.video_decoder import VideoDecoder
+
+# 没有消息时主循环的轮询间隔（秒）
+POLL_INTERVAL = 0.002
+
+
+class Engine:
+    """子进程中的解码引擎：帧缓存、后台预取和播放时钟"""
+
+    def __init__(self, conn, shm):
+        self.conn = conn
+        self.shm = shm
+        self.decoder = None
+        self.cache = FrameCache()
+        self.store = None
+        self.prefetcher = None
+        self._seq = 0
+        self._wanted = -1  # 等待显示的帧
+        self._published = -1  # 最近一次送出的帧
+        self.playing = False
+        self._clock_start = 0.0
+        self._clock_base_ms = 0
+        self._rate = 1.0
+
+    # ========== 消息处理 ==========
+
+    def handle(self, message):
+        """处理一条控制消息，返回False表示退出"""
+        command = message.get("cmd")
+        if command == "open":
+            self.open(message["path"], message["decode_path"], message.get("use_index", True))
+        elif command == "show":
+            self.playing = False
+            self.request(message["index"])
+        elif command == "play":
+            self.play(message["position_ms"], message.get("rate", 1.0))
+        elif command == "pause":
+            self.playing = False
+        elif command == "quit":
+            return False
+        return True
+
+    def open(self, path, decode_path, use_index):
+        self.close()
+        try:
+            if not use_index:
+                index = None
+            elif decode_path == path:
+                index = FrameIndex.load_or_build(path)
+            else:
+                # 代理保留源时间戳，用代理自己的帧索引定位
+                index = proxy_index(decode_path)
+            decoder = VideoDecoder(decode_path, frame_index=index)
+            height = slot_height(decoder.width, decoder.height)
+            if height < decoder.height:
+                # 很宽的画面缩到540p仍放不进共享内存的帧槽，换一个输出尺寸更小的解码器
+                decoder.close()
+                decoder = VideoDecoder(decode_path, max_height=height, frame_index=index)
+            self.conn.send({"event": "opened", "fps": decoder.fps, "frame_count": decoder.frame_count,
+                            "duration_ms": decoder.duration_ms, "width": decoder.width, "height": decoder.height})
+            try:
+                self.store = FrameStore.open(path, decoder.width, decoder.height, decoder.frame_count, decode_path)
+            except (OSError, ValueError):
+                self.store = None
+            self.decoder = decoder
+            self.prefetcher = FramePrefetcher(decoder, self.cache, store=self.store)
+            self.prefetcher.start()
+        except Exception as e:
+            self.conn.send({"event": "error", "message": f"打开视频失败: {e}"})
+
+    def close(self):
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+            self.prefetcher = None
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+        self.decoder = None
+        self.cache.clear()
+        self.playing = False
+        self._wanted = -1
+        self._published = -1
+
+    # ========== 取帧与播放时钟 ==========
+
+    def request(self, index):
+        """请求显示某一帧，缓存里有就立即送出，否则等后台解码"""
+        if self.prefetcher is None:
+            return
+        self._wanted = index
+        self.prefetcher.set_playhead(index)
+        self._publish_if_ready()
+
+    def play(self, position_ms, rate):
+        if self.decoder is None:
+            return
+        self.playing = True
+        self._rate = rate
+        self._clock_base_ms = position_ms
+        self._clock_start = time.perf_counter()
+        # 倒放时预取播放头之前的GOP
+        self.prefetcher.set_direction(-1 if rate < 0 else 1)
+
+    def clock_ms(self):
+        return self._clock_base_ms + (time.perf_counter() - self._clock_start) * 1000 * self._rate
+
+    def tick(self):
+        """主循环每次迭代调用：推进播放时钟并送出已就绪的帧"""
+        if self.playing and self.decoder is not None:
+            position_ms = self.clock_ms()
+            if position_ms < 0 or (self.decoder.duration_ms and position_ms >= self.decoder.duration_ms):
+                self.playing = False
+                self.conn.send({"event": "ended"})
+                return
+            index = self.decoder.ms_to_index(position_ms)
+            if index != self._wanted:
+                self._wanted = index
+                self.prefetcher.set_playhead(index)
+        self._publish_if_ready()
+
+    def _publish_if_ready(self):
+        if self._wanted < 0 or self._wanted == self._published:
+            return
+        image = self.cache.get(self._wanted)
+        if image is None:
+            return
+        self.publish(self._wanted, image)
+
+    def publish(self, index, image):
+        """把帧写入共享内存的下一个槽位并通知客户端"""
+        stride = image.bytesPerLine()
+        size = stride * image.height()
+        if size > SLOT_FRAME_BYTES:
+            # 打开时已按帧槽大小缩小，仍放不下时报告给客户端，不让它一直等这一帧
+            self._published = index
+            self.conn.send({"event": "error", "message": f"画面{image.width()}x{image.height()}超出共享内存帧槽大小"})
+            return
+        self._seq += 1
+        slot = self._seq % SLOT_COUNT
+        offset = slot_offset(slot)
+        buf = self.shm.buf
+        # 先把序号清零，客户端读到不一致的序号会丢弃这一帧
+        SLOT_HEADER.pack_into(buf, offset, 0, -1, 0, 0, 0, 0)
+        start = offset + SLOT_HEADER_BYTES
+        buf[start:start + size] = image.constBits()[:size]
+        ms = self.decoder.index_to_ms(index)
+        SLOT_HEADER.pack_into(buf, offset, self._seq, index, image.width(), image.height(), stride, ms)
+        self._published = index
+        self.conn.send({"event": "frame", "slot": slot, "seq": self._seq, "index": index, "ms": ms})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--address", required=True)
+    parser.add_argument("--family", required=True)
+    parser.add_argument("--authkey", required=True)
+    parser.add_argument("--shm", required=True)
+    args = parser.parse_args()
+
+    conn = connection.Client(args.address, family=args.family, authkey=bytes.fromhex(args.authkey))
+    shm = shared_memory.SharedMemory(name=args.shm)
+    if sys.platform != "win32":
+        # 共享内存归客户端所有，避免子进程退出时被resource_tracker删除
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    engine = Engine(conn, shm)
+    try:
+        running = True
+        while running:
+            # 先处理完积压的消息，拖动时连续的show请求只有最后一个生效
+            while running and conn.poll(POLL_INTERVAL if not engine.playing else 0.001):
+                running = engine.handle(conn.recv())
+            engine.tick()
+    except (EOFError, OSError):
+        pass
+    finally:
+        engine.close()
+        shm.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
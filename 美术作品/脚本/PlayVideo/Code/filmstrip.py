@@ -0,0 +1,174 @@
+import os
+from PySide6.QtCore import QRect, QThread, Signal
+from PySide6.QtGui import QColor, QImage, QPainter, QPen
+
+from Code.media_cache import cache_dir, content_key, temp_path, touch
+from Code.track_widget import SliderTrackWidget
+from Code.video_decoder import VideoDecoder
+
+# 缩略图高度与逐级细化的数量（每一级包含上一级的全部位置）
+THUMB_HEIGHT = 54
+THUMB_LEVELS = (8, 16, 32, 64)
+
+
+class FilmstripWorker(QThread):
+    """后台线程：逐级生成均匀分布的缩略图
+
+    先生成8张粗略的，再依次细化到64张；全部完成后把整条胶片拼成一张图保存到磁盘，
+    下次打开同一视频时直接读取。
+    """
+
+    thumbReady = Signal(float, QImage)  # (在视频中的相对位置0~1, 缩略图)
+
+    def __init__(self, file_path, decode_path=None, parent=None):
+        super().__init__(parent)
+        self.file_path = str(file_path)
+        self.decode_path = str(decode_path or file_path)  # 有代理时从代理解码，seek更快
+        self._cancelled = False
+
+    def cancel(self):
+        """只设置标志，不等待线程结束；调用方按sender丢弃取消后迟到的缩略图"""
+        self._cancelled = True
+
+    def _cache_path(self):
+        return cache_dir("thumbs") / f"{content_key(self.file_path)}_{THUMB_LEVELS[-1]}.png"
+
+    def run(self):
+        try:
+            cache_path = self._cache_path()
+            if cache_path.exists() and self._load_strip(cache_path):
+                touch(cache_path)
+                return
+
+            thumbs = self._generate()
+            if thumbs is None:
+                return
+            self._save_strip(cache_path, thumbs)
+        except Exception as e:
+            print(f"生成缩略图失败: {e}")
+
+    def _generate(self):
+        """逐级生成缩略图，被取消时返回None"""
+        decoder = VideoDecoder(self.decode_path, max_height=THUMB_HEIGHT)
+        try:
+            frame_count = max(1, decoder.frame_count)
+            count = THUMB_LEVELS[-1]
+            thumbs = [None] * count
+            for level in THUMB_LEVELS:
+                step = count // level
+                for slot in range(0, count, step):
+                    if thumbs[slot] is not None:
+                        continue
+                    if self._cancelled:
+                        return None
+                    position = slot / count
+                    image = decoder.decode(int(position * frame_count))
+                    if image is None:
+                        continue
+                    thumbs[slot] = image
+                    self.thumbReady.emit(position, image)
+            return thumbs
+        finally:
+            decoder.close()
+
+    def _load_strip(self, path):
+        """从磁盘读取拼好的胶片并拆成缩略图"""
+        strip = QImage(str(path))
+        count = THUMB_LEVELS[-1]
+        if strip.isNull() or strip.width() % count:
+            return False
+        width = strip.width() // count
+        for slot in range(count):
+            self.thumbReady.emit(slot / count, strip.copy(slot * width, 0, width, strip.height()))
+        return True
+
+    def _save_strip(self, path, thumbs):
+        """把全部缩略图横向拼接保存"""
+        valid = [image for image in thumbs if image is not None]
+        if len(valid) != len(thumbs):
+            return
+        width, height = valid[0].width(), valid[0].height()
+        strip = QImage(width * len(thumbs), height, QImage.Format_RGB888)
+        painter = QPainter(strip)
+        for slot, image in enumerate(thumbs):
+            painter.drawImage(QRect(slot * width, 0, width, height), image)
+        painter.end()
+        # 取消后旧线程可能还在保存，重新打开同一视频时各写各的临时文件
+        tmp_path = temp_path(path, ".png")
+        if strip.save(str(tmp_path), "PNG"):
+            os.replace(tmp_path, path)
+        elif tmp_path.exists():
+            tmp_path.unlink()
+
+
+class FilmstripWidget(SliderTrackWidget):
+    """滑块上方的缩略图胶片，标出当前播放位置，点击可跳转"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._thumbs = {}  # 相对位置 -> QImage
+        self._positions = []  # 已有缩略图的位置（有序）
+        self._playhead = -1.0
+        self._range = None  # 入出点区间 (开始, 结束)，相对位置0~1
+        self.setFixedHeight(40)
+
+    def clear(self):
+        self._thumbs.clear()
+        self._positions = []
+        self._playhead = -1.0
+        self.update()
+
+    def add_thumbnail(self, position, image):
+        self._thumbs[position] = image
+        self._positions = sorted(self._thumbs)
+        self.update()
+
+    def set_range(self, start, end):
+        """标出入出点区间，传入None清除"""
+        self._range = None if start is None or end is None else (start, end)
+        self.update()
+
+    def set_playhead(self, position):
+        """position为0~1的相对位置"""
+        self._playhead = position
+        self.update()
+
+    def _nearest(self, position):
+        """不超过position的最近一张缩略图"""
+        best = None
+        for p in self._positions:
+            if p > position:
+                break
+            best = p
+        if best is None and self._positions:
+            best = self._positions[0]
+        return self._thumbs.get(best)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        rect = self.contentsRect()
+        painter.fillRect(rect, QColor(60, 60, 60))
+        if self._positions:
+            sample = self._thumbs[self._positions[0]]
+            tile_width = max(8, int(rect.height() * sample.width() / max(1, sample.height())))
+            tiles = max(1, round(rect.width() / tile_width))
+            for i in range(tiles):
+                x0 = rect.left() + rect.width() * i // tiles
+                x1 = rect.left() + rect.width() * (i + 1) // tiles
+                image = self._nearest(i / tiles)
+                if image is not None:
+                    painter.drawImage(QRect(x0, rect.top(), x1 - x0, rect.height()), image)
+
+        if self._range is not None:
+            # 区间外压暗
+            x0 = rect.left() + int(self._range[0] * rect.width())
+            x1 = rect.left() + int(self._range[1] * rect.width())
+            shade = QColor(0, 0, 0, 150)
+            painter.fillRect(QRect(rect.left(), rect.top(), x0 - rect.left(), rect.height()), shade)
+            painter.fillRect(QRect(x1, rect.top(), rect.right() - x1 + 1, rect.height()), shade)
+
+        if 0.0 <= self._playhead <= 1.0:
+            x = rect.left() + int(self._playhead * rect.width())
+            painter.setPen(QPen(QColor(255, 200, 0), 2))
+            painter.drawLine(x, rect.top(), x, rect.bottom())
+        painter.end()
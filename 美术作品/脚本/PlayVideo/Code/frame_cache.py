@@ -0,0 +1,100 @@
+import threading
+from collections import OrderedDict
+
+
+class FrameCache:
+    """以播放头为中心的解码帧缓存（线程安全）
+
+    按帧序号保存QImage，总内存超过上限时按LRU淘汰，
+    优先淘汰播放头附近窗口之外的帧。
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024, keep_radius=60):
+        self.max_bytes = max_bytes
+        self.keep_radius = keep_radius  # 播放头前后受保护的帧数
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._center = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, index):
+        """取出一帧并标记为最近使用，不存在时返回None"""
+        with self._lock:
+            image = self._frames.get(index)
+            if image is None:
+                self.misses += 1
+                return None
+            self._frames.move_to_end(index)
+            self.hits += 1
+            return image
+
+    def peek(self, index):
+        """取出一帧但不影响LRU顺序和命中统计"""
+        with self._lock:
+            return self._frames.get(index)
+
+    def contains(self, index):
+        with self._lock:
+            return index in self._frames
+
+    def put(self, index, image):
+        """存入一帧，必要时淘汰旧帧"""
+        if image is None:
+            return
+        size = image.sizeInBytes()
+        with self._lock:
+            old = self._frames.pop(index, None)
+            if old is not None:
+                self._bytes -= old.sizeInBytes()
+            self._frames[index] = image
+            self._bytes += size
+            self._evict()
+
+    def _evict(self):
+        """淘汰到内存上限以内（调用方持有锁）"""
+        if self._bytes <= self.max_bytes:
+            return
+        lo = self._center - self.keep_radius
+        hi = self._center + self.keep_radius
+        # 先淘汰窗口外最久未用的帧
+        for index in list(self._frames):
+            if self._bytes <= self.max_bytes:
+                return
+            if lo <= index <= hi:
+                continue
+            self._bytes -= self._frames.pop(index).sizeInBytes()
+        # 窗口本身超出上限时，只能淘汰窗口内的帧
+        while self._bytes > self.max_bytes and len(self._frames) > 1:
+            index, image = self._frames.popitem(last=False)
+            self._bytes -= image.sizeInBytes()
+
+    def set_center(self, index):
+        """更新播放头位置"""
+        with self._lock:
+            self._center = index
+
+    def missing_in(self, start, end):
+        """返回[start, end]内第一个未缓存的帧序号，全部已缓存时返回None"""
+        with self._lock:
+            step = 1 if end >= start else -1
+            for index in range(start, end + step, step):
+                if index not in self._frames:
+                    return index
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def nbytes(self):
+        """当前占用的内存字节数"""
+        return self._bytes
+
+    def __len__(self):
+        return len(self._frames)
@@ -0,0 +1,183 @@
+import json
+import os
+from bisect import bisect_right
+from fractions import Fraction
+from pathlib import Path
+from PySide6.QtCore import QThread, Signal
+
+from Code.media_cache import temp_path
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+class FrameIndex:
+    """视频的逐帧时间戳表（按显示顺序排列的PTS与关键帧标记）
+
+    由文件头和数据包直接读出，不需要解码画面；
+    用于把任意时间精确映射到唯一的一帧，以及找到某帧之前最近的关键帧。
+    """
+
+    VERSION = 1
+    SUFFIX = ".frameindex.json"
+
+    def __init__(self, pts, keyframes, time_base, source_size=0, source_mtime=0):
+        self.pts = list(pts)  # 每帧的PTS（流时间基单位）
+        self.keyframes = list(keyframes)  # 每帧是否为关键帧
+        self.time_base = Fraction(time_base)
+        self.source_size = source_size
+        self.source_mtime = source_mtime
+
+        start = self.pts[0] if self.pts else 0
+        self.times_ms = [float((p - start) * self.time_base) * 1000 for p in self.pts]
+        self._keyframe_list = [i for i, key in enumerate(self.keyframes) if key] or [0]
+        self._frame_of_pts = {p: i for i, p in enumerate(self.pts)}
+
+    @property
+    def frame_count(self):
+        return len(self.pts)
+
+    @property
+    def fps(self):
+        """平均帧率"""
+        if self.frame_count < 2 or self.times_ms[-1] <= 0:
+            return 0.0
+        return (self.frame_count - 1) * 1000.0 / self.times_ms[-1]
+
+    def time_ms(self, index):
+        """第index帧的显示时间（毫秒，相对第一帧）"""
+        index = max(0, min(index, self.frame_count - 1))
+        return self.times_ms[index]
+
+    def frame_at_ms(self, ms):
+        """指定时间画面上显示的那一帧"""
+        index = bisect_right(self.times_ms, ms + 1e-3) - 1
+        return max(0, min(index, self.frame_count - 1))
+
+    def frame_of_pts(self, pts):
+        """由解码出的帧PTS查帧序号，找不到时返回None"""
+        index = self._frame_of_pts.get(pts)
+        if index is None and pts is not None and self.pts:
+            index = max(0, bisect_right(self.pts, pts) - 1)
+        return index
+
+    def keyframe_before(self, index):
+        """index及之前最近的关键帧序号"""
+        pos = bisect_right(self._keyframe_list, index) - 1
+        return self._keyframe_list[max(pos, 0)]
+
+    def keyframe_after(self, index):
+        """index之后的下一个关键帧序号，没有时返回frame_count"""
+        pos = bisect_right(self._keyframe_list, index)
+        if pos < len(self._keyframe_list):
+            return self._keyframe_list[pos]
+        return self.frame_count
+
+    # ========== 构建与缓存 ==========
+
+    @staticmethod
+    def cache_path(file_path):
+        """索引缓存文件放在视频旁边"""
+        file_path = Path(file_path)
+        return file_path.with_name(file_path.name + FrameIndex.SUFFIX)
+
+    @classmethod
+    def build(cls, file_path):
+        """读取全部数据包建立索引（只解复用，不解码）"""
+        if av is None:
+            raise ImportError("未安装PyAV，请先执行 pip install av")
+
+        stat = os.stat(file_path)
+        pts_and_key = []
+        with av.open(str(file_path)) as container:
+            stream = container.streams.video[0]
+            time_base = stream.time_base
+            for packet in container.demux(stream):
+                if packet.pts is None or packet.size == 0:
+                    continue
+                pts_and_key.append((packet.pts, packet.is_keyframe))
+
+        # 数据包是解码顺序，按PTS排序得到显示顺序
+        pts_and_key.sort()
+        pts = [p for p, key in pts_and_key]
+        keyframes = [key for p, key in pts_and_key]
+        return cls(pts, keyframes, time_base, stat.st_size, stat.st_mtime_ns)
+
+    @classmethod
+    def load(cls, file_path, check_mtime=True):
+        """读取视频旁边的索引缓存，文件已变化或缓存无效时返回None
+
+        check_mtime为False时只核对文件大小，用于按内容命名、生成后不再改变的文件（如代理）。
+        """
+        path = cls.cache_path(file_path)
+        try:
+            stat = os.stat(file_path)
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if (data.get("version") != cls.VERSION
+                or data.get("size") != stat.st_size
+                or (check_mtime and data.get("mtime") != stat.st_mtime_ns)):
+            return None
+        return cls(data["pts"], data["keyframes"], Fraction(*data["time_base"]),
+                   data["size"], data["mtime"])
+
+    def save(self, file_path):
+        """把索引写到视频旁边"""
+        data = {
+            "version": self.VERSION,
+            "size": self.source_size,
+            "mtime": self.source_mtime,
+            "time_base": [self.time_base.numerator, self.time_base.denominator],
+            "pts": self.pts,
+            "keyframes": self.keyframes,
+        }
+        path = self.cache_path(file_path)
+        tmp_path = temp_path(path)
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def load_or_build(cls, file_path):
+        """优先读缓存，没有再重新建立并保存"""
+        index = cls.load(file_path)
+        if index is not None:
+            return index
+        index = cls.build(file_path)
+        try:
+            index.save(file_path)
+        except OSError as e:
+            print(f"无法保存帧索引缓存: {e}")
+        return index
+
+
+class FrameIndexBuilder(QThread):
+    """后台线程：加载或建立帧索引"""
+
+    indexReady = Signal(str, object)  # (文件路径, FrameIndex)
+    indexFailed = Signal(str, str)  # (文件路径, 错误信息)
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = str(file_path)
+
+    def run(self):
+        try:
+            index = FrameIndex.load_or_build(self.file_path)
+            if index.frame_count == 0:
+                raise ValueError("视频中没有可用的帧")
+            self.indexReady.emit(self.file_path, index)
+        except Exception as e:
+            self.indexFailed.emit(self.file_path, str(e))
@@ -0,0 +1,170 @@
+import threading
+from PySide6.QtCore import QThread, Signal
+
+from Code.perf_hud import perf
+
+
+class FramePrefetcher(QThread):
+    """后台解码线程：把播放头前后若干帧解码进FrameCache
+
+    先填充行进方向上的帧，再回头填充另一侧；
+    播放头移出当前解码窗口时中断本轮解码，重新从新位置开始。
+    倒放时从播放头往回按GOP取区间：每个GOP从关键帧开始正向解码一次，
+    整段放进缓存后由UI按倒序取用，不必为每一帧重新seek。
+    指定FrameStore时优先从磁盘仓库取帧，新解码的帧也写入仓库。
+    """
+
+    # 没有帧索引（不知道关键帧位置）时，倒放每次往回解码的帧数
+    REVERSE_CHUNK = 30
+    # 倒放时一次最多往回解码的帧数（GOP很长时避免超出缓存）
+    REVERSE_MAX_SPAN = 240
+
+    frameReady = Signal(int)  # 某一帧已进入缓存
+
+    def __init__(self, decoder, cache, behind=15, ahead=45, store=None, parent=None):
+        super().__init__(parent)
+        self.decoder = decoder
+        self.cache = cache
+        self.store = store
+        self.behind = behind
+        self.ahead = ahead
+        self._center = 0
+        self.direction = 1  # 行进方向：1正向，-1倒放
+        self._generation = 0  # 播放头每次移动加一，用于判断本轮解码是否过期
+        self._stopping = False
+        self._cond = threading.Condition()
+
+    def set_playhead(self, index):
+        """通知新的播放头位置（UI线程调用）"""
+        with self._cond:
+            if index == self._center:
+                return
+            self._center = index
+            self._generation += 1
+            self._cond.notify()
+        self.cache.set_center(index)
+
+    def set_direction(self, direction):
+        """设置行进方向（UI线程调用），倒放时预取播放头之前的帧"""
+        direction = -1 if direction < 0 else 1
+        with self._cond:
+            if direction == self.direction:
+                return
+            self.direction = direction
+            self._generation += 1
+            self._cond.notify()
+
+    def stop(self):
+        """结束线程并等待退出"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self.wait()
+
+    def _next_job(self):
+        """找出下一段需要解码的区间，没有时返回None"""
+        last = self.decoder.frame_count - 1 if self.decoder.frame_count else self._center + self.ahead
+        center = max(0, min(self._center, last))
+        if self.direction < 0:
+            return self._next_reverse_job(center, last)
+        hi = min(center + self.ahead, last)
+        lo = max(center - self.behind, 0)
+
+        start = self.cache.missing_in(center, hi)
+        if start is not None:
+            return start, hi
+        start = self.cache.missing_in(lo, center)
+        if start is not None:
+            return start, center
+        return None
+
+    def _next_reverse_job(self, center, last):
+        """倒放：从播放头往回找第一个未缓存的帧，解码它所在的整个GOP"""
+        lo = max(center - self.ahead, 0)
+        hi = min(center + self.behind, last)
+        missing = self.cache.missing_in(center, lo)
+        if missing is not None:
+            return max(self._gop_start(missing), missing - self.REVERSE_MAX_SPAN, 0), missing
+        start = self.cache.missing_in(center, hi)
+        if start is not None:
+            return start, hi
+        return None
+
+    def _gop_start(self, index):
+        """index所在GOP的第一帧"""
+        if self.decoder.frame_index is not None:
+            return self.decoder.frame_index.keyframe_before(index)
+        return index - self.REVERSE_CHUNK + 1
+
+    def _is_stale(self, generation, start, end):
+        """播放头已经离开[start, end]附近时，本轮解码作废"""
+        if generation == self._generation:
+            return False
+        if self.direction < 0:
+            # 倒放时播放头从区间上方逐渐移进来
+            return not (start - self.behind <= self._center <= end + self.ahead)
+        return not (start - self.behind <= self._center <= end)
+
+    def _store(self, index, image):
+        if not self.cache.contains(index):
+            self.cache.put(index, image)
+            self.frameReady.emit(index)
+        if self.store is not None and not self.store.contains(index):
+            self.store.put(index, image)
+
+    def _fill_from_store(self, start, end):
+        """从磁盘仓库连续取出已保存的帧，返回取到的帧数"""
+        if self.store is None:
+            return 0
+        count = 0
+        step = 1 if end >= start else -1
+        for index in range(start, end + step, step):
+            if self._stopping or self.cache.contains(index):
+                continue
+            image = self.store.get(index)
+            if image is None:
+                break
+            self.cache.put(index, image)
+            self.frameReady.emit(index)
+            count += 1
+        return count
+
+    def run(self):
+        try:
+            while True:
+                with self._cond:
+                    while not self._stopping:
+                        job = self._next_job()
+                        if job is not None:
+                            break
+                        self._cond.wait()
+                    if self._stopping:
+                        return
+                    generation = self._generation
+
+                start, end = job
+                # 倒放时从靠近播放头的一端开始读磁盘仓库
+                filled = self._fill_from_store(end, start) if self.direction < 0 else self._fill_from_store(start, end)
+                if filled:
+                    continue
+
+                previous = None
+                expected = start
+                for index, image in self.decoder.iter_range(start, end):
+                    if self._stopping or self._is_stale(generation, start, end):
+                        break
+                    # 可变帧率造成的序号空洞用相邻帧补齐，避免反复请求
+                    for gap in range(expected, index):
+                        self._store(gap, image if previous is None else previous)
+                    self._store(index, image)
+                    if perf.enabled:
+                        perf.tick("decode")
+                    previous, expected = image, index + 1
+                else:
+                    if expected <= end:
+                        # 文件实际帧数比预估少，修正总帧数
+                        self.decoder.frame_count = max(expected, 1)
+        except Exception as e:
+            print(f"后台解码失败: {e}")
+        finally:
+            self.decoder.close()
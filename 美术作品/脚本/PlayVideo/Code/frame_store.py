@@ -0,0 +1,165 @@
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from PySide6.QtGui import QImage
+
+from Code.media_cache import cache_dir, enforce_size_cap, touch
+
+# 单个视频的帧仓库上限，以及整个目录的上限
+STORE_MAX_BYTES = 1024 * 1024 * 1024
+STORE_DIR_MAX_BYTES = 4 * 1024 * 1024 * 1024
+
+# 本进程中已打开的仓库：同一个仓库文件只映射一次，所有使用者共用同一把锁
+_open_stores = {}
+_open_stores_lock = threading.Lock()
+
+
+def store_key(file_path, decode_path, width, height, frame_count):
+    """仓库文件的键：源文件、实际解码的文件（源文件或代理）和帧的规格
+
+    从代理和从源文件解码、或者帧数估计不同的使用者各用各的仓库，不会互相重建对方的文件。
+    """
+    parts = [os.path.abspath(str(file_path)).lower(), os.path.abspath(str(decode_path or file_path)).lower(),
+             f"{width}x{height}", str(frame_count)]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class FrameStore:
+    """内存映射的解码帧仓库，跨会话保存缩小后的RGB帧
+
+    文件由固定长度的头、槽位表和等长的帧槽组成；帧n存放在第 n % 槽数 个槽里
+    （帧数不超过槽数时每帧独占一个槽，否则后写入的帧覆盖同槽的旧帧）。
+    头里记录源文件的大小和修改时间，任一变化都会重建仓库。
+    再次打开同一视频时直接从页缓存读帧，无需解码。
+    应通过FrameStore.open()获取，同一进程内同一个仓库只有一个实例；
+    独立解码进程与本进程不会同时使用同一视频的仓库（启用独立进程时本进程的帧缓存停止）。
+    """
+
+    MAGIC = b"PVFS"
+    VERSION = 1
+    HEADER = struct.Struct("<4sIQQIIIII")
+    HEADER_BYTES = 4096
+    EMPTY = -1
+
+    @classmethod
+    def open(cls, file_path, width, height, frame_count, decode_path=None):
+        """打开（或共用已打开的）仓库，用完调用close()"""
+        key = store_key(file_path, decode_path, width, height, max(1, frame_count))
+        with _open_stores_lock:
+            store = _open_stores.get(key)
+            if store is None:
+                store = cls(file_path, width, height, frame_count, key=key)
+                _open_stores[key] = store
+            store._users += 1
+            return store
+
+    def __init__(self, file_path, width, height, frame_count, max_bytes=STORE_MAX_BYTES, key=None):
+        stat = os.stat(file_path)
+        self.width = width
+        self.height = height
+        self.stride = width * 3
+        self.frame_bytes = self.stride * height
+        self.frame_count = max(1, frame_count)
+        self.slot_count = max(1, min(self.frame_count, max_bytes // self.frame_bytes))
+        self._lock = threading.Lock()
+        self._users = 0
+        self._key = key or store_key(file_path, None, width, height, self.frame_count)
+
+        self.path = cache_dir("frames") / f"{self._key}.frames"
+        self._table_offset = self.HEADER_BYTES
+        table_bytes = self.slot_count * 4
+        self._data_offset = self._align(self._table_offset + table_bytes)
+        total_bytes = self._data_offset + self.slot_count * self.frame_bytes
+
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, stat.st_size, stat.st_mtime_ns,
+                                  width, height, self.stride, self.frame_count, self.slot_count)
+        if not self._header_matches(header, total_bytes):
+            self._create(header, total_bytes)
+            enforce_size_cap(self.path.parent, STORE_DIR_MAX_BYTES, keep=[self.path])
+        touch(self.path)
+
+        self._file = open(self.path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), total_bytes)
+        self._tags = memoryview(self._mm)[self._table_offset:self._table_offset + table_bytes].cast("i")
+
+    @staticmethod
+    def _align(offset, alignment=4096):
+        return (offset + alignment - 1) // alignment * alignment
+
+    def _header_matches(self, header, total_bytes):
+        """已有文件的头与当前源文件、尺寸一致时可以直接复用"""
+        try:
+            if self.path.stat().st_size != total_bytes:
+                return False
+            with open(self.path, "rb") as f:
+                return f.read(len(header)) == header
+        except OSError:
+            return False
+
+    def _create(self, header, total_bytes):
+        """新建（或重建）仓库文件，所有槽位标记为空"""
+        with open(self.path, "wb") as f:
+            f.truncate(total_bytes)
+            f.write(header)
+            f.seek(self._table_offset)
+            f.write(struct.pack("<i", self.EMPTY) * self.slot_count)
+
+    def _slot_offset(self, slot):
+        return self._data_offset + slot * self.frame_bytes
+
+    def contains(self, index):
+        return self._mm is not None and self._tags[index % self.slot_count] == index
+
+    def get(self, index):
+        """读出一帧，不存在时返回None"""
+        with self._lock:
+            if self._mm is None:
+                return None
+            slot = index % self.slot_count
+            if self._tags[slot] != index:
+                return None
+            offset = self._slot_offset(slot)
+            data = self._mm[offset:offset + self.frame_bytes]
+        image = QImage(data, self.width, self.height, self.stride, QImage.Format_RGB888)
+        return image.copy()
+
+    def put(self, index, image):
+        """写入一帧；尺寸不符的帧直接忽略"""
+        if image is None or image.width() != self.width or image.height() != self.height:
+            return
+        if image.format() != QImage.Format_RGB888:
+            image = image.convertToFormat(QImage.Format_RGB888)
+        bits = image.constBits()
+        with self._lock:
+            if self._mm is None:
+                return
+            slot = index % self.slot_count
+            offset = self._slot_offset(slot)
+            # 先作废槽位再写像素，最后写标记，避免读到写了一半的帧
+            self._tags[slot] = self.EMPTY
+            if image.bytesPerLine() == self.stride:
+                self._mm[offset:offset + self.frame_bytes] = bits[:self.frame_bytes]
+            else:
+                line = image.bytesPerLine()
+                for y in range(self.height):
+                    row = offset + y * self.stride
+                    self._mm[row:row + self.stride] = bits[y * line:y * line + self.stride]
+            self._tags[slot] = index
+
+    def close(self):
+        """使用者不再需要仓库；最后一个使用者关闭时才真正解除映射"""
+        with _open_stores_lock:
+            self._users -= 1
+            if self._users > 0:
+                return
+            if _open_stores.get(self._key) is self:
+                del _open_stores[self._key]
+        with self._lock:
+            if self._mm is None:
+                return
+            self._tags.release()
+            self._mm.close()
+            self._file.close()
+            self._mm = None
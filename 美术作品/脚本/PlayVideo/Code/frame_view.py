@@ -0,0 +1,210 @@
+import time
+from PySide6.QtCore import QPointF, QRectF, QSizeF, Qt, QTimer, Signal
+from PySide6.QtGui import QColor, QPainter
+from PySide6.QtWidgets import QWidget
+
+from Code.perf_hud import perf
+
+# 最大放大倍数和滚轮每格的缩放倍数
+VIEW_MAX_ZOOM = 16.0
+VIEW_ZOOM_STEP = 1.25
+# 缩放、平移停下多久后才请求高分辨率区域（毫秒）
+ROI_REQUEST_DELAY = 40
+
+
+class FrameView(QWidget):
+    """直接绘制缓存帧（QImage）的画面控件，拖动滑块时代替QVideoWidget显示
+
+    支持放大和平移：滚轮以鼠标处为中心缩放，左键拖动平移，双击恢复全画面。
+    放大到缓存帧的分辨率不够时发出roiRequested，调用方解码出可见区域的高分辨率画面后交给set_roi。
+    """
+
+    roiRequested = Signal(int, object, int, int)  # (帧序号, 相对区域(x, y, w, h), 输出宽, 输出高)
+    zoomChanged = Signal(float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._image = None
+        self._display = None  # 实际绘制的画面（开启洋葱皮时为合成结果）
+        self.frame_index = -1  # 当前显示的视频帧序号
+        self.onion_skin = None
+        self.neighbour_source = None  # neighbour_source(帧序号) -> 已缓存的QImage或None
+        self.zoom = 1.0
+        self.center = QPointF(0.5, 0.5)  # 可见区域中心，画面的相对坐标
+        self._roi = None  # (帧序号, 相对区域, 高分辨率画面)
+        self._drag_pos = None
+        self._roi_timer = QTimer(self)
+        self._roi_timer.setSingleShot(True)
+        self._roi_timer.setInterval(ROI_REQUEST_DELAY)
+        self._roi_timer.timeout.connect(self.request_roi)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+
+    def set_onion_skin(self, onion_skin, neighbour_source):
+        """设置洋葱皮及取邻近帧的来源"""
+        self.onion_skin = onion_skin
+        self.neighbour_source = neighbour_source
+        self.refresh()
+
+    def set_frame(self, index, image):
+        """显示指定帧"""
+        self.frame_index = index
+        self._image = image
+        self.refresh()
+
+    def refresh(self):
+        """重新合成当前帧（邻近帧进入缓存或洋葱皮设置改变时调用）"""
+        self._display = self._image
+        if self.onion_skin is not None and self._image is not None:
+            try:
+                self._display = self.onion_skin.compose(self.frame_index, self._image, self.neighbour_source)
+            except Exception as e:
+                print(f"合成洋葱皮失败: {e}")
+        self._schedule_roi()
+        self.update()
+
+    def clear(self):
+        self.frame_index = -1
+        self._image = None
+        self._display = None
+        self._roi = None
+        if self.onion_skin is not None:
+            self.onion_skin.clear()
+        self.update()
+
+    # ========== 放大与平移 ==========
+
+    def image_rect(self):
+        """整幅画面在控件中的位置（保持宽高比，按缩放和中心偏移）"""
+        if self._image is None or self._image.isNull():
+            return QRectF(self.rect())
+        size = QSizeF(self._image.size()).scaled(QSizeF(self.size()), Qt.KeepAspectRatio) * self.zoom
+        rect = QRectF(QPointF(0, 0), size)
+        rect.moveCenter(QPointF(self.width() / 2 - (self.center.x() - 0.5) * size.width(),
+                                self.height() / 2 - (self.center.y() - 0.5) * size.height()))
+        return rect
+
+    def visible_region(self):
+        """可见部分在画面中的相对区域(x, y, w, h)"""
+        rect = self.image_rect()
+        visible = rect.intersected(QRectF(self.rect()))
+        if visible.isEmpty():
+            return 0.0, 0.0, 1.0, 1.0
+        return ((visible.left() - rect.left()) / rect.width(), (visible.top() - rect.top()) / rect.height(),
+                visible.width() / rect.width(), visible.height() / rect.height())
+
+    def set_view(self, zoom, center):
+        """设置缩放倍数和可见区域中心，中心限制在画面不会移出控件的范围内"""
+        zoom = max(1.0, min(zoom, VIEW_MAX_ZOOM))
+        half = 0.5 / zoom
+        self.center = QPointF(min(max(center.x(), half), 1 - half), min(max(center.y(), half), 1 - half))
+        if zoom != self.zoom:
+            self.zoom = zoom
+            self.zoomChanged.emit(zoom)
+        self._schedule_roi()
+        self.update()
+
+    def reset_view(self):
+        self.set_view(1.0, QPointF(0.5, 0.5))
+
+    def _image_point(self, pos):
+        """控件坐标对应的画面相对坐标"""
+        rect = self.image_rect()
+        return QPointF((pos.x() - rect.left()) / rect.width(), (pos.y() - rect.top()) / rect.height())
+
+    def wheelEvent(self, event):
+        if self._image is None:
+            return
+        steps = event.angleDelta().y() / 120
+        zoom = max(1.0, min(self.zoom * VIEW_ZOOM_STEP ** steps, VIEW_MAX_ZOOM))
+        # 鼠标下的画面点保持不动
+        anchor = self._image_point(event.position())
+        ratio = self.zoom / zoom
+        self.set_view(zoom, QPointF(anchor.x() + (self.center.x() - anchor.x()) * ratio,
+                                    anchor.y() + (self.center.y() - anchor.y()) * ratio))
+        event.accept()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and self.zoom > 1.0:
+            self._drag_pos = event.position()
+            self.setCursor(Qt.ClosedHandCursor)
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self._drag_pos is not None:
+            rect = self.image_rect()
+            delta = event.position() - self._drag_pos
+            self._drag_pos = event.position()
+            self.set_view(self.zoom, QPointF(self.center.x() - delta.x() / rect.width(),
+                                             self.center.y() - delta.y() / rect.height()))
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton and self._drag_pos is not None:
+            self._drag_pos = None
+            self.unsetCursor()
+        super().mouseReleaseEvent(event)
+
+    def mouseDoubleClickEvent(self, event):
+        self.reset_view()
+        super().mouseDoubleClickEvent(event)
+
+    def resizeEvent(self, event):
+        self._schedule_roi()
+        super().resizeEvent(event)
+
+    # ========== 高分辨率区域 ==========
+
+    def needs_roi(self):
+        """可见区域在缓存帧中的像素少于屏幕像素时需要高分辨率区域（洋葱皮开启时不替换合成画面）"""
+        if self._image is None or self.zoom <= 1.0 or self._display is not self._image:
+            return False
+        x, y, w, h = self.visible_region()
+        screen_height = self.image_rect().height() * h * self.devicePixelRatioF()
+        return h * self._image.height() < screen_height * 0.9
+
+    def _schedule_roi(self):
+        if self._roi is not None and self._roi[0] != self.frame_index:
+            self._roi = None
+        if self.needs_roi():
+            self._roi_timer.start()
+
+    def request_roi(self):
+        if not self.needs_roi():
+            return
+        x, y, w, h = self.visible_region()
+        rect = self.image_rect()
+        ratio = self.devicePixelRatioF()
+        self.roiRequested.emit(self.frame_index, (x, y, w, h),
+                               max(2, int(rect.width() * w * ratio)), max(2, int(rect.height() * h * ratio)))
+
+    def set_roi(self, index, region, image):
+        """高分辨率区域解码完成"""
+        if index != self.frame_index or self.zoom <= 1.0:
+            return
+        self._roi = (index, region, image)
+        self.update()
+
+    def paintEvent(self, event):
+        timed = perf.enabled
+        if timed:
+            start = time.perf_counter()
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(128, 128, 128))
+        if self._display is not None:
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            rect = self.image_rect()
+            x, y, w, h = self.visible_region()
+            # 只绘制可见部分，放大时不必整幅缩放
+            source = QRectF(x * self._display.width(), y * self._display.height(),
+                            w * self._display.width(), h * self._display.height())
+            target = QRectF(rect.left() + x * rect.width(), rect.top() + y * rect.height(),
+                            w * rect.width(), h * rect.height())
+            painter.drawImage(target, self._display, source)
+            if self._roi is not None and self.zoom > 1.0 and self._display is self._image:
+                rx, ry, rw, rh = self._roi[1]
+                painter.drawImage(QRectF(rect.left() + rx * rect.width(), rect.top() + ry * rect.height(),
+                                         rw * rect.width(), rh * rect.height()), self._roi[2])
+        painter.end()
+        if timed:
+            perf.tick("paint")
+            perf.sample("paint", (time.perf_counter() - start) * 1000)
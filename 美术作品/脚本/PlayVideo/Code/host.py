@@ -0,0 +1,218 @@
+import abc
+import random
+import time
+
+# 参考画面显示的位置：视口背景，或场景中贴着参考画面的平面
+REFERENCE_TARGET_BACKGROUND = "background"
+REFERENCE_TARGET_PLANE = "plane"
+REFERENCE_PLANE_NAME = "PlayVideo_Reference"
+
+# 各owner当前在Max里注册的时间回调。放在模块里而不是MaxHost实例上：
+# Max里再次运行脚本会创建新的MaxHost，但本模块已导入，仍能找到上一次注册的回调并注销
+_max_time_callbacks = {}
+
+
+class HostAdapter(abc.ABC):
+    """DCC宿主接口：PlayVideo只通过它读写时间轴和注册时间回调
+
+    3ds Max中使用MaxHost；不在Max里时可以用FakeHost做测试和性能测量。
+    """
+
+    @abc.abstractmethod
+    def frame_rate(self):
+        """当前帧率"""
+
+    @abc.abstractmethod
+    def get_time(self):
+        """当前时间滑块所在帧"""
+
+    @abc.abstractmethod
+    def set_time(self, frame):
+        """设置时间滑块（宿主会重绘视口）"""
+
+    @abc.abstractmethod
+    def get_animation_range(self):
+        """动画范围 (开始帧, 结束帧)"""
+
+    @abc.abstractmethod
+    def set_animation_range(self, start, end):
+        """设置动画范围"""
+
+    @abc.abstractmethod
+    def register_time_callback(self, callback, owner=None):
+        """时间改变时调用callback()；同一owner只保留最后注册的回调，旧的先注销"""
+
+    @abc.abstractmethod
+    def unregister_time_callback(self, callback):
+        """注销时间回调"""
+
+    @abc.abstractmethod
+    def show_reference_image(self, path, target, redraw=False):
+        """把图片文件显示为视口背景或参考平面的贴图；redraw为False时等宿主自己重绘（如时间改变时）"""
+
+    @abc.abstractmethod
+    def clear_reference(self, target):
+        """不再显示参考画面"""
+
+
+class MaxHost(HostAdapter):
+    """通过pymxs访问3ds Max"""
+
+    def __init__(self):
+        from pymxs import runtime as rt
+        self.rt = rt
+        self._reference_bitmap = None
+
+    def frame_rate(self):
+        return self.rt.frameRate
+
+    def get_time(self):
+        return int(self.rt.sliderTime)
+
+    def set_time(self, frame):
+        self.rt.sliderTime = frame
+
+    def get_animation_range(self):
+        animation_range = self.rt.animationRange
+        return int(animation_range.start), int(animation_range.end)
+
+    def set_animation_range(self, start, end):
+        self.rt.animationRange = self.rt.interval(start, end)
+
+    def register_time_callback(self, callback, owner=None):
+        if owner is not None:
+            previous = _max_time_callbacks.pop(owner, None)
+            if previous is not None:
+                try:
+                    self.rt.unRegisterTimeCallback(previous)
+                except Exception as e:
+                    print(f"注销旧的3ds Max时间回调失败: {e}")
+        self.rt.registerTimeCallback(callback)
+        if owner is not None:
+            _max_time_callbacks[owner] = callback
+
+    def unregister_time_callback(self, callback):
+        self.rt.unRegisterTimeCallback(callback)
+        for owner, registered in list(_max_time_callbacks.items()):
+            if registered == callback:
+                del _max_time_callbacks[owner]
+
+    def show_reference_image(self, path, target, redraw=False):
+        rt = self.rt
+        bitmap = rt.openBitMap(path)
+        if bitmap is None:
+            raise IOError(f"3ds Max无法读取参考画面: {path}")
+        if target == REFERENCE_TARGET_PLANE:
+            self._reference_texture(bitmap.width, bitmap.height).bitmap = bitmap
+        else:
+            rt.setAsBackground(bitmap)
+            rt.viewport.DispBkgImage = True
+        # 新位图换上之后再释放上一张
+        if self._reference_bitmap is not None:
+            rt.close(self._reference_bitmap)
+        self._reference_bitmap = bitmap
+        if redraw:
+            rt.redrawViews()
+
+    def _reference_texture(self, width, height):
+        """找到或创建参考平面，返回它的位图贴图"""
+        rt = self.rt
+        node = rt.getNodeByName(REFERENCE_PLANE_NAME)
+        if node is None or node.material is None:
+            if node is None:
+                # 竖立在前视图中，宽高比与视频一致
+                node = rt.Plane(name=REFERENCE_PLANE_NAME, length=100, width=100.0 * width / max(1, height),
+                                lengthsegs=1, widthsegs=1)
+                node.rotation = rt.eulerAngles(90, 0, 0)
+            texture = rt.BitmapTexture(name=REFERENCE_PLANE_NAME)
+            material = rt.StandardMaterial(name=REFERENCE_PLANE_NAME, selfIllumAmount=100, diffuseMap=texture)
+            node.material = material
+            rt.showTextureMap(material, texture, True)
+        return node.material.diffuseMap
+
+    def clear_reference(self, target):
+        # 参考平面保留在场景里，贴图停在最后一帧
+        if target == REFERENCE_TARGET_BACKGROUND:
+            self.rt.viewport.DispBkgImage = False
+            self.rt.redrawViews()
+        self._reference_bitmap = None
+
+
+class FakeHost(HostAdapter):
+    """进程内的假3ds Max，不需要界面
+
+    set_time会同步调用时间回调，再按redraw_cost_ms（加随机抖动）阻塞，模拟视口重绘；
+    play_step模拟Max播放时间轴时逐帧前进。
+    """
+
+    def __init__(self, fps=30, redraw_cost_ms=20.0, jitter_ms=5.0, seed=0):
+        self.fps = fps
+        self.redraw_cost_ms = redraw_cost_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+        self._time = 0
+        self._range = (0, 100)
+        self._callbacks = []
+        self._owners = {}
+        self.history = []  # (perf_counter时间, 帧)：每次时间改变完成（重绘结束）的时刻
+        self.redraws = 0
+        self.references = []  # (perf_counter时间, 文件路径, 目标)：每次更新参考画面
+
+    def frame_rate(self):
+        return self.fps
+
+    def get_time(self):
+        return self._time
+
+    def set_time(self, frame):
+        frame = int(frame)
+        if frame == self._time:
+            return
+        self._time = frame
+        for callback in list(self._callbacks):
+            callback()
+        self._redraw()
+        self.history.append((time.perf_counter(), frame))
+
+    def _redraw(self):
+        cost = self.redraw_cost_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        if cost > 0:
+            time.sleep(cost / 1000.0)
+        self.redraws += 1
+
+    def play_step(self):
+        """播放时前进一帧，到结尾后回到开头"""
+        start, end = self._range
+        frame = self._time + 1
+        if frame > end:
+            frame = start
+        self.set_time(frame)
+
+    def get_animation_range(self):
+        return self._range
+
+    def set_animation_range(self, start, end):
+        self._range = (int(start), int(end))
+
+    def register_time_callback(self, callback, owner=None):
+        if owner is not None and owner in self._owners:
+            self.unregister_time_callback(self._owners[owner])
+        if callback not in self._callbacks:
+            self._callbacks.append(callback)
+        if owner is not None:
+            self._owners[owner] = callback
+
+    def unregister_time_callback(self, callback):
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+        for owner, registered in list(self._owners.items()):
+            if registered == callback:
+                del self._owners[owner]
+
+    def show_reference_image(self, path, target, redraw=False):
+        self.references.append((time.perf_counter(), path, target))
+        if redraw:
+            self._redraw()
+
+    def clear_reference(self, target):
+        pass
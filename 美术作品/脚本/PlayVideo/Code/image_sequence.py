@@ -0,0 +1,74 @@
+"""图片序列的编码与写入，在解码进程池的子进程里运行，不导入Qt"""
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+
+# PyAV为可选依赖，缺失时不能导出
+try:
+    import av
+except ImportError:
+    av = None
+
+# 格式 -> (扩展名, 编码器, 编码像素格式, 编码器选项)
+SEQUENCE_FORMATS = {
+    "PNG": ("png", "png", "rgb24", {}),
+    "JPEG": ("jpg", "mjpeg", "yuvj420p", {"qmin": "1", "qmax": "3"}),
+    "TGA": ("tga", "targa", "bgr24", {}),
+}
+# 每个解码进程里同时编码、写盘的线程数
+SEQUENCE_WRITE_THREADS = 2
+
+
+def sequence_file_name(base_name, max_frame, fmt):
+    """按Max帧号命名：名称.0012.png
+
+    负帧号写成名称.-003.png后无法与正帧号按文件名正确排序，不允许导出负帧。
+    """
+    if max_frame < 0:
+        raise ValueError(f"图片序列不能包含负帧号: {max_frame}")
+    return f"{base_name}.{max_frame:04d}.{SEQUENCE_FORMATS[fmt][0]}"
+
+
+def write_image(image, path, fmt):
+    """把(高, 宽, 3)的RGB数组编码后写到path；先写临时文件再改名，中断时不会留下半张图"""
+    ext, codec, pix_fmt, options = SEQUENCE_FORMATS[fmt]
+    height, width = image.shape[:2]
+    context = av.CodecContext.create(codec, "w")
+    context.width = width
+    context.height = height
+    context.pix_fmt = pix_fmt
+    context.time_base = Fraction(1, 25)
+    context.options = dict(options)
+    frame = av.VideoFrame.from_ndarray(image, format="rgb24")
+    if pix_fmt != "rgb24":
+        frame = frame.reformat(format=pix_fmt)
+    packets = context.encode(frame) + context.encode(None)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        for packet in packets:
+            f.write(bytes(packet))
+    os.replace(tmp_path, path)
+
+
+def export_frames(frames, count, arg):
+    """块任务：把一块的帧写成图片，返回写出的文件数
+
+    arg为(各帧要写出的文件路径列表, 格式)；一帧可能对应多个Max帧，也可能不需要写出。
+    编码和写盘交给线程池，与下一帧的解码重叠；排队的帧数有上限，不会堆积内存。
+    """
+    outputs, fmt = arg
+    written = 0
+    with ThreadPoolExecutor(max_workers=SEQUENCE_WRITE_THREADS) as pool:
+        pending = deque()
+        for i, image in frames:
+            for path in outputs[i]:
+                pending.append(pool.submit(write_image, image, path, fmt))
+                written += 1
+            while len(pending) > SEQUENCE_WRITE_THREADS * 2:
+                pending.popleft().result()
+            if i >= count - 1:
+                break
+        for future in pending:
+            future.result()
+    return written
@@ -0,0 +1,87 @@
+from PySide6.QtCore import QObject, QThread, Signal
+
+try:
+    import av
+except ImportError:
+    av = None
+
+# 加载视频的各阶段（按顺序）及界面上显示的名称
+LOAD_STAGE_PROBE = "probe"
+LOAD_STAGE_INDEX = "index"
+LOAD_STAGE_FRAME = "frame"
+LOAD_STAGE_RANGE = "range"
+LOAD_STAGES = (
+    (LOAD_STAGE_PROBE, "读取时长"),
+    (LOAD_STAGE_INDEX, "帧索引"),
+    (LOAD_STAGE_FRAME, "首帧"),
+    (LOAD_STAGE_RANGE, "动画范围"),
+)
+
+
+class MediaProbe(QThread):
+    """后台线程：只读文件头得到时长和帧率，通常比播放器后端报告durationChanged更早"""
+
+    probed = Signal(str, dict)  # (文件路径, {"duration_ms", "fps", "width", "height"})
+    probeFailed = Signal(str, str)
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = str(file_path)
+
+    def run(self):
+        try:
+            if av is None:
+                raise ImportError("未安装PyAV，请先执行 pip install av")
+            with av.open(self.file_path) as container:
+                stream = container.streams.video[0]
+                if stream.duration is not None and stream.time_base is not None:
+                    duration_ms = float(stream.duration * stream.time_base) * 1000
+                elif container.duration is not None:
+                    duration_ms = container.duration / 1000  # av.time_base为微秒
+                else:
+                    raise ValueError("文件头中没有时长")
+                rate = stream.average_rate or stream.guessed_rate
+                self.probed.emit(self.file_path, {
+                    "duration_ms": int(duration_ms),
+                    "fps": float(rate) if rate else 0.0,
+                    "width": stream.codec_context.width,
+                    "height": stream.codec_context.height,
+                })
+        except Exception as e:
+            self.probeFailed.emit(self.file_path, str(e))
+
+
+class LoadProgress(QObject):
+    """记录当前视频加载到了哪一步
+
+    各阶段由各自的事件（探测结果、帧索引、播放器媒体状态等）标记完成，顺序不固定；
+    换了视频后，上一个视频迟到的事件按文件路径忽略。
+    """
+
+    progressChanged = Signal(str, int)  # (显示文字, 百分比)，全部完成时文字为空
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.file_path = None
+        self._done = set()
+
+    def start(self, file_path):
+        self.file_path = str(file_path)
+        self._done = set()
+        self._emit()
+
+    def is_done(self, stage):
+        return stage in self._done
+
+    def mark(self, file_path, stage):
+        """file_path的stage阶段已完成"""
+        if file_path is None or str(file_path) != self.file_path or stage in self._done:
+            return
+        self._done.add(stage)
+        self._emit()
+
+    def _emit(self):
+        percent = len(self._done) * 100 // len(LOAD_STAGES)
+        pending = [name for stage, name in LOAD_STAGES if stage not in self._done]
+        text = f"加载中 {percent}%：{pending[0]}" if pending else ""
+        self.progressChanged.emit(text, percent)
@@ -0,0 +1,241 @@
+import math
+import time
+from PySide6.QtCore import QObject, Qt, QThread, QTimer, Signal
+from PySide6.QtGui import QImage
+
+from Code.video_decoder import VideoDecoder
+
+# 入出点区间缓冲的内存上限，区间较长时整体缩小分辨率以放进这个上限
+LOOP_BUFFER_MAX_BYTES = 1024 * 1024 * 1024
+# 缓冲帧的最大高度（与帧缓存一致）和缩小后的最小高度
+LOOP_MAX_HEIGHT = 540
+LOOP_MIN_HEIGHT = 90
+
+LOOP_MODE_LOOP = "loop"
+LOOP_MODE_PINGPONG = "pingpong"
+
+
+class LoopBuffer:
+    """入点到出点之间全部解码好的帧，按固定槽位连续存放在一块内存里
+
+    取帧不再经过解码器；单块内存也避免了上千个QImage带来的碎片和额外开销。
+    """
+
+    def __init__(self, start, end, width, height, fps, start_ms, end_ms):
+        self.start = start  # 入点帧序号
+        self.end = end  # 出点帧序号（包含）
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.stride = width * 3
+        self.frame_bytes = self.stride * height
+        self.data = bytearray(self.frame_bytes * self.count)
+
+    @property
+    def count(self):
+        return self.end - self.start + 1
+
+    @property
+    def nbytes(self):
+        return len(self.data)
+
+    def contains(self, index):
+        return self.start <= index <= self.end
+
+    def put(self, index, image):
+        """写入一帧（RGB888，尺寸与缓冲一致）"""
+        offset = (index - self.start) * self.frame_bytes
+        bits = image.constBits()
+        line = image.bytesPerLine()
+        if line == self.stride:
+            self.data[offset:offset + self.frame_bytes] = bits[:self.frame_bytes]
+            return
+        # 解码器输出的行可能有对齐填充，逐行拷贝
+        for row in range(self.height):
+            start = offset + row * self.stride
+            self.data[start:start + self.stride] = bits[row * line:row * line + self.stride]
+
+    def image(self, index):
+        """取出一帧的QImage"""
+        offset = (index - self.start) * self.frame_bytes
+        view = memoryview(self.data)[offset:offset + self.frame_bytes]
+        return QImage(view, self.width, self.height, self.stride, QImage.Format_RGB888).copy()
+
+    def index_to_ms(self, index):
+        return int(self.start_ms + (index - self.start) * 1000.0 / self.fps)
+
+    def ms_to_index(self, ms):
+        """毫秒转换为帧序号，限制在区间内"""
+        index = self.start + int((ms - self.start_ms) * self.fps / 1000.0 + 1e-6)
+        return max(self.start, min(index, self.end))
+
+
+def fit_height(frame_count, width, height, max_bytes):
+    """在内存上限内能容纳frame_count帧的最大高度（保持宽高比）"""
+    frame_bytes = max(1, width * height * 3 * frame_count)
+    scale = min(1.0, math.sqrt(max_bytes / frame_bytes))
+    return max(LOOP_MIN_HEIGHT, int(height * scale))
+
+
+class LoopBufferBuilder(QThread):
+    """后台线程：把入出点区间整体解码进LoopBuffer"""
+
+    progress = Signal(int)  # 百分比
+    bufferReady = Signal(object)  # LoopBuffer
+    bufferFailed = Signal(str)
+
+    def __init__(self, decode_path, start_ms, end_ms, frame_index=None,
+                 max_bytes=LOOP_BUFFER_MAX_BYTES, parent=None):
+        super().__init__(parent)
+        self.decode_path = str(decode_path)
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.frame_index = frame_index
+        self.max_bytes = max_bytes
+        self._cancelled = False
+
+    def cancel(self):
+        """只设置标志，不等待线程结束"""
+        self._cancelled = True
+
+    def run(self):
+        decoder = None
+        try:
+            decoder = VideoDecoder(self.decode_path, max_height=LOOP_MAX_HEIGHT, frame_index=self.frame_index)
+            start = decoder.ms_to_index(self.start_ms)
+            end = max(start, decoder.ms_to_index(self.end_ms))
+            height = fit_height(end - start + 1, decoder.width, decoder.height, self.max_bytes)
+            if height < decoder.height:
+                # 区间太长放不下，换一个输出尺寸更小的解码器
+                decoder.close()
+                decoder = VideoDecoder(self.decode_path, max_height=height, frame_index=self.frame_index)
+
+            buffer = LoopBuffer(start, end, decoder.width, decoder.height, decoder.fps,
+                                decoder.index_to_ms(start), decoder.index_to_ms(end))
+            previous = None
+            next_index = start
+            last_percent = -1
+            for index, image in decoder.iter_range(start, end):
+                if self._cancelled:
+                    return
+                if image.format() != QImage.Format_RGB888:
+                    image = image.convertToFormat(QImage.Format_RGB888)
+                # 可变帧率视频中缺失的帧用前一帧补上
+                while next_index < index:
+                    buffer.put(next_index, previous if previous is not None else image)
+                    next_index += 1
+                buffer.put(index, image)
+                previous = image
+                next_index = index + 1
+                percent = (index - start) * 100 // buffer.count
+                if percent != last_percent:
+                    last_percent = percent
+                    self.progress.emit(percent)
+            if previous is None:
+                raise ValueError("入出点区间内没有可解码的帧")
+            while next_index <= end:
+                buffer.put(next_index, previous)
+                next_index += 1
+            self.progress.emit(100)
+            self.bufferReady.emit(buffer)
+        except Exception as e:
+            self.bufferFailed.emit(str(e))
+        finally:
+            if decoder is not None:
+                decoder.close()
+
+
+class LoopPlayer(QObject):
+    """在LoopBuffer内循环或往返播放，按时钟计算帧号，不会越播越慢"""
+
+    frameChanged = Signal(int, QImage)  # (帧序号, 画面)
+    stateChanged = Signal(bool)  # 是否正在播放
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.buffer = None
+        self.mode = LOOP_MODE_LOOP
+        self.playing = False
+        self.index = -1  # 当前显示的帧序号
+        self._phase = 0  # 播放开始时在循环周期中的位置
+        self._base_time = 0.0
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+
+    @property
+    def position_ms(self):
+        if self.buffer is None or self.index < 0:
+            return 0
+        return self.buffer.index_to_ms(self.index)
+
+    def set_buffer(self, buffer):
+        self.pause()
+        self.buffer = buffer
+        self.index = -1
+        self._phase = 0
+
+    def _period(self):
+        count = self.buffer.count
+        if self.mode == LOOP_MODE_PINGPONG and count > 1:
+            return 2 * (count - 1)
+        return count
+
+    def _phase_to_index(self, phase):
+        count = self.buffer.count
+        phase %= self._period()
+        if phase >= count:
+            # 往返模式的回程
+            phase = 2 * (count - 1) - phase
+        return self.buffer.start + phase
+
+    def _show(self, index):
+        if index == self.index:
+            return
+        self.index = index
+        self.frameChanged.emit(index, self.buffer.image(index))
+
+    def play(self):
+        if self.buffer is None or self.playing:
+            return
+        self.playing = True
+        self._base_time = time.perf_counter()
+        self._timer.start(max(1, int(500 / self.buffer.fps)))
+        self.stateChanged.emit(True)
+        self._tick()
+
+    def pause(self):
+        if not self.playing:
+            return
+        self._phase = self._current_phase()
+        self.playing = False
+        self._timer.stop()
+        self.stateChanged.emit(False)
+
+    def _current_phase(self):
+        elapsed = time.perf_counter() - self._base_time
+        return self._phase + int(elapsed * self.buffer.fps)
+
+    def _tick(self):
+        self._show(self._phase_to_index(self._current_phase()))
+
+    def seek(self, index):
+        """跳到区间内的某一帧并暂停"""
+        if self.buffer is None:
+            return
+        self.pause()
+        index = max(self.buffer.start, min(index, self.buffer.end))
+        self._phase = index - self.buffer.start
+        self._show(index)
+
+    def step(self, delta):
+        """逐帧前进或后退，到区间边界时绕回"""
+        if self.buffer is None:
+            return
+        self.pause()
+        current = self.index if self.index >= 0 else self.buffer.start
+        offset = (current - self.buffer.start + delta) % self.buffer.count
+        self._phase = offset
+        self._show(self.buffer.start + offset)
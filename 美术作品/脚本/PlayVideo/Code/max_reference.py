@@ -0,0 +1,82 @@
+from PySide6.QtCore import QObject
+
+from Code.host import REFERENCE_TARGET_BACKGROUND
+from Code.media_cache import cache_dir
+
+# 轮流写入的文件数，Max按文件名缓存位图时也不会拿到旧画面
+REFERENCE_FILE_COUNT = 3
+
+
+class ReferenceStreamer(QObject):
+    """把Max当前时间对应的视频帧送到视口背景或参考平面上
+
+    画面取自PlayVideo的帧缓存（不让Max自己解码视频），写成未压缩的BMP交给宿主读取；
+    只有帧序号改变时才上传，等待中的帧解码进缓存后立即补上。
+    """
+
+    def __init__(self, host, parent=None):
+        super().__init__(parent)
+        self.host = host
+        self.enabled = False
+        self.target = REFERENCE_TARGET_BACKGROUND
+        self.frame_source = None  # frame_source(帧序号) -> 已缓存的QImage或None
+        self.uploads = 0
+        self._shown = -1  # 宿主上正在显示的帧
+        self._pending = -1  # 等待进入缓存的帧
+        self._slot = 0
+
+    def set_enabled(self, enabled):
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        if not enabled:
+            try:
+                self.host.clear_reference(self.target)
+            except Exception as e:
+                print(f"清除3ds Max参考画面失败: {e}")
+        self.reset()
+
+    def set_target(self, target):
+        if target == self.target:
+            return
+        if self.enabled:
+            try:
+                self.host.clear_reference(self.target)
+            except Exception as e:
+                print(f"清除3ds Max参考画面失败: {e}")
+        self.target = target
+        self.reset()
+
+    def reset(self):
+        """换视频或换目标后，下一次show必定重新上传"""
+        self._shown = -1
+        self._pending = -1
+
+    def show(self, index, redraw=False):
+        """显示第index帧；帧还不在缓存里时记下，等frame_cached再上传"""
+        if not self.enabled or index == self._shown or self.frame_source is None:
+            return
+        image = self.frame_source(index)
+        if image is None:
+            self._pending = index
+            return
+        self._pending = -1
+        self._upload(index, image, redraw)
+
+    def frame_cached(self, index):
+        """帧缓存通知：等待的帧已解码"""
+        if index == self._pending:
+            # 不在时间回调里，需要让宿主重绘
+            self.show(index, redraw=True)
+
+    def _upload(self, index, image, redraw):
+        path = cache_dir("reference") / f"frame{self._slot}.bmp"
+        self._slot = (self._slot + 1) % REFERENCE_FILE_COUNT
+        try:
+            if not image.save(str(path), "BMP"):
+                raise IOError(f"无法写入 {path}")
+            self.host.show_reference_image(str(path), self.target, redraw)
+            self._shown = index
+            self.uploads += 1
+        except Exception as e:
+            print(f"更新3ds Max参考画面失败: {e}")
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+# 抽样哈希时每段读取的字节数
+SAMPLE_SIZE = 1024 * 1024
+
+
+def cache_root():
+    """本工具所有磁盘缓存的根目录"""
+    base = os.environ.get("LOCALAPPDATA") or str(Path.home() / ".cache")
+    root = Path(base) / "PlayVideo"
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def cache_dir(name):
+    """缓存根目录下的子目录（proxy、thumbs等）"""
+    path = cache_root() / name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def temp_path(path, suffix=""):
+    """写入path时使用的临时文件名
+
+    带上进程号和线程号，多个线程或进程同时写同一个缓存文件时各写各的临时文件，
+    最后os.replace谁后完成谁生效，不会互相覆盖或删掉对方的临时文件。
+    suffix用于需要按扩展名判断格式的写入方（如".npz"、".mkv"）。
+    """
+    path = Path(path)
+    return path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp{suffix}")
+
+
+def content_key(file_path):
+    """视频内容的哈希键
+
+    对大文件整体做哈希太慢，这里取文件大小加上开头、中间、结尾各1MB做SHA1，
+    文件被改名或移动后仍能命中同一份缓存。
+    """
+    size = os.path.getsize(file_path)
+    digest = hashlib.sha1(str(size).encode("ascii"))
+    with open(file_path, "rb") as f:
+        for offset in (0, size // 2, max(0, size - SAMPLE_SIZE)):
+            f.seek(offset)
+            digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def touch(path):
+    """更新修改时间，作为LRU淘汰的依据"""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def enforce_size_cap(directory, max_bytes, keep=()):
+    """目录总大小超过上限时，按修改时间从旧到新删除文件"""
+    keep = {str(Path(p)) for p in keep}
+    entries = []
+    total = 0
+    for path in Path(directory).iterdir():
+        if not path.is_file():
+            continue
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        total += stat.st_size
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    entries.sort()
+    for mtime, size, path in entries:
+        if total <= max_bytes:
+            break
+        if str(path) in keep:
+            continue
+        try:
+            path.unlink()
+            total -= size
+        except OSError as e:
+            print(f"无法删除缓存文件 {path}: {e}")
+    return total
@@ -0,0 +1,301 @@
+import bisect
+import os
+from PySide6.QtCore import QPointF, QThread, Signal
+from PySide6.QtGui import QColor, QPainter, QPainterPath, QPen, QPolygonF
+
+from Code.frame_index import FrameIndex
+from Code.media_cache import cache_dir, content_key, enforce_size_cap, temp_path, touch
+from Code.parallel_decode import ParallelDecoder, default_workers
+from Code.proxy_builder import proxy_index
+from Code.track_widget import SliderTrackWidget
+
+# PyAV和NumPy都是可选依赖，缺失时不计算运动曲线
+try:
+    import av
+except ImportError:
+    av = None
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 做帧差的灰度小图尺寸，只需要看出整体动作的强弱
+MOTION_WIDTH = 64
+MOTION_HEIGHT = 36
+# 每攒够多少帧做一次向量化帧差
+MOTION_CHUNK = 256
+MOTION_CACHE_VERSION = 1
+MOTION_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def motion_available():
+    """是否安装了PyAV和NumPy"""
+    return av is not None and np is not None
+
+
+def find_extrema(energy, radius, prominence):
+    """找出曲线的局部极小值和极大值
+
+    一帧是radius帧范围内的最小（大）值，并且与该范围内的最大（小）值相差超过prominence时才算。
+    """
+    if len(energy) < 3:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    padded = np.pad(energy, radius, mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1)
+    low = windows.min(axis=1)
+    high = windows.max(axis=1)
+    minima = np.flatnonzero((energy <= low) & (high - energy > prominence))
+    maxima = np.flatnonzero((energy >= high) & (energy - low > prominence))
+    # 首尾帧因边界填充总会被当成极值，不算姿势
+    minima = minima[(minima > 0) & (minima < len(energy) - 1)]
+    maxima = maxima[(maxima > 0) & (maxima < len(energy) - 1)]
+    # 平台上相邻的多个相同值只保留第一个
+    minima = minima[np.insert(np.diff(minima) > 1, 0, True)] if len(minima) else minima
+    maxima = maxima[np.insert(np.diff(maxima) > 1, 0, True)] if len(maxima) else maxima
+    return minima, maxima
+
+
+class MotionCurve:
+    """逐帧运动能量及候选关键姿势（极小值为停顿/接触，极大值为动作最剧烈处）"""
+
+    def __init__(self, energy, minima, maxima, fps):
+        self.energy = energy  # float32数组，已归一化到0~1
+        self.minima = minima
+        self.maxima = maxima
+        self.fps = fps
+        self.poses = sorted(set(minima.tolist()) | set(maxima.tolist()))
+
+    @property
+    def frame_count(self):
+        return len(self.energy)
+
+    def next_pose(self, index, direction):
+        """index之后（direction=1）或之前（-1）最近的关键姿势帧，没有时返回None"""
+        if direction > 0:
+            i = bisect.bisect_right(self.poses, index)
+            return self.poses[i] if i < len(self.poses) else None
+        i = bisect.bisect_left(self.poses, index)
+        return self.poses[i - 1] if i > 0 else None
+
+    @classmethod
+    def from_energy(cls, raw, fps):
+        """由原始帧差计算平滑曲线和极值"""
+        raw = np.asarray(raw, dtype=np.float32)
+        # 约0.1秒的滑动平均，去掉压缩噪声造成的抖动
+        width = max(1, int(round(fps / 10)))
+        kernel = np.ones(width, np.float32) / width
+        smooth = np.convolve(raw, kernel, mode="same")
+        low, high = np.percentile(smooth, [2, 98]) if len(smooth) else (0.0, 1.0)
+        energy = np.clip((smooth - low) / max(high - low, 1e-6), 0.0, 1.0).astype(np.float32)
+        minima, maxima = find_extrema(energy, max(2, int(fps / 6)), 0.1)
+        return cls(energy, minima, maxima, fps)
+
+    @staticmethod
+    def cache_path(key):
+        return cache_dir("motion") / f"{key}.npz"
+
+    @classmethod
+    def load(cls, key):
+        path = cls.cache_path(key)
+        try:
+            with np.load(path) as data:
+                if int(data["version"]) != MOTION_CACHE_VERSION:
+                    return None
+                curve = cls(data["energy"], data["minima"], data["maxima"], float(data["fps"]))
+        except (OSError, ValueError, KeyError):
+            return None
+        touch(path)
+        return curve
+
+    def save(self, key):
+        path = self.cache_path(key)
+        # np.savez会给不以.npz结尾的文件名补上后缀，临时文件名也以.npz结尾
+        tmp_path = temp_path(path, ".npz")
+        try:
+            np.savez(tmp_path, version=MOTION_CACHE_VERSION, energy=self.energy,
+                     minima=self.minima, maxima=self.maxima, fps=self.fps)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        enforce_size_cap(path.parent, MOTION_CACHE_MAX_BYTES, keep=(path,))
+
+
+class MotionWorker(QThread):
+    """后台线程：顺序解码整段视频为灰度小图，计算逐帧运动能量"""
+
+    progress = Signal(int)  # 百分比
+    curveReady = Signal(str, object)  # (文件路径, MotionCurve)
+    curveFailed = Signal(str, str)  # (文件路径, 错误信息)
+
+    def __init__(self, file_path, decode_path=None, parent=None):
+        super().__init__(parent)
+        self.file_path = str(file_path)
+        self.decode_path = str(decode_path or file_path)  # 有代理时从代理解码，更快
+        self._cancelled = False
+
+    def cancel(self):
+        """只设置标志，不等待线程结束"""
+        self._cancelled = True
+
+    def run(self):
+        try:
+            key = content_key(self.file_path)
+            curve = MotionCurve.load(key)
+            if curve is None:
+                curve = self._compute()
+                if curve is None:
+                    return
+                try:
+                    curve.save(key)
+                except OSError as e:
+                    print(f"无法保存运动曲线缓存: {e}")
+            self.curveReady.emit(self.file_path, curve)
+        except Exception as e:
+            self.curveFailed.emit(self.file_path, str(e))
+
+    def _compute(self):
+        """被取消时返回None"""
+        if default_workers() > 1:
+            try:
+                return self._compute_from(self._parallel_chunks())
+            except Exception as e:
+                print(f"并行解码失败，改为顺序解码: {e}")
+        return self._compute_from(self._sequential_chunks())
+
+    def _compute_from(self, chunks):
+        """chunks逐块产出(灰度帧数组, 已解码帧数, 总帧数, 帧率)"""
+        raw = []
+        previous = None  # 上一块的最后一帧，与下一块的第一帧做差
+        fps = 30.0
+        try:
+            for frames, count, total, fps in chunks:
+                if self._cancelled:
+                    return None
+                previous = self._diff_chunk(frames, previous, raw)
+                if total:
+                    self.progress.emit(min(99, count * 100 // total))
+        finally:
+            chunks.close()
+        if not raw:
+            raise ValueError("视频中没有可用的帧")
+        energy = np.concatenate(raw)
+        # 第一帧没有前一帧，沿用第二帧的值
+        energy = np.concatenate([energy[:1], energy])
+        self.progress.emit(100)
+        return MotionCurve.from_energy(energy, fps)
+
+    def _parallel_chunks(self):
+        """按关键帧分块，在进程池中并行解码（与顺序解码相同：有代理时解码代理）"""
+        if self.decode_path == self.file_path:
+            index = FrameIndex.load_or_build(self.file_path)
+        else:
+            # 代理保留源时间戳，用代理自己的帧索引分块，帧序号与顺序解码一致
+            index = proxy_index(self.decode_path)
+            if index is None:
+                raise ValueError("代理没有帧索引")
+        decoder = ParallelDecoder(self.decode_path, index, MOTION_WIDTH, MOTION_HEIGHT, "gray")
+        fps = index.fps or 30.0
+        for first, frames in decoder.iter_chunks():
+            yield frames, first + len(frames), index.frame_count, fps
+
+    def _sequential_chunks(self):
+        """单核时顺序解码（有代理时解码代理）"""
+        container = av.open(self.decode_path)
+        try:
+            stream = container.streams.video[0]
+            stream.thread_type = "AUTO"
+            fps = float(stream.average_rate or stream.guessed_rate or 30)
+            total = stream.frames or 0
+            chunk = []
+            count = 0
+            for frame in container.decode(stream):
+                gray = frame.reformat(width=MOTION_WIDTH, height=MOTION_HEIGHT, format="gray")
+                chunk.append(gray.to_ndarray()[:, :MOTION_WIDTH])
+                count += 1
+                if len(chunk) >= MOTION_CHUNK:
+                    yield chunk, count, total, fps
+                    chunk = []
+            if chunk:
+                yield chunk, count, total, fps
+        finally:
+            container.close()
+
+    @staticmethod
+    def _diff_chunk(chunk, previous, raw):
+        """对一块帧做向量化帧差，返回这一块的最后一帧"""
+        frames = np.stack(chunk).astype(np.int16)
+        if previous is not None:
+            frames = np.concatenate([previous[None], frames])
+        if len(frames) > 1:
+            raw.append(np.abs(np.diff(frames, axis=0)).mean(axis=(1, 2)).astype(np.float32))
+        return frames[-1]
+
+
+class MotionCurveWidget(SliderTrackWidget):
+    """滑块下方的运动能量曲线，标出候选关键姿势，点击可跳转"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.curve = None
+        self._playhead = -1.0
+        self._columns = None  # (宽度, 每列的最大能量)，控件宽度不变时复用
+        self.setFixedHeight(28)
+        self.setToolTip("运动曲线：青色为停顿/接触姿势，红色为动作最剧烈处；按 , . 跳到上一个/下一个姿势")
+
+    def set_curve(self, curve):
+        self.curve = curve
+        self._columns = None
+        self.update()
+
+    def clear(self):
+        self.set_curve(None)
+        self._playhead = -1.0
+
+    def set_playhead(self, position):
+        self._playhead = position
+        self.update()
+
+    def _column_values(self, width):
+        """每个像素列内的最大能量（长视频一像素对应很多帧时不丢掉峰值）"""
+        if self._columns is not None and self._columns[0] == width:
+            return self._columns[1]
+        energy = self.curve.energy
+        edges = np.linspace(0, len(energy), width + 1).astype(np.int64)
+        starts = np.minimum(edges[:-1], len(energy) - 1)
+        values = np.maximum.reduceat(energy, starts)
+        self._columns = (width, values)
+        return values
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        rect = self.contentsRect()
+        painter.fillRect(rect, QColor(45, 45, 45))
+        if self.curve is not None and self.curve.frame_count and rect.width() > 1:
+            values = self._column_values(rect.width())
+            bottom = rect.bottom()
+            height = rect.height() - 2
+            path = QPainterPath(QPointF(rect.left(), bottom))
+            for x, value in enumerate(values.tolist()):
+                path.lineTo(rect.left() + x, bottom - value * height)
+            path.lineTo(rect.left() + len(values) - 1, bottom)
+            painter.fillPath(path, QColor(90, 160, 90, 160))
+
+            scale = rect.width() / self.curve.frame_count
+            painter.setPen(QPen(QColor(0, 200, 220), 1))
+            for index in self.curve.minima.tolist():
+                x = rect.left() + index * scale
+                painter.drawPolygon(QPolygonF([QPointF(x, bottom - 5), QPointF(x - 3, bottom), QPointF(x + 3, bottom)]))
+            painter.setPen(QPen(QColor(230, 70, 60), 1))
+            for index in self.curve.maxima.tolist():
+                x = rect.left() + index * scale
+                painter.drawLine(QPointF(x, rect.top()), QPointF(x, rect.top() + 5))
+
+        if 0.0 <= self._playhead <= 1.0:
+            x = rect.left() + int(self._playhead * rect.width())
+            painter.setPen(QPen(QColor(255, 200, 0), 2))
+            painter.drawLine(x, rect.top(), x, rect.bottom())
+        painter.end()
@@ -0,0 +1,504 @@
+import math
+import os
+import time
+from pathlib import Path
+from PySide6.QtCore import QObject, Qt, QTimer, Signal
+from PySide6.QtWidgets import (QCheckBox, QFileDialog, QGridLayout, QHBoxLayout, QLabel, QMessageBox,
+                               QPushButton, QSlider, QSpinBox, QVBoxLayout, QWidget)
+
+from Code.audio_align import ALIGN_MIN_CONFIDENCE, AudioAligner, alignment_available
+from Code.base_window import detach_thread
+from Code.frame_cache import FrameCache
+from Code.frame_index import FrameIndex
+from Code.frame_prefetcher import FramePrefetcher
+from Code.frame_store import FrameStore
+from Code.frame_view import FrameView
+from Code.proxy_builder import find_proxy, proxy_index
+from Code.sync_scheduler import MaxSyncScheduler
+from Code.time_sync import MaxToVideoSync
+from Code.video_decoder import VideoDecoder
+
+# 所有机位共用的帧缓存内存上限，按机位数平分
+GRID_CACHE_BYTES = 768 * 1024 * 1024
+# seek后等待所有机位解码出目标帧的最长时间，超时后先显示已就绪的机位
+SEEK_BARRIER_MS = 300
+
+VIDEO_FILTER = "视频文件 (*.mp4 *.avi *.mov *.mkv *.wmv *.flv);;所有文件 (*.*)"
+
+
+class MasterClock(QObject):
+    """多机位共用的主时钟，所有机位的画面都按它的时间取帧"""
+
+    positionChanged = Signal(int)  # 主时间（毫秒）
+    stateChanged = Signal(bool)  # 是否正在播放
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.duration_ms = 0
+        self.playing = False
+        self.rate = 1.0
+        self._base_ms = 0
+        self._base_time = 0.0
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.setInterval(10)
+        self._timer.timeout.connect(self._tick)
+
+    def position(self):
+        """当前主时间（毫秒）"""
+        if not self.playing:
+            return self._base_ms
+        return int(self._base_ms + (time.perf_counter() - self._base_time) * 1000 * self.rate)
+
+    def play(self):
+        if self.playing:
+            return
+        if self.duration_ms and self._base_ms >= self.duration_ms:
+            self._base_ms = 0
+        self._base_time = time.perf_counter()
+        self.playing = True
+        self._timer.start()
+        self.stateChanged.emit(True)
+
+    def pause(self):
+        if not self.playing:
+            return
+        self._base_ms = self.position()
+        self.playing = False
+        self._timer.stop()
+        self.stateChanged.emit(False)
+
+    def seek(self, position_ms):
+        """跳到指定主时间，播放状态不变"""
+        position_ms = max(0, int(position_ms))
+        if self.duration_ms:
+            position_ms = min(position_ms, self.duration_ms)
+        self._base_ms = position_ms
+        self._base_time = time.perf_counter()
+        self.positionChanged.emit(position_ms)
+
+    def _tick(self):
+        position_ms = self.position()
+        if self.duration_ms and position_ms >= self.duration_ms:
+            self.pause()
+            self.seek(self.duration_ms)
+            return
+        self.positionChanged.emit(position_ms)
+
+
+class AngleClip:
+    """网格中的一个机位：解码器、帧缓存、后台解码线程和画面控件"""
+
+    def __init__(self, file_path, cache_bytes, thread_count=0):
+        self.file_path = str(file_path)
+        self.offset_ms = 0  # 机位时间 = 主时间 + 偏移
+        self.wanted = -1  # 当前主时间对应的帧，-1表示不在视频范围内
+
+        # 有代理时从代理解码（全关键帧，多路同时seek更快）；否则只用已建好的帧索引，不在这里扫描文件
+        proxy = find_proxy(file_path)
+        if proxy:
+            self.decoder = VideoDecoder(proxy, frame_index=proxy_index(proxy), thread_count=thread_count)
+        else:
+            self.decoder = VideoDecoder(file_path, frame_index=FrameIndex.load(file_path),
+                                        thread_count=thread_count)
+        self.cache = FrameCache(max_bytes=cache_bytes)
+        try:
+            self.store = FrameStore.open(file_path, self.decoder.width, self.decoder.height,
+                                         self.decoder.frame_count, proxy)
+        except (OSError, ValueError) as e:
+            print(f"无法打开磁盘帧仓库: {e}")
+            self.store = None
+        self.prefetcher = FramePrefetcher(self.decoder, self.cache, store=self.store)
+        self.view = FrameView()
+
+    @property
+    def name(self):
+        return Path(self.file_path).name
+
+    def end_ms(self):
+        """该机位在主时间轴上结束的位置"""
+        return self.decoder.duration_ms - self.offset_ms
+
+    def index_at(self, master_ms):
+        """主时间对应的帧序号，超出视频范围时返回-1"""
+        local_ms = master_ms + self.offset_ms
+        if local_ms < 0 or (self.decoder.duration_ms and local_ms > self.decoder.duration_ms):
+            return -1
+        return self.decoder.ms_to_index(local_ms)
+
+    def frame(self, index):
+        """从内存缓存或磁盘仓库取帧，都没有时返回None"""
+        image = self.cache.get(index)
+        if image is None and self.store is not None:
+            image = self.store.get(index)
+            if image is not None:
+                self.cache.put(index, image)
+        return image
+
+    def close(self):
+        self.prefetcher.stop()
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+        self.cache.clear()
+
+
+class MultiAngleWindow(QWidget):
+    """多机位同步播放：N个视频共用一个主时钟，每个机位有独立的帧偏移
+
+    每个机位各有一个后台解码线程，FFmpeg的解码线程数按机位数平分CPU核数；
+    暂停时的seek等所有机位都解码出目标帧后一起显示，保证画面是同一时刻。
+    主时间和3ds Max时间轴双向同步，方式与单视频播放器相同。画面只有视频，不播放声音。
+    """
+
+    def __init__(self, host, parent=None):
+        super().__init__(parent)
+        self.host = host
+        self.clips = []
+        self._callback_registered = False
+        self._syncing_from_max = False  # 正在显示Max时间对应的画面，不再回写Max
+        self.last_open_dir = str(Path.home() / "Videos")
+        self.aligner = None
+
+        self.clock = MasterClock(self)
+        self.sync_scheduler = MaxSyncScheduler(self.host.set_time, parent=self)
+        self.max_to_video = MaxToVideoSync(self.host, self.frames_to_ms, self.show_max_position)
+
+        # seek同步：等待所有机位就绪
+        self._barrier_pending = False
+        self.barrier_timer = QTimer(self)
+        self.barrier_timer.setSingleShot(True)
+        self.barrier_timer.setInterval(SEEK_BARRIER_MS)
+        self.barrier_timer.timeout.connect(self.present_ready)
+
+        self._build_ui()
+        self.clock.positionChanged.connect(self.on_clock_position)
+        self.clock.stateChanged.connect(self.on_clock_state)
+        self.setWindowTitle('个人模仿秀 - 多机位')
+
+    def _build_ui(self):
+        self.grid = QGridLayout()
+        self.grid.setSpacing(2)
+
+        self.play_Button = QPushButton("播放")
+        self.play_Button.setEnabled(False)
+        self.slider = QSlider(Qt.Horizontal)
+        self.slider.setEnabled(False)
+        self.time_label = QLabel("00:00 / 00:00")
+        self.syncFromMax_CheckBox = QCheckBox("从Max同步")
+        self.syncToMax_CheckBox = QCheckBox("同步到Max")
+        self.addVideo_Button = QPushButton("添加视频")
+        self.align_Button = QPushButton("音频对齐")
+        self.align_Button.setToolTip("按音频把所有机位对齐到第一个机位")
+        self.align_Button.setEnabled(False)
+
+        controls = QHBoxLayout()
+        controls.addWidget(self.play_Button)
+        controls.addWidget(self.slider)
+        controls.addWidget(self.time_label)
+        controls.addWidget(self.syncFromMax_CheckBox)
+        controls.addWidget(self.syncToMax_CheckBox)
+        controls.addWidget(self.addVideo_Button)
+        controls.addWidget(self.align_Button)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        layout.addLayout(self.grid, 1)
+        layout.addLayout(controls)
+
+        self.play_Button.clicked.connect(self.toggle_play)
+        self.slider.sliderPressed.connect(self.clock.pause)
+        self.slider.valueChanged.connect(self.on_slider_value)
+        self.addVideo_Button.clicked.connect(self.select_videos)
+        self.align_Button.clicked.connect(self.align_by_audio)
+        self.syncFromMax_CheckBox.toggled.connect(self.on_sync_mode_changed)
+        self.syncToMax_CheckBox.toggled.connect(self.on_sync_mode_changed)
+
+    # ========== 机位管理 ==========
+
+    def select_videos(self):
+        """选择要加入网格的视频（可多选）"""
+        files, _ = QFileDialog.getOpenFileNames(self, "选择多个机位的视频", self.last_open_dir, VIDEO_FILTER)
+        if files:
+            self.last_open_dir = str(Path(files[0]).parent)
+            self.open_clips([clip.file_path for clip in self.clips] + files)
+
+    def open_clips(self, file_paths):
+        """按新的文件列表重建所有机位，已有机位保留原来的偏移"""
+        offsets = {clip.file_path: clip.offset_ms for clip in self.clips}
+        position_ms = self.clock.position()
+        self.clock.pause()
+        self.close_clips()
+
+        file_paths = list(dict.fromkeys(str(p) for p in file_paths))
+        if not file_paths:
+            return
+        cache_bytes = GRID_CACHE_BYTES // len(file_paths)
+        thread_count = max(1, (os.cpu_count() or 4) // len(file_paths))
+        for file_path in file_paths:
+            try:
+                clip = AngleClip(file_path, cache_bytes, thread_count)
+            except Exception as e:
+                QMessageBox.warning(self, "错误", f"无法打开视频:\n{file_path}\n{str(e)}")
+                continue
+            clip.offset_ms = offsets.get(file_path, 0)
+            clip.prefetcher.frameReady.connect(lambda index, clip=clip: self.on_frame_cached(clip, index))
+            clip.prefetcher.start()
+            self.clips.append(clip)
+
+        self._layout_clips()
+        self.update_duration()
+        enabled = bool(self.clips)
+        self.play_Button.setEnabled(enabled)
+        self.align_Button.setEnabled(len(self.clips) > 1 and self.aligner is None)
+        self.slider.setEnabled(enabled)
+        self.register_max_callback()
+        self.clock.seek(position_ms)
+
+    def close_clips(self):
+        """停止所有机位的解码线程并移除画面"""
+        self.barrier_timer.stop()
+        self._barrier_pending = False
+        while self.grid.count():
+            item = self.grid.takeAt(0)
+            if item.widget() is not None:
+                item.widget().deleteLater()
+        for clip in self.clips:
+            clip.close()
+        self.clips = []
+
+    def _layout_clips(self):
+        """按接近正方形的行列数排列机位"""
+        columns = max(1, math.ceil(math.sqrt(len(self.clips))))
+        for i, clip in enumerate(self.clips):
+            cell = QWidget()
+            cell_layout = QVBoxLayout(cell)
+            cell_layout.setContentsMargins(0, 0, 0, 0)
+            cell_layout.setSpacing(2)
+            cell_layout.addWidget(clip.view, 1)
+
+            row = QHBoxLayout()
+            name_label = QLabel(clip.name)
+            offset_box = QSpinBox()
+            offset_box.setRange(-100000, 100000)
+            offset_box.setPrefix("偏移 ")
+            offset_box.setSuffix(" 帧")
+            offset_box.setValue(self.ms_to_frames(clip.offset_ms))
+            offset_box.valueChanged.connect(lambda frames, clip=clip: self.set_clip_offset(clip, frames))
+            clip.offset_box = offset_box
+            row.addWidget(name_label, 1)
+            row.addWidget(offset_box)
+            cell_layout.addLayout(row)
+
+            self.grid.addWidget(cell, i // columns, i % columns)
+
+    def set_clip_offset(self, clip, frames):
+        """设置机位相对主时间的偏移（Max帧）"""
+        clip.offset_ms = self.frames_to_ms(frames)
+        self.update_duration()
+        if not self.clock.playing:
+            self.clock.seek(self.clock.position())
+
+    def set_offsets(self, offsets):
+        """批量设置偏移：{文件路径: 毫秒}，用于自动对齐（保留帧以下的精度）"""
+        for clip in self.clips:
+            if clip.file_path not in offsets:
+                continue
+            clip.offset_ms = int(round(offsets[clip.file_path]))
+            clip.offset_box.blockSignals(True)
+            clip.offset_box.setValue(self.ms_to_frames(clip.offset_ms))
+            clip.offset_box.blockSignals(False)
+        self.update_duration()
+        if not self.clock.playing:
+            self.clock.seek(self.clock.position())
+
+    def align_by_audio(self):
+        """后台按音频互相关计算各机位偏移，以第一个机位为参考"""
+        if not alignment_available():
+            QMessageBox.warning(self, "错误", "音频对齐需要PyAV和NumPy")
+            return
+        if len(self.clips) < 2 or self.aligner is not None:
+            return
+        paths = [clip.file_path for clip in self.clips]
+        self.aligner = AudioAligner(paths[0], paths[1:], self)
+        self.aligner.alignReady.connect(self.on_align_ready)
+        self.aligner.alignFailed.connect(self.on_align_failed)
+        self.aligner.finished.connect(self.on_align_finished)
+        self.align_Button.setEnabled(False)
+        self.align_Button.setText("对齐中...")
+        self.aligner.start()
+
+    def on_align_ready(self, results):
+        self.set_offsets({path: offset_ms for path, (offset_ms, confidence) in results.items()})
+        unsure = [Path(path).name for path, (offset_ms, confidence) in results.items()
+                  if confidence < ALIGN_MIN_CONFIDENCE]
+        if unsure:
+            QMessageBox.warning(self, "音频对齐", "以下机位的音频相关性较弱，请检查偏移:\n" + "\n".join(unsure))
+
+    def on_align_failed(self, error):
+        QMessageBox.warning(self, "音频对齐", f"音频对齐失败:\n{error}")
+
+    def on_align_finished(self):
+        self.aligner.deleteLater()
+        self.aligner = None
+        self.align_Button.setText("音频对齐")
+        self.align_Button.setEnabled(len(self.clips) > 1)
+
+    def update_duration(self):
+        """主时间轴长度取所有机位结束位置的最大值"""
+        duration = max([clip.end_ms() for clip in self.clips] or [0])
+        self.clock.duration_ms = max(0, duration)
+        self.max_to_video.duration_ms = self.clock.duration_ms
+        self.slider.blockSignals(True)
+        self.slider.setRange(0, self.clock.duration_ms)
+        self.slider.blockSignals(False)
+
+    # ========== 播放与取帧 ==========
+
+    def toggle_play(self):
+        if self.clock.playing:
+            self.clock.pause()
+        else:
+            self.clock.play()
+
+    def on_clock_state(self, playing):
+        self.play_Button.setText("暂停" if playing else "播放")
+
+    def on_slider_value(self, position_ms):
+        """拖动滑块时暂停并跳转"""
+        self.clock.pause()
+        self.clock.seek(position_ms)
+
+    def on_clock_position(self, position_ms):
+        """主时间改变：所有机位同时取帧"""
+        for clip in self.clips:
+            clip.wanted = clip.index_at(position_ms)
+            if clip.wanted >= 0:
+                clip.prefetcher.set_playhead(clip.wanted)
+
+        if self.clock.playing:
+            # 播放时各机位有帧就显示，个别机位来不及解码时保留上一帧
+            self.present_ready()
+        else:
+            self._barrier_pending = True
+            self.barrier_timer.start()
+            self.present_if_all_ready()
+
+        self.slider.blockSignals(True)
+        self.slider.setValue(position_ms)
+        self.slider.blockSignals(False)
+        self.time_label.setText(f"{self.format_time(position_ms)} / {self.format_time(self.clock.duration_ms)}")
+        if not self._syncing_from_max:
+            self.sync_video_to_max(position_ms)
+
+    def on_frame_cached(self, clip, index):
+        """后台解码出某机位等待的帧"""
+        if index != clip.wanted:
+            return
+        if self._barrier_pending:
+            self.present_if_all_ready()
+        else:
+            self.present_clip(clip)
+
+    def present_if_all_ready(self):
+        """所有机位都有目标帧时一起显示"""
+        for clip in self.clips:
+            if clip.wanted >= 0 and not clip.cache.contains(clip.wanted) and \
+                    (clip.store is None or not clip.store.contains(clip.wanted)):
+                return
+        self.present_ready()
+
+    def present_ready(self):
+        """显示所有已就绪的机位"""
+        self.barrier_timer.stop()
+        self._barrier_pending = False
+        for clip in self.clips:
+            self.present_clip(clip)
+
+    def present_clip(self, clip):
+        if clip.wanted < 0:
+            clip.view.clear()
+            return
+        if clip.view.frame_index == clip.wanted:
+            return
+        image = clip.frame(clip.wanted)
+        if image is not None:
+            clip.view.set_frame(clip.wanted, image)
+
+    # ========== 3ds Max 同步 ==========
+
+    def frames_to_ms(self, frames):
+        return int(frames * 1000 / max(1, self.host.frame_rate()))
+
+    def ms_to_frames(self, ms):
+        return int(round(ms * max(1, self.host.frame_rate()) / 1000))
+
+    def format_time(self, ms):
+        seconds = int(ms // 1000)
+        return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+    def on_sync_mode_changed(self, checked):
+        """两个方向的同步只能开一个"""
+        if not self.syncToMax_CheckBox.isChecked():
+            # 丢弃还没写入Max的请求，否则会被“从Max同步”读回来
+            self.sync_scheduler.cancel()
+        if not checked:
+            return
+        other = self.syncToMax_CheckBox if self.sender() is self.syncFromMax_CheckBox else self.syncFromMax_CheckBox
+        other.blockSignals(True)
+        other.setChecked(False)
+        other.blockSignals(False)
+        if other is self.syncToMax_CheckBox:
+            self.sync_scheduler.cancel()
+
+    def register_max_callback(self):
+        if self._callback_registered:
+            return
+        try:
+            self.host.register_time_callback(self.on_max_time_changed, owner="MultiAngle")
+            self._callback_registered = True
+        except Exception as e:
+            print(f"无法注册3ds Max时间变化回调: {e}")
+
+    def unregister_max_callback(self):
+        if not self._callback_registered:
+            return
+        try:
+            self.host.unregister_time_callback(self.on_max_time_changed)
+        except Exception:
+            pass
+        self._callback_registered = False
+
+    def sync_video_to_max(self, position_ms):
+        """主时间同步到Max（交给调度器合并、限速后写入）"""
+        if self.syncToMax_CheckBox.isChecked():
+            self.sync_scheduler.request(self.ms_to_frames(position_ms))
+
+    def on_max_time_changed(self):
+        """3ds Max时间改变时的回调"""
+        try:
+            self.sync_scheduler.note_max_time(self.host.get_time())
+        except Exception:
+            pass
+        self.max_to_video.enabled = self.syncFromMax_CheckBox.isChecked() and bool(self.clips)
+        self.max_to_video.on_time_changed()
+
+    def show_max_position(self, position_ms):
+        """显示Max时间对应的各机位画面"""
+        self.clock.pause()
+        self._syncing_from_max = True
+        try:
+            self.clock.seek(position_ms)
+        finally:
+            self._syncing_from_max = False
+
+    def closeEvent(self, event):
+        if self.aligner is not None:
+            # 音频对齐无法中途取消，不等待，脱离窗口运行到结束后自行释放
+            detach_thread(self.aligner)
+            self.aligner = None
+        self.clock.pause()
+        self.sync_scheduler.cancel()
+        self.unregister_max_callback()
+        self.close_clips()
+        super().closeEvent(event)
@@ -0,0 +1,15 @@
+# QtMultimedia导入和初始化后端都较慢，第一次打开视频时才导入。
+# 导入结果放在这个模块里：Max里再次运行脚本会重新执行PlayVideo.py的顶层代码，
+# 而Code模块已在sys.modules里，不会被重置，复用的窗口仍能拿到已导入的类
+QMediaPlayer = None
+QVideoWidget = None
+
+
+def import_multimedia():
+    """导入QtMultimedia，返回(QMediaPlayer, QVideoWidget)"""
+    global QMediaPlayer, QVideoWidget
+    if QMediaPlayer is None:
+        from PySide6.QtMultimedia import QMediaPlayer as player_class
+        from PySide6.QtMultimediaWidgets import QVideoWidget as widget_class
+        QMediaPlayer, QVideoWidget = player_class, widget_class
+    return QMediaPlayer, QVideoWidget
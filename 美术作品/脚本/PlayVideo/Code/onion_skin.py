@@ -0,0 +1,114 @@
+from collections import OrderedDict
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImage
+
+# NumPy为可选依赖，缺失时洋葱皮不可用
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 合成在缩小后的画面上进行，只用于看间距，不需要原始分辨率
+ONION_MAX_HEIGHT = 360
+ONION_MAX_COUNT = 8
+# 每个像素上所有残影的不透明度之和的上限，保证当前帧始终清晰可辨
+ONION_MAX_WEIGHT = 0.75
+# 残影只画在与当前帧不同的地方，亮度差达到1/ONION_DIFF_GAIN时完全显示，静止的背景不被染色
+ONION_DIFF_GAIN = 4.0
+# 前面的帧偏红，后面的帧偏蓝，与Max的残影颜色习惯一致
+ONION_PAST_TINT = (255, 90, 70)
+ONION_FUTURE_TINT = (70, 170, 255)
+
+
+def onion_available():
+    """是否安装了NumPy"""
+    return np is not None
+
+
+def image_to_array(image, width, height):
+    """把QImage缩放到width x height并转换为(高, 宽, 3)的uint8数组"""
+    if image.width() != width or image.height() != height:
+        image = image.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    if image.format() != QImage.Format_RGB888:
+        image = image.convertToFormat(QImage.Format_RGB888)
+    line = image.bytesPerLine()
+    data = np.frombuffer(image.constBits(), np.uint8, count=line * height).reshape(height, line)
+    # 去掉行尾的对齐填充
+    return data[:, :width * 3].reshape(height, width, 3).copy()
+
+
+class OnionSkin:
+    """洋葱皮：把当前帧前后count帧的残影按衰减权重叠加到当前帧上
+
+    邻近帧只从调用方给的来源（帧缓存或区间缓冲）中取，取不到就跳过，不会触发解码或seek；
+    缩小后的帧按帧序号保留一小批，拖动时相邻位置的合成大多不需要重新取帧和缩放。
+    来源改变（换视频、进出区间播放）时要调用clear()。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.count = 2
+        self.falloff = 0.6  # 每远一帧权重乘以该值
+        self.opacity = 0.5  # 最近一帧残影的权重
+        self._small = OrderedDict()  # (帧序号, 宽, 高) -> 缩小后的数组
+
+    def weights(self):
+        """距离1~count的残影权重"""
+        return self.opacity * self.falloff ** np.arange(self.count, dtype=np.float32)
+
+    def clear(self):
+        self._small.clear()
+
+    def _array(self, index, image, width, height):
+        """缩小后的第index帧；已有时不再调用image（可为返回QImage的函数）"""
+        key = (index, width, height)
+        array = self._small.get(key)
+        if array is None:
+            if callable(image):
+                image = image(index)
+                if image is None:
+                    return None
+            array = image_to_array(image, width, height)
+            self._small[key] = array
+            while len(self._small) > 2 * (2 * ONION_MAX_COUNT + 1):
+                self._small.popitem(last=False)
+        else:
+            self._small.move_to_end(key)
+        return array
+
+    def compose(self, index, image, source):
+        """合成第index帧的洋葱皮画面；source(帧序号)返回该帧的QImage，没有缓存时返回None"""
+        if not self.enabled or self.count <= 0 or image is None or image.height() <= 0:
+            return image
+        height = min(ONION_MAX_HEIGHT, image.height())
+        width = max(2, int(image.width() * height / image.height()))
+
+        ghosts = []
+        tints = []
+        layer_weights = []
+        weights = self.weights()
+        for distance in range(1, self.count + 1):
+            for sign, tint in ((-1, ONION_PAST_TINT), (1, ONION_FUTURE_TINT)):
+                ghost = self._array(index + sign * distance, source, width, height)
+                if ghost is None:
+                    continue
+                ghosts.append(ghost)
+                tints.append(tint)
+                layer_weights.append(weights[distance - 1])
+        if not ghosts:
+            return image
+
+        coefficients = np.array([0.299, 0.587, 0.114], np.float32) / 255
+        base = self._array(index, image, width, height).astype(np.float32)
+        base_luma = base @ coefficients
+        # 残影取亮度再着色，前后帧一眼可分
+        luma = np.stack(ghosts).astype(np.float32) @ coefficients
+        # 每层每个像素的不透明度：层权重 x 与当前帧的差异
+        alpha = np.array(layer_weights, np.float32)[:, None, None] * np.minimum(
+            np.abs(luma - base_luma) * ONION_DIFF_GAIN, 1.0)
+        total = alpha.sum(axis=0)
+        alpha *= np.minimum(1.0, ONION_MAX_WEIGHT / np.maximum(total, 1e-6))
+        tinted = np.tensordot(np.array(tints, np.float32), alpha * luma, axes=([0], [0]))
+        result = base * (1 - alpha.sum(axis=0))[..., None] + np.moveaxis(tinted, 0, -1)
+        result = np.clip(result, 0, 255).astype(np.uint8)
+        return QImage(result.data, width, height, width * 3, QImage.Format_RGB888).copy()
@@ -0,0 +1,257 @@
+"""按关键帧分块、多进程并行解码整段视频（供运动曲线、导出等整片分析使用）
+
+本模块不导入Qt：进程池的子进程只需要PyAV和NumPy。
+"""
+import atexit
+import os
+import sys
+import threading
+import types
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing.context import SpawnContext, SpawnProcess
+
+# PyAV和NumPy都是可选依赖，缺失时不能并行解码
+try:
+    import av
+except ImportError:
+    av = None
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 相邻的GOP合并成一块，每块至少这么多帧，减少进程间往返
+CHUNK_MIN_FRAMES = 64
+# 每块结果的大致内存上限，帧较大时块也相应变小
+CHUNK_MAX_BYTES = 64 * 1024 * 1024
+# 每个子进程最多同时排队的块数，消费者跟不上时不再提交新块（背压）
+PENDING_PER_WORKER = 2
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+# 子进程中复用的容器，连续的块来自同一个文件时不必重复打开
+_worker_container = None
+_worker_path = None
+
+
+def parallel_available():
+    """是否安装了PyAV和NumPy"""
+    return av is not None and np is not None
+
+
+def default_workers():
+    """进程池大小：单核机器上并行没有意义，返回1表示在调用线程内顺序解码"""
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+@contextmanager
+def _bare_main():
+    """启动子进程期间把__main__换成空模块
+
+    spawn方式的子进程会先重新执行父进程__main__对应的脚本。在Max里那是PlayVideo.py
+    （导入pymxs、创建窗口），子进程里执行必然失败，进程池随之损坏。
+    换成没有__file__的空模块后，子进程不执行任何脚本，只在取任务时导入本模块。
+    """
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+class _DecodeProcess(SpawnProcess):
+    """进程池的子进程：每次启动（包括替换意外退出的子进程）都不带上父进程的主脚本"""
+
+    def start(self):
+        with _bare_main():
+            super().start()
+
+
+class _DecodeContext(SpawnContext):
+    Process = _DecodeProcess
+
+
+def decode_pool(workers):
+    """共享的解码进程池，首次使用时创建；workers变化时重建"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None and _pool_workers == workers:
+            return _pool
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        from Code.engine_process import find_python
+        context = _DecodeContext()
+        python = find_python()
+        if python is None:
+            raise RuntimeError("找不到python.exe，无法启动解码进程池")
+        # 在3ds Max里sys.executable是3dsmax.exe，子进程必须用真正的python启动
+        context.set_executable(python)
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    """关闭共享进程池（窗口关闭或退出时调用）"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+            _pool_workers = 0
+
+
+atexit.register(shutdown_pool)
+
+
+def _open_worker_container(path):
+    global _worker_container, _worker_path
+    if _worker_path != path:
+        if _worker_container is not None:
+            _worker_container.close()
+        _worker_container = av.open(path)
+        _worker_path = path
+        stream = _worker_container.streams.video[0]
+        # 并行来自多个进程，每个进程内单线程解码，避免线程数超过核数
+        stream.codec_context.thread_count = 1
+    return _worker_container
+
+
+def iter_chunk_frames(container, seek_pts, chunk_pts, width, height, pix_fmt):
+    """从关键帧seek_pts开始解码，按顺序产出chunk_pts各帧的(块内序号, 缩放后的uint8数组)
+
+    可变帧率等原因缺失的帧用前一帧补上（开头缺失时用第一张解出的帧）。
+    """
+    stream = container.streams.video[0]
+    container.seek(seek_pts, stream=stream, backward=True)
+    wanted = {pts: i for i, pts in enumerate(chunk_pts)}
+    last_pts = chunk_pts[-1]
+    next_i = 0
+    image = None
+    for frame in container.decode(stream):
+        if frame.pts is None:
+            continue
+        i = wanted.get(frame.pts)
+        if i is not None and i >= next_i:
+            # 输出的行可能有对齐填充
+            image = frame.reformat(width=width, height=height, format=pix_fmt).to_ndarray()[:, :width]
+            while next_i <= i:
+                yield next_i, image
+                next_i += 1
+        if frame.pts >= last_pts:
+            break
+    if image is None:
+        raise ValueError(f"解码失败：在PTS {seek_pts} 之后没有画面")
+    while next_i < len(chunk_pts):
+        yield next_i, image
+        next_i += 1
+
+
+def stack_frames(frames, count, arg):
+    """默认的块任务：把整块的帧收集为(帧数, 高, 宽[, 3])数组"""
+    result = None
+    for i, image in frames:
+        if result is None:
+            result = np.empty((count,) + image.shape, np.uint8)
+        result[i] = image
+    return result
+
+
+def run_chunk(task, arg, path, seek_pts, chunk_pts, width, height, pix_fmt, container=None):
+    """解码一块并交给task(帧迭代器, 帧数, arg)处理；不传container时使用子进程中缓存的容器"""
+    if container is None:
+        container = _open_worker_container(path)
+    frames = iter_chunk_frames(container, seek_pts, chunk_pts, width, height, pix_fmt)
+    return task(frames, len(chunk_pts), arg)
+
+
+class ParallelDecoder:
+    """把一个视频按帧索引的关键帧切成块，交给进程池并行解码，按顺序取回结果
+
+    iter_chunks/iter_frames是生成器：同时在途的块数有上限，消费者处理得慢时不会堆积内存；
+    生成器被关闭（break或异常）时取消尚未开始的块。
+    帧较大（如按源分辨率导出）时可以传入task，在子进程里直接处理整块的帧，只把结果传回。
+    """
+
+    def __init__(self, file_path, frame_index, width, height, pix_fmt="rgb24", workers=None):
+        if not parallel_available():
+            raise ImportError("未安装PyAV或NumPy，请先执行 pip install av numpy")
+        self.file_path = str(file_path)
+        self.frame_index = frame_index
+        self.width = width
+        self.height = height
+        self.pix_fmt = pix_fmt
+        self.workers = workers or default_workers()
+        frame_bytes = width * height * (1 if pix_fmt == "gray" else 3)
+        self.chunk_frames = max(1, min(CHUNK_MIN_FRAMES, CHUNK_MAX_BYTES // max(1, frame_bytes)))
+
+    def chunks(self, start=0, end=None):
+        """start~end（包含）之间的块[(首帧, 末帧)]，每块从关键帧开始，短GOP合并到chunk_frames帧以上"""
+        index = self.frame_index
+        end = index.frame_count - 1 if end is None else min(end, index.frame_count - 1)
+        chunks = []
+        first = max(0, start)
+        while first <= end:
+            last = index.keyframe_after(first) - 1
+            while last - first + 1 < self.chunk_frames and last < end:
+                last = index.keyframe_after(last + 1) - 1
+            last = min(last, end)
+            chunks.append((first, last))
+            first = last + 1
+        return chunks
+
+    def _job(self, first, last, task, task_arg):
+        index = self.frame_index
+        seek_pts = index.pts[index.keyframe_before(first)]
+        arg = task_arg(first, last) if task_arg is not None else None
+        return (task, arg, self.file_path, seek_pts, index.pts[first:last + 1], self.width, self.height, self.pix_fmt)
+
+    def iter_chunks(self, start=0, end=None, task=stack_frames, task_arg=None):
+        """按顺序逐块产出(首帧序号, 结果)
+
+        默认结果是该块的帧数组；task须为模块级函数（子进程要能导入），以task(帧迭代器, 帧数, 参数)调用，
+        参数由task_arg(首帧, 末帧)给出。
+        """
+        return self.iter_chunk_list(self.chunks(start, end), task, task_arg)
+
+    def iter_chunk_list(self, chunks, task=stack_frames, task_arg=None):
+        """与iter_chunks相同，但按给定的块列表[(首帧, 末帧)]解码（如续传时只解码缺少的部分）"""
+        chunks = deque(chunks)
+        if self.workers <= 1:
+            # 在调用线程内顺序解码，用自己的容器，不与其他线程共用
+            container = av.open(self.file_path)
+            try:
+                for first, last in chunks:
+                    yield first, run_chunk(*self._job(first, last, task, task_arg), container=container)
+            finally:
+                container.close()
+            return
+
+        pool = decode_pool(self.workers)
+        pending = deque()
+        try:
+            while chunks and len(pending) < self.workers * PENDING_PER_WORKER:
+                first, last = chunks.popleft()
+                pending.append((first, pool.submit(run_chunk, *self._job(first, last, task, task_arg))))
+            while pending:
+                first, future = pending.popleft()
+                result = future.result()
+                # 先补交下一块再交出结果，消费者处理时进程池不空闲
+                if chunks:
+                    next_first, next_last = chunks.popleft()
+                    pending.append((next_first, pool.submit(run_chunk, *self._job(next_first, next_last, task, task_arg))))
+                yield first, result
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def iter_frames(self, start=0, end=None):
+        """按顺序逐帧产出(帧序号, 帧数组)"""
+        for first, frames in self.iter_chunks(start, end):
+            for offset in range(len(frames)):
+                yield first + offset, frames[offset]
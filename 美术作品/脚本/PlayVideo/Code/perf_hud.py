@@ -0,0 +1,144 @@
+import time
+from collections import defaultdict, deque
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import QLabel
+
+from Code.media_cache import cache_dir
+
+# 每个耗时指标保留的最近样本数，分位数按这些样本计算
+PERF_SAMPLE_WINDOW = 500
+# 每个速率指标保留的最近事件数（足够覆盖1秒内的解码帧）
+PERF_TICK_WINDOW = 1000
+# 浮层刷新、写日志的间隔
+PERF_HUD_INTERVAL_MS = 1000
+
+
+class PerfCounters:
+    """热路径上的轻量计数器
+
+    调用方一律写成 `if perf.enabled: perf.xxx(...)`，关闭时只多一次属性判断；
+    解码线程也会调用，这里只做deque追加和整数加法，不加锁。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self._ticks = defaultdict(lambda: deque(maxlen=PERF_TICK_WINDOW))
+        self._samples = defaultdict(lambda: deque(maxlen=PERF_SAMPLE_WINDOW))
+        self._counts = defaultdict(int)
+        self._started = {}
+
+    def tick(self, name):
+        """记录一次事件，用于计算每秒次数"""
+        self._ticks[name].append(time.perf_counter())
+
+    def count(self, name, n=1):
+        self._counts[name] += n
+
+    def sample(self, name, ms):
+        """记录一次耗时（毫秒）"""
+        self._samples[name].append(ms)
+
+    def start(self, name, key):
+        """开始一次以key标识的计时；上一次还没完成就被新的取代时记为丢弃"""
+        previous = self._started.get(name)
+        if previous is not None and previous[0] != key:
+            self._counts[name + "_dropped"] += 1
+        self._started[name] = (key, time.perf_counter())
+
+    def finish(self, name, key):
+        """key对应的计时完成"""
+        started = self._started.get(name)
+        if started is not None and started[0] == key:
+            del self._started[name]
+            self.sample(name, (time.perf_counter() - started[1]) * 1000)
+
+    def rate(self, name, window_s=1.0):
+        """最近window_s秒内每秒的事件数"""
+        ticks = self._ticks.get(name)
+        if not ticks:
+            return 0.0
+        since = time.perf_counter() - window_s
+        return sum(1 for t in list(ticks) if t >= since) / window_s
+
+    def counter(self, name):
+        return self._counts.get(name, 0)
+
+    def percentiles(self, name, quantiles=(0.5, 0.95, 0.99)):
+        """耗时的分位数，没有样本时返回None"""
+        samples = sorted(self._samples.get(name, ()))
+        if not samples:
+            return None
+        return [samples[min(len(samples) - 1, int(q * len(samples)))] for q in quantiles]
+
+
+# 全局计数器，各模块直接导入使用
+perf = PerfCounters()
+
+
+def format_percentiles(values):
+    if values is None:
+        return "-"
+    return "/".join(f"{v:.1f}" for v in values) + "ms"
+
+
+class PerfHud(QLabel):
+    """叠在画面左上角的性能浮层，同时把每次刷新的数值追加到缓存目录的perf/perf.log
+
+    memory_source() 返回[(名称, 字节数)]，由调用方汇总各缓存的占用。
+    """
+
+    def __init__(self, parent, memory_source=None):
+        super().__init__(parent)
+        self.memory_source = memory_source
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setStyleSheet("background-color: rgba(0, 0, 0, 160); color: #7CFC00;"
+                           "font-family: Consolas, monospace; padding: 4px;")
+        self.move(8, 8)
+        self.hide()
+        self._timer = QTimer(self)
+        self._timer.setInterval(PERF_HUD_INTERVAL_MS)
+        self._timer.timeout.connect(self.update_stats)
+
+    def set_enabled(self, enabled):
+        perf.enabled = enabled
+        if enabled:
+            perf.reset()
+            self._timer.start()
+            self.update_stats()
+            self.show()
+            self.raise_()
+        else:
+            self._timer.stop()
+            self.hide()
+
+    def stats_text(self):
+        hits = perf.counter("cache_hit")
+        store_hits = perf.counter("store_hit")
+        misses = perf.counter("cache_miss")
+        lookups = hits + store_hits + misses
+        hit_rate = f"{(hits + store_hits) * 100 // lookups}%" if lookups else "-"
+        lines = [
+            f"解码 {perf.rate('decode'):.0f} fps   绘制 {perf.rate('paint'):.0f} fps"
+            f"（p50/p95/p99 {format_percentiles(perf.percentiles('paint'))}）",
+            f"定位 p50/p95/p99 {format_percentiles(perf.percentiles('seek'))}"
+            f"   丢帧 {perf.counter('seek_dropped')}",
+            f"缓存命中 {hit_rate}（内存 {hits} 磁盘 {store_hits} 未命中 {misses}）",
+            f"同步Max p50/p95/p99 {format_percentiles(perf.percentiles('max_sync'))}",
+        ]
+        if self.memory_source is not None:
+            memory = "  ".join(f"{name} {size / (1024 * 1024):.0f}MB" for name, size in self.memory_source())
+            lines.append(f"内存 {memory}")
+        return "\n".join(lines)
+
+    def update_stats(self):
+        text = self.stats_text()
+        self.setText(text)
+        self.adjustSize()
+        try:
+            with open(cache_dir("perf") / "perf.log", "a", encoding="utf-8") as f:
+                f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')}\t{text.replace(chr(10), ' | ')}\n")
+        except OSError as e:
+            print(f"写入性能日志失败: {e}")
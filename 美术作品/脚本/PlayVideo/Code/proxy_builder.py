@@ -0,0 +1,159 @@
+import os
+from fractions import Fraction
+from PySide6.QtCore import QThread, Signal
+
+from Code.frame_index import FrameIndex
+from Code.media_cache import cache_dir, content_key, enforce_size_cap, temp_path, touch
+
+try:
+    import av
+except ImportError:
+    av = None
+
+# 代理文件的高度、码率和缓存目录上限
+PROXY_HEIGHT = 540
+PROXY_BIT_RATE = 20 * 1000 * 1000
+PROXY_CACHE_MAX_BYTES = 5 * 1024 * 1024 * 1024
+
+
+def proxy_path(file_path, key=None):
+    """代理文件在缓存目录中的路径（按内容哈希命名）"""
+    key = key or content_key(file_path)
+    return cache_dir("proxy") / f"{key}.mkv"
+
+
+def find_proxy(file_path):
+    """已生成的代理文件路径，不存在时返回None"""
+    if av is None:
+        return None
+    try:
+        path = proxy_path(file_path)
+    except OSError:
+        return None
+    if path.exists():
+        touch(path)
+        return str(path)
+    return None
+
+
+def proxy_index(proxy_file):
+    """代理自己的帧索引，没有时返回None
+
+    代理按内容哈希命名、生成后不再改变，LRU淘汰会更新它的修改时间，所以只核对大小。
+    """
+    return FrameIndex.load(proxy_file, check_mtime=False)
+
+
+class ProxyBuilder(QThread):
+    """后台线程：把视频转码为低分辨率、全关键帧（MJPEG）的代理文件
+
+    代理的每一帧都能独立解码，拖动和逐帧时只需解码一帧。
+    画面保留源文件的时间戳（可变帧率时也一样），Max帧与视频帧的换算在源文件和代理上一致；
+    代理自己的帧索引在生成时一起写好，解码代理时用FrameIndex.load(代理路径)读取。
+    """
+
+    progress = Signal(int)  # 0-100
+    proxyReady = Signal(str, str)  # (源文件, 代理文件)
+    proxyFailed = Signal(str, str)  # (源文件, 错误信息)
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = str(file_path)
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            path = proxy_path(self.file_path)
+            if not path.exists():
+                # 取消后旧线程可能还在收尾，重新打开同一视频时各写各的临时文件
+                tmp_path = temp_path(path, ".mkv")
+                try:
+                    done = self._transcode(str(tmp_path))
+                    if done:
+                        os.replace(tmp_path, path)
+                finally:
+                    if tmp_path.exists():
+                        tmp_path.unlink()
+                if not done:
+                    return
+                FrameIndex.build(path).save(path)
+                enforce_size_cap(path.parent, PROXY_CACHE_MAX_BYTES, keep=[path, FrameIndex.cache_path(path)])
+            elif proxy_index(path) is None:
+                FrameIndex.build(path).save(path)
+            touch(path)
+            self.proxyReady.emit(self.file_path, str(path))
+        except Exception as e:
+            self.proxyFailed.emit(self.file_path, str(e))
+
+    def _transcode(self, out_path):
+        """转码到out_path，被取消时返回False"""
+        # Matroska能保存任意时间戳，AVI只能按固定帧率存放
+        with av.open(self.file_path) as source, av.open(out_path, "w", format="matroska") as target:
+            video_in = source.streams.video[0]
+            video_in.thread_type = "AUTO"
+            fps = Fraction(video_in.average_rate or video_in.guessed_rate or 30)
+
+            scale = min(1.0, PROXY_HEIGHT / video_in.codec_context.height)
+            width = max(2, int(video_in.codec_context.width * scale) // 2 * 2)
+            height = max(2, int(video_in.codec_context.height * scale) // 2 * 2)
+
+            video_out = target.add_stream("mjpeg", rate=fps)
+            video_out.codec_context.time_base = video_in.time_base
+            video_out.width = width
+            video_out.height = height
+            video_out.pix_fmt = "yuvj420p"
+            video_out.bit_rate = PROXY_BIT_RATE
+
+            streams = [video_in]
+            audio_out = None
+            resampler = None
+            if source.streams.audio:
+                audio_in = source.streams.audio[0]
+                rate = audio_in.rate or 48000
+                audio_out = target.add_stream("pcm_s16le", rate=rate)
+                audio_out.layout = "stereo"
+                resampler = av.AudioResampler(format="s16", layout="stereo", rate=rate)
+                streams.append(audio_in)
+
+            if source.duration:
+                duration_s = source.duration / av.time_base
+            else:
+                duration_s = 0
+            total_frames = video_in.frames or int(duration_s * fps) or 1
+
+            frame_number = 0
+            start_pts = None
+            last_percent = -1
+            for packet in source.demux(*streams):
+                if self._cancelled:
+                    return False
+                for frame in packet.decode():
+                    if packet.stream.type == "video":
+                        if frame.pts is None:
+                            continue
+                        if start_pts is None:
+                            start_pts = frame.pts
+                        out_frame = frame.reformat(width=width, height=height, format="yuvj420p")
+                        # 保留源时间戳（从0开始），与源文件的帧索引逐帧对应
+                        out_frame.pts = frame.pts - start_pts
+                        out_frame.time_base = video_in.time_base
+                        frame_number += 1
+                        target.mux(video_out.encode(out_frame))
+                    else:
+                        for audio_frame in resampler.resample(frame):
+                            audio_frame.pts = None
+                            target.mux(audio_out.encode(audio_frame))
+
+                percent = min(99, frame_number * 100 // total_frames)
+                if percent != last_percent:
+                    last_percent = percent
+                    self.progress.emit(percent)
+
+            target.mux(video_out.encode(None))
+            if audio_out is not None:
+                target.mux(audio_out.encode(None))
+        self.progress.emit(100)
+        return True
@@ -0,0 +1,121 @@
+import math
+import threading
+from PySide6.QtCore import QThread, Signal
+from PySide6.QtGui import QImage
+
+from Code.video_decoder import VideoDecoder, frame_to_qimage
+
+# PyAV和NumPy都是可选依赖，缺失时放大只能放大缓存帧
+try:
+    import av
+except ImportError:
+    av = None
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 解码器按源分辨率输出（不缩小）
+ROI_SOURCE_HEIGHT = 1 << 16
+# 裁剪边界按4像素对齐，满足4:2:0色度子采样
+ROI_ALIGN = 4
+
+
+def roi_available():
+    """是否安装了PyAV和NumPy"""
+    return av is not None and np is not None
+
+
+def crop_box(region, source_width, source_height):
+    """相对坐标region=(x, y, w, h)对应的源像素范围(left, top, right, bottom)，按ROI_ALIGN对齐"""
+    x, y, w, h = region
+    left = max(0, int(x * source_width) // ROI_ALIGN * ROI_ALIGN)
+    top = max(0, int(y * source_height) // ROI_ALIGN * ROI_ALIGN)
+    right = min(source_width // 2 * 2, math.ceil((x + w) * source_width / ROI_ALIGN) * ROI_ALIGN)
+    bottom = min(source_height // 2 * 2, math.ceil((y + h) * source_height / ROI_ALIGN) * ROI_ALIGN)
+    return left, top, max(right, left + 2), max(bottom, top + 2)
+
+
+def _plane_array(plane):
+    return np.frombuffer(plane, np.uint8).reshape(plane.height, plane.line_size)[:, :plane.width]
+
+
+def crop_frame(frame, box):
+    """从PyAV帧中裁出box范围，返回新的PyAV帧
+
+    4:2:0帧直接裁YUV平面，颜色转换和缩放只作用于裁出的部分；其他格式先整帧转RGB再裁。
+    """
+    left, top, right, bottom = box
+    if frame.format.name == "yuv420p":
+        luma, u, v = (_plane_array(plane) for plane in frame.planes[:3])
+        packed = np.concatenate([
+            luma[top:bottom, left:right].ravel(),
+            u[top // 2:bottom // 2, left // 2:right // 2].ravel(),
+            v[top // 2:bottom // 2, left // 2:right // 2].ravel(),
+        ]).reshape(-1, right - left)
+        return av.VideoFrame.from_ndarray(packed, format="yuv420p")
+    rgb = frame.to_ndarray(format="rgb24")[top:bottom, left:right]
+    return av.VideoFrame.from_ndarray(np.ascontiguousarray(rgb), format="rgb24")
+
+
+class RoiDecoder(QThread):
+    """后台线程：按源分辨率解码放大区域（ROI）的画面
+
+    只保留最新的一次请求，连续缩放、平移时中间的请求直接丢弃；
+    解码后只裁剪、转换和缩放可见区域，输出尺寸不超过控件的像素尺寸。
+    """
+
+    roiReady = Signal(int, object, QImage)  # (帧序号, 相对区域(x, y, w, h), 画面)
+    roiFailed = Signal(str)
+
+    def __init__(self, file_path, frame_index=None, parent=None):
+        super().__init__(parent)
+        self.file_path = str(file_path)
+        self.frame_index = frame_index
+        self._request = None
+        self._condition = threading.Condition()
+        self._stopped = False
+
+    def request(self, index, region, width, height):
+        """请求第index帧region区域、输出width x height的画面"""
+        with self._condition:
+            self._request = (index, tuple(region), width, height)
+            self._condition.notify()
+
+    def stop(self):
+        """只设置标志，不等待线程结束；正在解码的GOP会在下一帧处中止"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def _is_stopped(self):
+        return self._stopped
+
+    def run(self):
+        decoder = None
+        try:
+            decoder = VideoDecoder(self.file_path, max_height=ROI_SOURCE_HEIGHT, frame_index=self.frame_index)
+            while True:
+                with self._condition:
+                    while self._request is None and not self._stopped:
+                        self._condition.wait()
+                    if self._stopped:
+                        return
+                    index, region, width, height = self._request
+                    self._request = None
+                for frame_index, frame in decoder.iter_frames(index, index, self._is_stopped):
+                    box = crop_box(region, frame.width, frame.height)
+                    # 不放大超过源像素，放大交给绘制
+                    width = min(width, box[2] - box[0])
+                    height = min(height, box[3] - box[1])
+                    image = frame_to_qimage(crop_frame(frame, box), width, height)
+                    # 对齐后的实际区域
+                    actual = (box[0] / frame.width, box[1] / frame.height,
+                              (box[2] - box[0]) / frame.width, (box[3] - box[1]) / frame.height)
+                    self.roiReady.emit(frame_index, actual, image)
+                    break
+        except Exception as e:
+            self.roiFailed.emit(str(e))
+        finally:
+            if decoder is not None:
+                decoder.close()
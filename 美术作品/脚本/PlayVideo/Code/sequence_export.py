@@ -0,0 +1,114 @@
+import os
+from collections import deque
+from PySide6.QtCore import QThread, Signal
+
+from Code.frame_index import FrameIndex
+from Code.image_sequence import export_frames, sequence_file_name
+from Code.parallel_decode import ParallelDecoder, parallel_available
+
+# PyAV为可选依赖，缺失时不能导出
+try:
+    import av
+except ImportError:
+    av = None
+
+# 续传时缺少的帧之间相隔超过这么多帧就分开解码，中间已写好的部分不再解码
+EXPORT_RUN_GAP = 30
+
+
+def export_available():
+    """是否安装了PyAV和NumPy"""
+    return parallel_available()
+
+
+class SequenceExporter(QThread):
+    """后台线程：把一段视频按源分辨率导出为以Max帧号命名的图片序列
+
+    解码和编码都在解码进程池里按块并行进行，进程池不可用时改为在本线程内顺序解码；
+    已经存在的文件直接跳过，中断后再次导出即可续传。
+    """
+
+    progress = Signal(int, int)  # (已完成的文件数, 总文件数)
+    exportFinished = Signal(str, int, int)  # (输出目录, 本次写出的文件数, 已存在而跳过的文件数)
+    exportFailed = Signal(str)
+
+    def __init__(self, file_path, targets, out_dir, base_name, fmt, frame_index=None, parent=None):
+        super().__init__(parent)
+        self.file_path = str(file_path)
+        self.targets = list(targets)  # [(Max帧号, 视频位置毫秒)]
+        self.out_dir = str(out_dir)
+        self.base_name = base_name
+        self.fmt = fmt
+        self.frame_index = frame_index
+        self._cancelled = False
+
+    def cancel(self):
+        """只设置标志，不等待线程结束；当前块写完后停止"""
+        self._cancelled = True
+
+    def run(self):
+        try:
+            index = self.frame_index or FrameIndex.load_or_build(self.file_path)
+            os.makedirs(self.out_dir, exist_ok=True)
+            outputs = {}  # 视频帧序号 -> 要写出的文件路径
+            skipped = 0
+            for max_frame, position_ms in self.targets:
+                path = os.path.join(self.out_dir, sequence_file_name(self.base_name, max_frame, self.fmt))
+                if os.path.isfile(path) and os.path.getsize(path) > 0:
+                    skipped += 1
+                    continue
+                outputs.setdefault(index.frame_at_ms(position_ms), []).append(path)
+            done = skipped
+            self.progress.emit(done, len(self.targets))
+            if outputs:
+                done += self._export(index, outputs, done)
+            if not self._cancelled:
+                self.exportFinished.emit(self.out_dir, done - skipped, skipped)
+        except Exception as e:
+            self.exportFailed.emit(str(e))
+
+    def _export(self, index, outputs, done):
+        """解码并写出outputs中的帧，返回写出的文件数"""
+        with av.open(self.file_path) as container:
+            context = container.streams.video[0].codec_context
+            width, height = context.width, context.height
+        decoder = ParallelDecoder(self.file_path, index, width, height, "rgb24")
+
+        # 只解码缺少的帧所在的区段
+        wanted = sorted(outputs)
+        runs = []
+        for frame in wanted:
+            if runs and frame - runs[-1][1] <= EXPORT_RUN_GAP:
+                runs[-1][1] = frame
+            else:
+                runs.append([frame, frame])
+        chunks = [chunk for start, end in runs for chunk in decoder.chunks(start, end)]
+
+        def task_arg(first, last):
+            return [outputs.get(i, []) for i in range(first, last + 1)], self.fmt
+
+        remaining = deque(chunks)
+        self._done = done
+        try:
+            self._write_chunks(decoder, remaining, task_arg)
+        except Exception as e:
+            if decoder.workers <= 1:
+                raise
+            # 进程池无法启动或已损坏，剩下的块在本线程内顺序解码
+            print(f"并行导出失败，改为顺序解码: {e}")
+            decoder.workers = 1
+            self._write_chunks(decoder, remaining, task_arg)
+        return self._done - done
+
+    def _write_chunks(self, decoder, chunks, task_arg):
+        """按顺序写出chunks中的块，写完的块从chunks中移除，出错时剩下的块可以重做"""
+        results = decoder.iter_chunk_list(list(chunks), export_frames, task_arg)
+        try:
+            for first, count in results:
+                chunks.popleft()
+                self._done += count
+                self.progress.emit(self._done, len(self.targets))
+                if self._cancelled:
+                    break
+        finally:
+            results.close()
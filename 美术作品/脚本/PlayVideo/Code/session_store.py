@@ -0,0 +1,112 @@
+import json
+import os
+import time
+
+from Code.media_cache import cache_root
+
+SESSION_VERSION = 1
+# 记住多少个视频的元数据和播放状态，超出时丢掉最久没打开的
+SESSION_MAX_MEDIA = 200
+# 最近打开列表的长度
+RECENT_MAX = 10
+
+
+def media_key(file_path):
+    """视频在会话中的键：规范化后的绝对路径"""
+    return os.path.normcase(os.path.abspath(str(file_path)))
+
+
+class SessionStore:
+    """跨会话保存的状态：上次打开的目录、最近打开的视频，以及每个视频的元数据和播放状态
+
+    每个视频的记录同时保存文件大小和修改时间，文件被替换后旧记录作废，
+    不会把旧视频的时长、入出点用到新内容上。数据很小，每次修改都整体写回一个JSON文件。
+    """
+
+    FILE_NAME = "session.json"
+
+    def __init__(self, path=None):
+        self.path = path or cache_root() / self.FILE_NAME
+        self._data = {"version": SESSION_VERSION, "last_open_dir": None, "recent": [], "media": {}}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == SESSION_VERSION:
+            self._data.update(data)
+
+    def save(self):
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"保存会话失败: {e}")
+
+    # ========== 目录与最近打开 ==========
+
+    @property
+    def last_open_dir(self):
+        return self._data.get("last_open_dir")
+
+    @last_open_dir.setter
+    def last_open_dir(self, directory):
+        if directory != self._data.get("last_open_dir"):
+            self._data["last_open_dir"] = str(directory)
+            self.save()
+
+    def recent_files(self):
+        """最近打开的视频（新的在前），已不存在的文件不列出"""
+        return [path for path in self._data["recent"] if os.path.isfile(path)]
+
+    def add_recent(self, file_path):
+        file_path = os.path.abspath(str(file_path))
+        recent = [path for path in self._data["recent"] if media_key(path) != media_key(file_path)]
+        self._data["recent"] = [file_path] + recent[:RECENT_MAX - 1]
+        self.save()
+
+    def remove_recent(self, file_path):
+        key = media_key(file_path)
+        self._data["recent"] = [path for path in self._data["recent"] if media_key(path) != key]
+        self.save()
+
+    # ========== 视频元数据与播放状态 ==========
+
+    def media(self, file_path):
+        """该视频保存的记录（duration_ms、fps、frame_count、frame_index、position_ms、offset、
+        loop_in_ms、loop_out_ms中已知的部分），没有记录或文件已改变时返回None"""
+        entry = self._data["media"].get(media_key(file_path))
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        if entry.get("size") != stat.st_size or entry.get("mtime") != stat.st_mtime_ns:
+            return None
+        return dict(entry)
+
+    def update_media(self, file_path, **values):
+        """合并并保存该视频的记录；文件已改变时先丢掉旧记录"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return
+        key = media_key(file_path)
+        entry = self._data["media"].get(key)
+        if entry is None or entry.get("size") != stat.st_size or entry.get("mtime") != stat.st_mtime_ns:
+            entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+        entry.update(values)
+        entry["used"] = time.time()
+        self._data["media"][key] = entry
+
+        media = self._data["media"]
+        if len(media) > SESSION_MAX_MEDIA:
+            for old in sorted(media, key=lambda k: media[k].get("used", 0))[:len(media) - SESSION_MAX_MEDIA]:
+                del media[old]
+        self.save()
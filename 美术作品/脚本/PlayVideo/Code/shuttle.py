@@ -0,0 +1,92 @@
+import time
+from PySide6.QtCore import QObject, Qt, QTimer, Signal
+
+# J/L连续按下时依次切换的速度
+SHUTTLE_SPEEDS = (1.0, 2.0, 4.0, 8.0)
+
+
+class ShuttleController(QObject):
+    """J/K/L 穿梭控制
+
+    L正向、J倒放，同方向连续按下逐级加速，按反方向键先切换为该方向的1倍速；
+    K停止，按住K时再按J/L逐帧后退/前进。
+    倒放没有播放器可用，由这里的时钟按速率算出位置，交给调用方从帧缓存取帧显示。
+    """
+
+    rateChanged = Signal(float)  # 新的速率：0为停止，负数为倒放
+    stepRequested = Signal(int)  # 逐帧：-1后退，1前进
+    reversePosition = Signal(int)  # 倒放时按时钟算出的视频位置（毫秒）
+
+    def __init__(self, position_source, parent=None):
+        super().__init__(parent)
+        self.position_source = position_source  # position_source() -> 当前视频位置（毫秒）
+        self.rate = 0.0
+        self._k_held = False
+        self._base_ms = 0
+        self._base_time = 0.0
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.setInterval(10)
+        self._timer.timeout.connect(self._tick)
+
+    def key_pressed(self, key):
+        """处理按键，返回是否为穿梭键"""
+        if key == Qt.Key_K:
+            self._k_held = True
+            self.set_rate(0.0)
+        elif key in (Qt.Key_J, Qt.Key_L):
+            direction = -1 if key == Qt.Key_J else 1
+            if self._k_held:
+                self.stepRequested.emit(direction)
+            else:
+                self.set_rate(self._next_rate(direction))
+        else:
+            return False
+        return True
+
+    def key_released(self, key):
+        if key == Qt.Key_K:
+            self._k_held = False
+            return True
+        return key in (Qt.Key_J, Qt.Key_L)
+
+    def _next_rate(self, direction):
+        """同方向加速一级（已是最快时保持），反方向从1倍速开始"""
+        if self.rate * direction <= 0:
+            return float(direction)
+        speed = abs(self.rate)
+        faster = [s for s in SHUTTLE_SPEEDS if s > speed]
+        return direction * (faster[0] if faster else SHUTTLE_SPEEDS[-1])
+
+    @property
+    def position_ms(self):
+        """倒放中按时钟算出的位置；不在倒放时为最近一次倒放停下的位置"""
+        if self.rate >= 0:
+            return self._base_ms
+        elapsed = time.perf_counter() - self._base_time
+        return max(0, int(self._base_ms + elapsed * 1000 * self.rate))
+
+    def set_rate(self, rate):
+        if rate == self.rate:
+            return
+        if rate < 0:
+            # 从当前位置（倒放中改变速度时为倒放位置）开始计时
+            self._base_ms = self.position_ms if self.rate < 0 else self.position_source()
+            self._base_time = time.perf_counter()
+            self.rate = rate
+            self._timer.start()
+        else:
+            if self.rate < 0:
+                self._base_ms = self.position_ms
+            self.rate = rate
+            self._timer.stop()
+        self.rateChanged.emit(rate)
+
+    def stop(self):
+        self.set_rate(0.0)
+
+    def _tick(self):
+        position_ms = self.position_ms
+        self.reversePosition.emit(position_ms)
+        if position_ms <= 0:
+            self.stop()
@@ -0,0 +1,99 @@
+import time
+from PySide6.QtCore import QObject, QTimer
+
+from Code.perf_hud import perf
+
+
+class MaxSyncScheduler(QObject):
+    """视频→3ds Max 的时间同步调度器
+
+    每次写入 sliderTime 都会让Max重绘整个视口，重场景下一次要几十毫秒。
+    这里把同步请求合并（只保留最新的目标帧），目标帧与上次写入相同时跳过，
+    并按实测的重绘耗时自动放慢写入频率，保证视频播放本身不被拖慢。
+    """
+
+    def __init__(self, writer, min_interval_ms=15, max_interval_ms=500, parent=None):
+        super().__init__(parent)
+        self._writer = writer  # writer(frame)：真正写入Max时间的函数
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max_interval_ms
+        # 两次写入之间至少留出重绘耗时的倍数，剩余时间留给Qt事件循环
+        self.headroom = 2.0
+
+        self._pending = None  # 等待写入的目标帧
+        self._last_written = None  # Max当前所在帧（已知时）
+        self._last_write_time = 0.0
+        self._writing = False
+        self.redraw_cost_ms = 0.0  # 重绘耗时的指数滑动平均
+        self.writes = 0
+        self.skipped = 0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+    @property
+    def interval_ms(self):
+        """当前的最小写入间隔"""
+        interval = self.redraw_cost_ms * self.headroom
+        return max(self.min_interval_ms, min(self.max_interval_ms, interval))
+
+    def request(self, frame):
+        """请求把Max时间设到frame，多次请求只执行最后一次"""
+        if self._pending is not None:
+            self.skipped += 1
+        self._pending = int(frame)
+        if self._timer.isActive() or self._writing:
+            return
+        elapsed_ms = (time.perf_counter() - self._last_write_time) * 1000
+        self._timer.start(int(max(0.0, self.interval_ms - elapsed_ms)))
+
+    def flush(self):
+        """立即写入等待中的目标帧"""
+        self._timer.stop()
+        frame = self._pending
+        self._pending = None
+        if frame is None or self._writing:
+            return
+        if frame == self._last_written:
+            self.skipped += 1
+            return
+
+        self._writing = True
+        start = time.perf_counter()
+        try:
+            self._writer(frame)
+            self._last_written = frame
+            self.writes += 1
+        except Exception as e:
+            print(f"同步到3ds Max失败: {e}")
+        finally:
+            self._writing = False
+            self._last_write_time = time.perf_counter()
+            cost_ms = (self._last_write_time - start) * 1000
+            if perf.enabled:
+                # 写入sliderTime到Max重绘完成的往返时间
+                perf.sample("max_sync", cost_ms)
+            if self.redraw_cost_ms == 0.0:
+                self.redraw_cost_ms = cost_ms
+            else:
+                self.redraw_cost_ms += (cost_ms - self.redraw_cost_ms) * 0.2
+
+        # 写入期间又来了新请求
+        if self._pending is not None:
+            self._timer.start(int(self.interval_ms))
+
+    def note_max_time(self, frame):
+        """Max时间被其他途径改变时记录下来，避免误判为重复写入"""
+        if not self._writing:
+            self._last_written = int(frame)
+
+    def cancel(self):
+        """丢弃等待中的请求"""
+        self._timer.stop()
+        self._pending = None
+
+    def reset(self):
+        """切换视频时清空状态"""
+        self.cancel()
+        self._last_written = None
@@ -0,0 +1,152 @@
+import time
+from collections import deque
+from PySide6.QtCore import QObject, QTimer, Signal
+
+
+class MaxToVideoSync:
+    """3ds Max → 视频 的时间同步
+
+    注册为宿主的时间回调，Max时间改变时换算出视频位置并交给show_position显示。
+    """
+
+    def __init__(self, host, frames_to_ms, show_position):
+        self.host = host
+        self.frames_to_ms = frames_to_ms  # frames_to_ms(帧) -> 毫秒
+        self.show_position = show_position  # show_position(毫秒)
+        self.enabled = True
+        self.offset = 0  # 视频相对Max的帧偏移（界面上的“开始帧”）
+        self.duration_ms = 0
+
+    def target_position(self, frame):
+        """Max帧对应的视频位置（毫秒）"""
+        position_ms = self.frames_to_ms(frame + self.offset)
+        if self.duration_ms:
+            position_ms = min(position_ms, self.duration_ms)
+        return max(0, position_ms)
+
+    def on_time_changed(self):
+        """宿主时间回调"""
+        if not self.enabled:
+            return
+        try:
+            self.show_position(self.target_position(self.host.get_time()))
+        except Exception as e:
+            print(f"从3ds Max同步到视频失败: {e}")
+
+
+class MaxFollowClock(QObject):
+    """跟随模式：Max播放时间轴时让视频连续播放，并从属于Max的时钟
+
+    Max时间按帧率单调前进数帧、且实测的播放速度接近1x时进入跟随：播放器连续播放，
+    每次Max时间回调只比较漂移量，小漂移通过微调播放速率追上，
+    漂移超过阈值或时间发生跳变时才真正seek；Max停止后暂停在精确位置。
+    Max关闭实时播放或以非1x速度播放时，视频无法按1x连续播放追上，仍逐帧seek。
+    """
+
+    followingChanged = Signal(bool)
+    followStopped = Signal(int)  # 退出跟随时Max所在的视频位置（毫秒）
+
+    def __init__(self, player, frame_rate, parent=None):
+        super().__init__(parent)
+        self.player = player  # QMediaPlayer
+        self.frame_rate = frame_rate  # frame_rate() -> Max帧率
+        self.enter_steps = 3  # 连续单调前进多少次后进入跟随
+        self.drift_threshold_ms = 150  # 超过该漂移直接seek
+        self.max_rate_correction = 0.05  # 播放速率最多调整±5%
+        self.correction_window_ms = 500  # 期望在这段时间内消除漂移
+        self.rate_tolerance = 0.2  # Max实测播放速度与1x相差超过该比例时不跟随
+        self.following = False
+        self.hard_seeks = 0
+
+        self._last_position = None
+        self._last_time = 0.0
+        self._streak = 0
+        self._samples = deque(maxlen=8)  # 最近连续前进时的(时间, 位置)，用于计算Max实际播放速度
+
+        # Max停止播放后不再有时间回调，超时即退出跟随
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.timeout.connect(self.stop)
+
+    def _frame_ms(self):
+        return 1000.0 / max(1, self.frame_rate())
+
+    def max_rate(self):
+        """Max最近几次前进的实际播放速度（1.0为1x），样本不足时返回None"""
+        if len(self._samples) < 2:
+            return None
+        (t0, p0), (t1, p1) = self._samples[0], self._samples[-1]
+        if t1 <= t0:
+            return None
+        return (p1 - p0) / ((t1 - t0) * 1000)
+
+    def on_max_position(self, position_ms):
+        """Max时间改变时调用；返回True表示已由跟随模式处理，调用方不必再seek"""
+        now = time.perf_counter()
+        frame_ms = self._frame_ms()
+        if self._last_position is None:
+            advancing = False
+        else:
+            step = position_ms - self._last_position
+            elapsed = (now - self._last_time) * 1000
+            # Max播放可能跳帧，允许一次前进几帧
+            advancing = 0 < step <= frame_ms * 4 and elapsed <= frame_ms * 4
+        self._last_position = position_ms
+        self._last_time = now
+
+        if not advancing:
+            self._streak = 0
+            self._samples.clear()
+            self._samples.append((now, position_ms))
+            if self.following:
+                self.stop()
+            return False
+
+        self._streak += 1
+        self._samples.append((now, position_ms))
+        rate = self.max_rate()
+        realtime = rate is not None and abs(rate - 1.0) <= self.rate_tolerance
+        if not self.following:
+            if self._streak < self.enter_steps or not realtime:
+                return False
+            self._start(position_ms)
+        elif not realtime:
+            # Max的播放速度偏离了1x，连续播放会越差越远，退回逐帧seek
+            self.stop()
+            return False
+        else:
+            self._correct(position_ms)
+        self._idle_timer.start(int(frame_ms * 4))
+        return True
+
+    def _start(self, position_ms):
+        self.following = True
+        self.player.setPlaybackRate(1.0)
+        self.player.setPosition(position_ms)
+        self.player.play()
+        self.followingChanged.emit(True)
+
+    def _correct(self, position_ms):
+        """根据漂移量微调播放速率，漂移过大时直接seek"""
+        drift = self.player.position() - position_ms
+        if abs(drift) > self.drift_threshold_ms:
+            self.hard_seeks += 1
+            self.player.setPosition(position_ms)
+            self.player.setPlaybackRate(1.0)
+            return
+        correction = -drift / self.correction_window_ms
+        correction = max(-self.max_rate_correction, min(self.max_rate_correction, correction))
+        self.player.setPlaybackRate(1.0 + correction)
+
+    def stop(self):
+        """退出跟随模式，暂停在Max当前对应的位置"""
+        self._idle_timer.stop()
+        self._streak = 0
+        if not self.following:
+            return
+        self.following = False
+        self.player.pause()
+        self.player.setPlaybackRate(1.0)
+        self.followingChanged.emit(False)
+        if self._last_position is not None:
+            self.followStopped.emit(int(self._last_position))
@@ -0,0 +1,50 @@
+from PySide6.QtCore import QEvent, QPoint, Qt, Signal
+from PySide6.QtWidgets import QWidget
+
+
+class SliderTrackWidget(QWidget):
+    """与滑块轨道左右对齐的时间轴条（胶片、运动曲线、波形的基类）
+
+    contentsRect()即与滑块轨道对齐的区域，子类在其中按0~1的相对位置绘制；点击时发出相对位置。
+    """
+
+    positionClicked = Signal(float)  # 相对位置0~1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._track = None  # 与之对齐的滑块
+
+    def align_to(self, slider):
+        """左右边距跟随滑块，使内容与滑块轨道对齐"""
+        self._track = slider
+        slider.installEventFilter(self)
+        self._update_margins()
+
+    def eventFilter(self, obj, event):
+        if obj is self._track and event.type() in (QEvent.Resize, QEvent.Move, QEvent.Show):
+            self._update_margins()
+        return super().eventFilter(obj, event)
+
+    def resizeEvent(self, event):
+        self._update_margins()
+        super().resizeEvent(event)
+
+    def _update_margins(self):
+        if self._track is None or self.parentWidget() is None:
+            return
+        left = self._track.mapTo(self.parentWidget(), QPoint(0, 0)).x() - self.x()
+        right = self.width() - left - self._track.width()
+        self.setContentsMargins(max(0, left), 0, max(0, right), 0)
+        self.update()
+
+    def position_at(self, x):
+        """控件内的x坐标对应的相对位置0~1"""
+        rect = self.contentsRect()
+        if rect.width() <= 0:
+            return 0.0
+        return max(0.0, min(1.0, (x - rect.left()) / rect.width()))
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and self.contentsRect().width() > 0:
+            self.positionClicked.emit(self.position_at(event.position().x()))
+        super().mousePressEvent(event)
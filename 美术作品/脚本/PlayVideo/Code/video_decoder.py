@@ -0,0 +1,166 @@
+from PySide6.QtGui import QImage
+
+# PyAV为可选依赖（pip install av），缺失时帧缓存等功能自动关闭
+try:
+    import av
+except ImportError:
+    av = None
+
+
+def decoder_available():
+    """是否安装了PyAV"""
+    return av is not None
+
+
+class VideoDecoder:
+    """基于PyAV的视频帧解码器，输出缩小后的QImage
+
+    非线程安全：每个后台线程各自持有一个实例。
+    传入FrameIndex时按逐帧时间戳精确定位，seek直接从目标帧之前的关键帧开始。
+    """
+
+    # 目标帧在已解码位置之后多少帧以内时，直接顺序解码而不seek
+    SEQUENTIAL_WINDOW = 30
+
+    def __init__(self, file_path, max_height=540, frame_index=None, thread_count=0):
+        if av is None:
+            raise ImportError("未安装PyAV，请先执行 pip install av")
+
+        self.file_path = str(file_path)
+        self._container = av.open(self.file_path)
+        self._stream = self._container.streams.video[0]
+        self._stream.thread_type = "AUTO"
+        if thread_count:
+            # 同时打开多个解码器时分摊CPU核数，0表示由FFmpeg自动决定
+            self._stream.codec_context.thread_count = thread_count
+
+        rate = self._stream.average_rate or self._stream.guessed_rate or 30
+        self.fps = float(rate)
+        self.time_base = self._stream.time_base
+        self.start_pts = self._stream.start_time or 0
+
+        # 源分辨率与缩小后的输出分辨率（保持宽高比，宽高取偶数）
+        self.source_width = self._stream.codec_context.width
+        self.source_height = self._stream.codec_context.height
+        scale = min(1.0, max_height / self.source_height) if self.source_height else 1.0
+        self.width = max(2, int(self.source_width * scale) // 2 * 2)
+        self.height = max(2, int(self.source_height * scale) // 2 * 2)
+
+        if self._stream.duration:
+            duration_s = float(self._stream.duration * self.time_base)
+        elif self._container.duration:
+            duration_s = self._container.duration / av.time_base
+        else:
+            duration_s = 0.0
+        self.duration_ms = int(duration_s * 1000)
+        self.frame_count = self._stream.frames or int(round(duration_s * self.fps))
+
+        self.frame_index = frame_index
+        if frame_index is not None and frame_index.frame_count:
+            self.frame_count = frame_index.frame_count
+            self.fps = frame_index.fps or self.fps
+
+        self._frames = None  # 当前的顺序解码迭代器
+        self._next_index = None  # 迭代器下一次将给出的帧序号
+
+    # ========== 时间换算 ==========
+
+    def ms_to_index(self, ms):
+        """毫秒转换为视频帧序号"""
+        if self.frame_index is not None:
+            return self.frame_index.frame_at_ms(ms)
+        index = int(ms / 1000.0 * self.fps + 1e-6)
+        if self.frame_count:
+            index = min(index, self.frame_count - 1)
+        return max(0, index)
+
+    def index_to_ms(self, index):
+        """视频帧序号转换为毫秒"""
+        if self.frame_index is not None:
+            return int(self.frame_index.time_ms(index))
+        return int(index / self.fps * 1000)
+
+    def _index_to_pts(self, index):
+        if self.frame_index is not None:
+            return self.frame_index.pts[max(0, min(index, self.frame_count - 1))]
+        return self.start_pts + int(index / self.fps / self.time_base)
+
+    def _frame_index(self, frame):
+        if frame.pts is None:
+            return self._next_index or 0
+        if self.frame_index is not None:
+            index = self.frame_index.frame_of_pts(frame.pts)
+            if index is not None:
+                return index
+        return int(round(float((frame.pts - self.start_pts) * self.time_base) * self.fps))
+
+    # ========== 解码 ==========
+
+    def _seek(self, index):
+        """跳到index之前最近的关键帧，之后顺序解码"""
+        if self.frame_index is not None:
+            # 已知关键帧位置，直接落在关键帧上，不必让demuxer回退查找
+            index = self.frame_index.keyframe_before(index)
+        self._container.seek(self._index_to_pts(index), stream=self._stream, backward=True, any_frame=False)
+        self._frames = self._container.decode(self._stream)
+        self._next_index = None
+
+    def _needs_seek(self, index):
+        if self._frames is None or self._next_index is None:
+            return True
+        return index < self._next_index or index > self._next_index + self.SEQUENTIAL_WINDOW
+
+    def iter_frames(self, start, end, cancelled=None):
+        """顺序解码[start, end]区间，逐帧产出 (帧序号, PyAV帧)
+
+        cancelled()返回True时停止，从关键帧解码到start的途中也会检查。
+        """
+        if self._needs_seek(start):
+            self._seek(start)
+        try:
+            for frame in self._frames:
+                index = self._frame_index(frame)
+                self._next_index = index + 1
+                if cancelled is not None and cancelled():
+                    break
+                if index < start:
+                    continue
+                if index > end:
+                    break
+                yield index, frame
+                if index >= end:
+                    break
+        except av.error.EOFError:
+            self._frames = None
+
+    def iter_range(self, start, end):
+        """顺序解码[start, end]区间，逐帧产出 (帧序号, QImage)"""
+        for index, frame in self.iter_frames(start, end):
+            yield index, self.to_qimage(frame)
+
+    def decode(self, index):
+        """解码单帧，返回QImage；超出范围时返回None"""
+        for frame_index, image in self.iter_range(index, index):
+            return image
+        return None
+
+    def to_qimage(self, frame):
+        """把PyAV帧缩放并转换为RGB888的QImage"""
+        return frame_to_qimage(frame, self.width, self.height)
+
+    def close(self):
+        """关闭文件"""
+        self._frames = None
+        try:
+            self._container.close()
+        except Exception:
+            pass
+
+
+def frame_to_qimage(frame, width, height):
+    """把PyAV帧缩放到width x height并转换为RGB888的QImage"""
+    rgb = frame.reformat(width=width, height=height, format="rgb24")
+    plane = rgb.planes[0]
+    image = QImage(bytes(plane), rgb.width, rgb.height, plane.line_size, QImage.Format_RGB888)
+    # 拷贝一份，使QImage不再引用临时缓冲区
+    return image.copy()
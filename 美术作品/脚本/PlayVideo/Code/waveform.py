@@ -0,0 +1,290 @@
+import os
+from PySide6.QtCore import QPointF, Qt, QThread, Signal
+from PySide6.QtGui import QColor, QPainter, QPen, QPolygonF
+
+from Code.audio_align import decode_audio
+from Code.media_cache import cache_dir, content_key, enforce_size_cap, temp_path, touch
+from Code.track_widget import SliderTrackWidget
+
+# PyAV和NumPy都是可选依赖，缺失时不显示波形
+try:
+    import av
+except ImportError:
+    av = None
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 波形只用于看节奏，16kHz单声道足够
+PEAK_SAMPLE_RATE = 16000
+# 第0级每个峰值块的采样数（2毫秒），往上每级合并相邻两块
+PEAK_BLOCK = 32
+# 最粗一级的块数不少于该值时停止合并
+PEAK_MIN_BLOCKS = 256
+WAVEFORM_CACHE_VERSION = 1
+WAVEFORM_CACHE_MAX_BYTES = 128 * 1024 * 1024
+# 滚轮每格的缩放倍数和最大放大倍数
+WAVEFORM_ZOOM_STEP = 1.25
+WAVEFORM_MAX_ZOOM = 4096.0
+
+
+def waveform_available():
+    """是否安装了PyAV和NumPy"""
+    return av is not None and np is not None
+
+
+class PeakPyramid:
+    """多分辨率的min/max峰值金字塔
+
+    第0级每块PEAK_BLOCK个采样，第n级每块PEAK_BLOCK * 2**n个采样；峰值按全片最大振幅归一化后以int8保存。
+    取任意时间范围的波形时选用每块不超过一个像素的最粗一级，计算量只与可见像素数有关。
+    """
+
+    def __init__(self, mins, maxs, sample_rate, block, sample_count):
+        self.mins = mins  # 每级一个int8数组
+        self.maxs = maxs
+        self.sample_rate = sample_rate
+        self.block = block
+        self.sample_count = sample_count
+
+    @property
+    def duration(self):
+        """音频时长（秒）"""
+        return self.sample_count / self.sample_rate
+
+    @classmethod
+    def build(cls, samples, sample_rate=PEAK_SAMPLE_RATE, block=PEAK_BLOCK):
+        samples = np.asarray(samples, dtype=np.float32)
+        count = len(samples)
+        padded = np.pad(samples, (0, -count % block), mode="edge") if count else np.zeros(block, np.float32)
+        blocks = padded.reshape(-1, block)
+        low = blocks.min(axis=1)
+        high = blocks.max(axis=1)
+        # 几乎无声的音轨不放大成满幅噪声
+        peak = max(float(np.abs(low).max()), float(np.abs(high).max()), 1e-3)
+        low = np.round(low / peak * 127).astype(np.int8)
+        high = np.round(high / peak * 127).astype(np.int8)
+        mins = [low]
+        maxs = [high]
+        while len(low) >= 2 * PEAK_MIN_BLOCKS:
+            if len(low) % 2:
+                low = np.append(low, low[-1])
+                high = np.append(high, high[-1])
+            low = np.minimum(low[0::2], low[1::2])
+            high = np.maximum(high[0::2], high[1::2])
+            mins.append(low)
+            maxs.append(high)
+        return cls(mins, maxs, sample_rate, block, count)
+
+    def columns(self, start, end, count):
+        """start~end秒之间分成count列，返回每列的(最小值, 最大值)数组，范围-1~1"""
+        samples_per_column = max((end - start) * self.sample_rate / count, 1e-9)
+        level = 0
+        while level + 1 < len(self.mins) and self.block << (level + 1) <= samples_per_column:
+            level += 1
+        low = self.mins[level]
+        high = self.maxs[level]
+        samples_per_block = self.block << level
+        edges = np.linspace(start, end, count + 1) * self.sample_rate / samples_per_block
+        edges = edges.astype(np.int64)
+        # 超出音频范围的列为空
+        valid = (edges[:-1] >= 0) & (edges[:-1] < len(low))
+        first = int(np.clip(edges[0], 0, len(low) - 1))
+        last = int(np.clip(edges[-1], first, len(low) - 1)) + 1
+        starts = np.clip(edges[:-1], first, last - 1) - first
+        column_min = np.minimum.reduceat(low[first:last], starts).astype(np.float32) / 127
+        column_max = np.maximum.reduceat(high[first:last], starts).astype(np.float32) / 127
+        column_min[~valid] = 0.0
+        column_max[~valid] = 0.0
+        return column_min, column_max
+
+    @staticmethod
+    def cache_path(key):
+        return cache_dir("waveform") / f"{key}.npz"
+
+    @classmethod
+    def load(cls, key):
+        path = cls.cache_path(key)
+        try:
+            with np.load(path) as data:
+                if int(data["version"]) != WAVEFORM_CACHE_VERSION:
+                    return None
+                splits = np.cumsum(data["sizes"])[:-1]
+                pyramid = cls(np.split(data["mins"], splits), np.split(data["maxs"], splits),
+                              int(data["sample_rate"]), int(data["block"]), int(data["sample_count"]))
+        except (OSError, ValueError, KeyError):
+            return None
+        touch(path)
+        return pyramid
+
+    def save(self, key):
+        path = self.cache_path(key)
+        # np.savez会给不以.npz结尾的文件名补上后缀，临时文件名也以.npz结尾
+        tmp_path = temp_path(path, ".npz")
+        try:
+            np.savez(tmp_path, version=WAVEFORM_CACHE_VERSION, sample_rate=self.sample_rate, block=self.block,
+                     sample_count=self.sample_count, sizes=np.array([len(m) for m in self.mins]),
+                     mins=np.concatenate(self.mins), maxs=np.concatenate(self.maxs))
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        enforce_size_cap(path.parent, WAVEFORM_CACHE_MAX_BYTES, keep=(path,))
+
+
+class WaveformWorker(QThread):
+    """后台线程：解码整条音轨并生成峰值金字塔（有缓存时直接读取）"""
+
+    waveformReady = Signal(str, object)  # (文件路径, PeakPyramid)
+    waveformFailed = Signal(str, str)  # (文件路径, 错误信息)
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = str(file_path)
+
+    def run(self):
+        try:
+            key = content_key(self.file_path)
+            pyramid = PeakPyramid.load(key)
+            if pyramid is None:
+                pyramid = PeakPyramid.build(decode_audio(self.file_path, PEAK_SAMPLE_RATE, None))
+                try:
+                    pyramid.save(key)
+                except OSError as e:
+                    print(f"无法保存波形缓存: {e}")
+            self.waveformReady.emit(self.file_path, pyramid)
+        except Exception as e:
+            self.waveformFailed.emit(self.file_path, str(e))
+
+
+class WaveformWidget(SliderTrackWidget):
+    """滑块下方的音频波形
+
+    横轴按视频时长（与滑块相同）而不是音轨时长换算，音轨比画面短或长时峰值仍对得上播放头；
+    未缩放时与滑块轨道一一对应；滚轮以鼠标处为中心缩放，Shift+滚轮或右键拖动平移，双击恢复全片。
+    点击发出的始终是整段视频中的相对位置。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pyramid = None
+        self.duration_ms = 0  # 视频时长，未知时按音轨时长
+        self.view_start = 0.0  # 可见范围，整段的相对位置0~1
+        self.view_end = 1.0
+        self._playhead = -1.0
+        self._drag_x = None
+        self._columns = None  # (宽度, 可见范围, 时长, 每列最小值, 每列最大值)，不变时复用
+        self.setFixedHeight(28)
+        self.setToolTip("音频波形：滚轮缩放，Shift+滚轮或右键拖动平移，双击显示全片")
+
+    def set_pyramid(self, pyramid):
+        self.pyramid = pyramid
+        self.view_start, self.view_end = 0.0, 1.0
+        self._columns = None
+        self.update()
+
+    def set_duration(self, duration_ms):
+        """设置滑块使用的视频时长（毫秒），0表示未知"""
+        self.duration_ms = duration_ms
+        self.update()
+
+    def clear(self):
+        self.set_pyramid(None)
+        self._playhead = -1.0
+
+    def set_playhead(self, position):
+        self._playhead = position
+        span = self.view_end - self.view_start
+        if span < 1.0 and 0.0 <= position <= 1.0 and not self.view_start <= position <= self.view_end:
+            # 放大后播放头离开可见范围时翻页跟随
+            self.set_view(position, position + span)
+        self.update()
+
+    def set_view(self, start, end):
+        """设置可见范围，限制在0~1内并保持跨度"""
+        span = max(1.0 / WAVEFORM_MAX_ZOOM, min(1.0, end - start))
+        start = max(0.0, min(start, 1.0 - span))
+        self.view_start, self.view_end = start, start + span
+        self.update()
+
+    def position_at(self, x):
+        """控件内的x坐标对应整段视频的相对位置"""
+        local = super().position_at(x)
+        return self.view_start + local * (self.view_end - self.view_start)
+
+    def wheelEvent(self, event):
+        if self.pyramid is None:
+            return
+        steps = event.angleDelta().y() / 120 or event.angleDelta().x() / 120
+        span = self.view_end - self.view_start
+        if event.modifiers() & Qt.ShiftModifier or not event.angleDelta().y():
+            self.set_view(self.view_start - steps * span * 0.1, self.view_end - steps * span * 0.1)
+        else:
+            anchor = self.position_at(event.position().x())
+            scale = WAVEFORM_ZOOM_STEP ** -steps
+            ratio = (anchor - self.view_start) / span
+            new_span = span * scale
+            self.set_view(anchor - ratio * new_span, anchor - ratio * new_span + new_span)
+        event.accept()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.RightButton:
+            self._drag_x = event.position().x()
+            return
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self._drag_x is not None and self.contentsRect().width() > 0:
+            x = event.position().x()
+            delta = (x - self._drag_x) / self.contentsRect().width() * (self.view_end - self.view_start)
+            self._drag_x = x
+            self.set_view(self.view_start - delta, self.view_end - delta)
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.RightButton:
+            self._drag_x = None
+        super().mouseReleaseEvent(event)
+
+    def mouseDoubleClickEvent(self, event):
+        self.set_view(0.0, 1.0)
+        super().mouseDoubleClickEvent(event)
+
+    def _column_values(self, width):
+        view = (self.view_start, self.view_end)
+        duration = self.duration_ms / 1000 if self.duration_ms else self.pyramid.duration
+        if self._columns is None or self._columns[:3] != (width, view, duration):
+            low, high = self.pyramid.columns(view[0] * duration, view[1] * duration, width)
+            self._columns = (width, view, duration, low, high)
+        return self._columns[3], self._columns[4]
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        rect = self.contentsRect()
+        painter.fillRect(rect, QColor(35, 40, 45))
+        if self.pyramid is not None and rect.width() > 1:
+            low, high = self._column_values(rect.width())
+            middle = rect.top() + rect.height() / 2
+            half = rect.height() / 2 - 1
+            left = rect.left()
+            # 上包络从左到右、下包络从右到左，连成一个多边形一次填充
+            points = [QPointF(left + x, middle - value * half) for x, value in enumerate(high.tolist())]
+            points += [QPointF(left + x, middle - value * half) for x, value in reversed(list(enumerate(low.tolist())))]
+            painter.setPen(QPen(QColor(110, 170, 230), 1))
+            painter.setBrush(QColor(110, 170, 230, 170))
+            painter.drawPolygon(QPolygonF(points))
+
+        span = self.view_end - self.view_start
+        if span < 1.0:
+            # 放大时在底部标出可见范围在全片中的位置
+            painter.fillRect(int(rect.left() + self.view_start * rect.width()), rect.bottom() - 1,
+                             max(2, int(span * rect.width())), 2, QColor(200, 200, 200))
+        if self.view_start <= self._playhead <= self.view_end and self._playhead >= 0.0:
+            x = rect.left() + int((self._playhead - self.view_start) / span * rect.width())
+            painter.setPen(QPen(QColor(255, 200, 0), 2))
+            painter.drawLine(x, rect.top(), x, rect.bottom())
+        painter.end()
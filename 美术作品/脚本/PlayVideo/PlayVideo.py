@@ -1,48 +1,160 @@
 import sys
+import time
 from pathlib import Path
 import math
 
+# 启动计时从脚本开头算起；Max里再次运行脚本时模块已导入，属于热启动
+_startup_time = time.perf_counter()
+_startup_warm = "Code.base_window" in sys.modules
+
 # 运行目录加入sys.path
 run_dir = Path(__file__).parent
 # 是否存在sys.path
 if run_dir not in sys.path:
     sys.path.append(r"C:\\Users\\Administrator\\Desktop\\PlayVideo")
     
-from Code.base_window import MainWindow
-from PySide6.QtWidgets import QFileDialog, QMessageBox,QAbstractSlider
-from pymxs import runtime as rt
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtMultimedia import QMediaPlayer
-from PySide6.QtMultimediaWidgets import QVideoWidget
+from Code.audio_align import ALIGN_MIN_CONFIDENCE, AudioAligner, alignment_available
+from Code.base_window import MainWindow, detach_thread, find_live_window, record_startup
+from Code.engine_process import EngineClient
+from Code.filmstrip import FilmstripWidget, FilmstripWorker
+from Code.frame_cache import FrameCache
+from Code.frame_index import FrameIndex, FrameIndexBuilder
+from Code.frame_prefetcher import FramePrefetcher
+from Code.frame_store import FrameStore
+from Code.frame_view import FrameView
+from Code.host import REFERENCE_TARGET_BACKGROUND, REFERENCE_TARGET_PLANE, MaxHost
+from Code.image_sequence import SEQUENCE_FORMATS
+from Code.load_pipeline import (LOAD_STAGE_FRAME, LOAD_STAGE_INDEX, LOAD_STAGE_PROBE, LOAD_STAGE_RANGE,
+                                LoadProgress, MediaProbe)
+from Code.loop_buffer import LOOP_MODE_LOOP, LOOP_MODE_PINGPONG, LoopBufferBuilder, LoopPlayer
+from Code.max_reference import ReferenceStreamer
+from Code.motion_curve import MotionCurveWidget, MotionWorker, motion_available
+from Code.multi_angle import MultiAngleWindow
+# QtMultimedia第一次打开视频时才导入，再次运行脚本时从这里取回已导入的类
+from Code.multimedia import QMediaPlayer, QVideoWidget, import_multimedia
+from Code.onion_skin import OnionSkin, onion_available
+from Code.parallel_decode import shutdown_pool
+from Code.perf_hud import PerfHud, perf
+from Code.proxy_builder import ProxyBuilder, proxy_index
+from Code.roi_decoder import RoiDecoder, roi_available
+from Code.sequence_export import SequenceExporter, export_available
+from Code.session_store import SessionStore
+from Code.shuttle import ShuttleController
+from Code.sync_scheduler import MaxSyncScheduler
+from Code.time_sync import MaxFollowClock, MaxToVideoSync
+from Code.video_decoder import VideoDecoder, decoder_available
+from Code.waveform import WaveformWidget, WaveformWorker, waveform_available
+from PySide6.QtWidgets import QFileDialog, QInputDialog, QMenu, QMessageBox,QAbstractSlider, QStackedWidget
+from PySide6.QtCore import QEvent, Qt, QThread, QTimer
 from PySide6.QtCore import QUrl
 from PySide6.QtGui import QColor, QPalette
 
+# 用于在再次运行脚本时找到已打开的窗口
+WINDOW_OBJECT_NAME = "PlayVideo"
+
+
 class PlayVideo(MainWindow):
     def __init__(self):
         super().__init__()
         self.script_path = Path(__file__).parent
         self.script_name = Path(__file__).stem
-        self.last_open_dir = str(Path.home() / "Videos")
+        # 跨会话保存的目录、最近打开的视频和每个视频的元数据、播放状态
+        self.session = SessionStore()
+        self.last_open_dir = self.session.last_open_dir or str(Path.home() / "Videos")
+        self.current_file = None
+        self.proxy_file = None  # 当前视频的全关键帧代理文件
+        self.proxy_builder = None
+        self._restore_position = None  # 切换到代理后要恢复的播放位置
         self.load_ui()
-        self._player = QMediaPlayer()
-        self.videoWidget = QVideoWidget()
+        # 播放器和视频控件在第一次打开视频时由init_player创建
+        self._player = None
+        self.videoWidget = None
         
         # 视频时间与3ds Max帧的同步相关变量
-        self.max_fps = rt.frameRate  # 获取3ds Max当前帧率
-        self.is_syncing_to_max = False  # 防止循环同步的标志
-        self.sync_timer = QTimer()  # 定时器用于定期同步到3ds Max
-        self.sync_timer.setInterval(100)  # 每100毫秒同步一次（可调整）
+        self.host = MaxHost()  # 所有对3ds Max的访问都经过宿主接口
+        self.max_fps = self.host.frame_rate()  # 获取3ds Max当前帧率
+        # 合并同步请求并按Max重绘耗时限速，避免每次positionChanged都触发视口重绘
+        self.sync_scheduler = MaxSyncScheduler(self.host.set_time, parent=self)
+        self.max_to_video = MaxToVideoSync(self.host, self.frames_to_ms, self.show_max_position)
+        # Max播放时间轴时视频连续播放，不再逐帧seek
+        self.follow_clock = MaxFollowClock(None, lambda: self.max_fps, self)
+        
+        # 加载进度：读取时长 → 帧索引 → 首帧 → 动画范围，各由对应的事件标记完成
+        self.load_progress = LoadProgress(self)
+        self._range_pending = False  # 时长一确定就设置Max动画范围
+        
+        # 逐帧时间戳索引，建立完成前按恒定帧率换算
+        self.frame_index = None
+        
+        # 解码帧缓存：拖动滑块时优先从内存取帧，不让播放器反复seek
+        self.frame_cache = FrameCache()
+        self.prefetcher = None
+        self.frame_store = None  # 跨会话的磁盘帧仓库
+        self._wanted_frame = -1  # 等待后台解码出来显示的帧序号
+        self._pending_seek_ms = None  # 拖动停下后才交给播放器的seek位置
+        self.seek_timer = QTimer()
+        self.seek_timer.setSingleShot(True)
+        self.seek_timer.setInterval(150)
+        
+        # 独立解码进程（勾选“独立进程解码”时启用）
+        self.engine = None
+        self._engine_fps = 0.0
+        self._engine_position_ms = 0
+        
+        # 多机位同步播放窗口
+        self.multi_angle = None
+        self.aligner = None  # 按音频对齐的后台线程
+        
+        # 入出点区间：整体解码进内存后循环/往返播放，不再经过解码器
+        self.loop_in_ms = None
+        self.loop_out_ms = None
+        self.loop_builder = None
+        self.loop_player = LoopPlayer(self)
+        
+        # 图片序列导出的后台线程
+        self.exporter = None
+        
+        # J/K/L穿梭（倒放由穿梭时钟驱动，从帧缓存取帧）
+        self.shuttle = ShuttleController(self.current_position, self)
+        self._shuttle_rate = 0.0
+        self.setFocusPolicy(Qt.StrongFocus)
         
         self._init_ui_state()
         
-        palette = self.videoWidget.palette()
-        # 使用 QColor 设置为灰色 (128, 128, 128)
-        palette.setColor(QPalette.Window, QColor(128, 128, 128))
-        self.videoWidget.setPalette(palette)
-        self.videoWidget.setAutoFillBackground(True)
-        self.videoWidget.setAspectRatioMode(Qt.IgnoreAspectRatio)
-        self._player.setVideoOutput(self.videoWidget)
-        self.ui.hlayout.addWidget(self.videoWidget)
+        # 缓存帧画面与videoWidget叠放，拖动时显示缓存帧，播放时显示videoWidget
+        self.frame_view = FrameView()
+        self.video_stack = QStackedWidget()
+        self.video_stack.addWidget(self.frame_view)
+        self.ui.hlayout.addWidget(self.video_stack)
+        # 叠在画面上的性能浮层，关闭时各处计数器不做任何事
+        self.perf_hud = PerfHud(self.video_stack, self.cache_memory)
+        # Max视口中的参考画面，跟随Max时间从帧缓存取帧
+        self.reference = ReferenceStreamer(self.host, self)
+        self.reference.frame_source = self.reference_frame
+        # 放大时从源文件解码可见区域的高分辨率画面
+        self.roi_decoder = None
+        
+        # 洋葱皮只从已缓存的帧合成
+        self.onion_skin = OnionSkin()
+        self.frame_view.set_onion_skin(self.onion_skin, self.onion_neighbour)
+        
+        # 滑块上方的缩略图胶片
+        self.filmstrip = FilmstripWidget()
+        self.filmstrip_worker = None
+        self.ui.filmstrip_layout.addWidget(self.filmstrip)
+        self.filmstrip.align_to(self.ui.slider)
+        
+        # 滑块下方的运动能量曲线和候选关键姿势
+        self.motion_curve = MotionCurveWidget()
+        self.motion_worker = None
+        self.ui.timeline_layout.addWidget(self.motion_curve)
+        self.motion_curve.align_to(self.ui.slider)
+        
+        # 运动曲线下方的音频波形
+        self.waveform = WaveformWidget()
+        self.waveform_worker = None
+        self.ui.timeline_layout.addWidget(self.waveform)
+        self.waveform.align_to(self.ui.slider)
         self.connect()
         self.setup_max_sync()
 
@@ -54,19 +166,50 @@ class PlayVideo(MainWindow):
 
     def connect(self):
         self.ui.selectVideo_Button.clicked.connect(self.select_video)
-        self._player.durationChanged.connect(self.update_duration)
-        self._player.positionChanged.connect(self.update_position)
-        self._player.errorOccurred.connect(self.handle_player_error)
-        self._player.mediaStatusChanged.connect(self.handle_media_status)
+        if hasattr(self.ui, 'recent_Button'):
+            recent_menu = QMenu(self)
+            recent_menu.aboutToShow.connect(self.update_recent_menu)
+            self.ui.recent_Button.setMenu(recent_menu)
+        if hasattr(self.ui, 'multiAngle_Button'):
+            self.ui.multiAngle_Button.clicked.connect(self.open_multi_angle)
+        if hasattr(self.ui, 'alignAudio_Button'):
+            self.ui.alignAudio_Button.clicked.connect(self.align_by_audio)
+        if hasattr(self.ui, 'loop_Button'):
+            self.ui.setIn_Button.clicked.connect(self.set_loop_in)
+            self.ui.setOut_Button.clicked.connect(self.set_loop_out)
+            self.ui.clearRange_Button.clicked.connect(self.clear_loop_range)
+            self.ui.loop_Button.toggled.connect(self.toggle_loop_playback)
+            self.ui.loopMode_ComboBox.currentIndexChanged.connect(self.set_loop_mode)
+        if hasattr(self.ui, 'export_Button'):
+            self.ui.export_Button.clicked.connect(self.export_sequence)
+        self.loop_player.frameChanged.connect(self.on_loop_frame)
+        self.load_progress.progressChanged.connect(self.on_load_progress)
+        self.frame_view.roiRequested.connect(self.request_roi)
+        if hasattr(self.ui, 'reference_CheckBox'):
+            self.ui.reference_CheckBox.toggled.connect(self.toggle_reference)
+            self.ui.referenceTarget_ComboBox.currentIndexChanged.connect(self.set_reference_target)
+        if hasattr(self.ui, 'perfHud_CheckBox'):
+            self.ui.perfHud_CheckBox.toggled.connect(self.perf_hud.set_enabled)
+        if hasattr(self.ui, 'onion_CheckBox'):
+            self.ui.onion_CheckBox.setEnabled(onion_available())
+            self.ui.onion_CheckBox.toggled.connect(self.update_onion_skin)
+            self.ui.onionCount_SpinBox.valueChanged.connect(self.update_onion_skin)
+            self.ui.onionFalloff_SpinBox.valueChanged.connect(self.update_onion_skin)
+        self.shuttle.rateChanged.connect(self.on_shuttle_rate)
+        self.shuttle.stepRequested.connect(self.step_frames)
+        self.shuttle.reversePosition.connect(self.on_shuttle_reverse)
+        self.seek_timer.timeout.connect(self.apply_pending_seek)
         self.ui.slider.sliderPressed.connect(self.slider_pressed)
         self.ui.slider.sliderReleased.connect(self.slider_released)
         self.ui.slider.sliderMoved.connect(self.set_video_position)
         self.ui.slider.actionTriggered.connect(self.on_action_triggered)
+        self.follow_clock.followStopped.connect(self.show_max_position)
+        self.filmstrip.positionClicked.connect(self.on_filmstrip_clicked)
+        self.motion_curve.positionClicked.connect(self.on_filmstrip_clicked)
+        self.waveform.positionClicked.connect(self.on_filmstrip_clicked)
         self.ui.syncFromMax_CheckBox.stateChanged.connect(self.toggle_sync_from_max)
         self.ui.syncToMax_CheckBox.stateChanged.connect(self.toggle_sync_from_max)
-        # 连接同步定时器
-        self.sync_timer.timeout.connect(self.sync_to_max)
-        
+        self.ui.engine_CheckBox.toggled.connect(self.toggle_engine)
         # 3ds Max相关按钮连接
         if hasattr(self.ui, 'setStartTime_Button'):
             self.ui.setStartTime_Button.clicked.connect(self.set_max_start_time)
@@ -92,6 +235,11 @@ class PlayVideo(MainWindow):
 
     def on_action_triggered(self, action):
         """响应各种滑块动作"""
+        if self.loop_active() and action in (QAbstractSlider.SliderSingleStepAdd.value,
+                                             QAbstractSlider.SliderSingleStepSub.value):
+            # 区间播放时逐帧在内存缓冲里前后移动，到边界绕回
+            self.loop_player.step(1 if action == QAbstractSlider.SliderSingleStepAdd.value else -1)
+            return
         if action == QAbstractSlider.SliderSingleStepAdd.value:
             position = self.ui.slider.value()+self.ui.slider.singleStep()
             self.slider_released_action(position)
@@ -111,18 +259,47 @@ class PlayVideo(MainWindow):
         """滑块释放时设置位置并继续播放"""
 
         self.ui.slider.setValue(position)
-        self._player.setPosition(position)
+        self.show_frame_at(position)
         # 同步到3ds Max
         self._player.pause()
         self.sync_video_to_max(position)
 
+    def init_player(self):
+        """第一次打开视频时导入QtMultimedia，创建播放器和视频控件"""
+        if self._player is not None:
+            return
+        global QMediaPlayer, QVideoWidget
+        warm = QMediaPlayer is not None
+        start = time.perf_counter()
+        QMediaPlayer, QVideoWidget = import_multimedia()
+        self._player = QMediaPlayer()
+        self.videoWidget = QVideoWidget()
+        palette = self.videoWidget.palette()
+        # 使用 QColor 设置为灰色 (128, 128, 128)
+        palette.setColor(QPalette.Window, QColor(128, 128, 128))
+        self.videoWidget.setPalette(palette)
+        self.videoWidget.setAutoFillBackground(True)
+        # 保持宽高比，与可以放大的缓存帧画面一致
+        self.videoWidget.setAspectRatioMode(Qt.KeepAspectRatio)
+        self._player.setVideoOutput(self.videoWidget)
+        self.video_stack.insertWidget(0, self.videoWidget)
+        self.videoWidget.installEventFilter(self)
+        self.follow_clock.player = self._player
+        self._player.durationChanged.connect(self.update_duration)
+        self._player.positionChanged.connect(self.update_position)
+        self._player.errorOccurred.connect(self.handle_player_error)
+        self._player.mediaStatusChanged.connect(self.handle_media_status)
+        self._player.playbackStateChanged.connect(self.handle_playback_state)
+        # 播放器在第一次打开视频时才创建，单独记一条启动耗时
+        record_startup("PlayVideo", [("QtMultimedia", (time.perf_counter() - start) * 1000)], warm)
+
     def setup_max_sync(self):
         """设置3ds Max同步功能"""
         # 监听3ds Max时间滑块变化
         try:
             # 注册回调函数，当3ds Max时间改变时调用
-            # rt.callbacks.addScript(rt.Name('timeChanged'), self.on_max_time_changed)
-            rt.registerTimeCallback(self.on_max_time_changed) 
+            # 同一owner的旧回调（上一次运行留下的）会先被注销，不会重复触发
+            self.host.register_time_callback(self.on_max_time_changed, owner=WINDOW_OBJECT_NAME)
         except:
             print("无法注册3ds Max时间变化回调")
 
@@ -137,13 +314,114 @@ class PlayVideo(MainWindow):
         
         if file_name:
             self.last_open_dir = str(Path(file_name).parent)
+            self.session.last_open_dir = self.last_open_dir
             self.load_video(file_name)
     
+    def open_multi_angle(self):
+        """打开多机位同步播放窗口"""
+        if not decoder_available():
+            QMessageBox.warning(self, "错误", "多机位播放需要PyAV，请先执行 pip install av")
+            return
+        if self.multi_angle is None:
+            self.multi_angle = MultiAngleWindow(self.host)
+            self.multi_angle.setWindowFlags(self.multi_angle.windowFlags() | Qt.WindowStaysOnTopHint)
+            self.multi_angle.last_open_dir = self.last_open_dir
+            self.multi_angle.resize(1000, 600)
+        self.multi_angle.show()
+        self.multi_angle.raise_()
+        if not self.multi_angle.clips:
+            self.multi_angle.select_videos()
+
+    def align_by_audio(self):
+        """选择另一个机位的视频作为参考，按音频计算当前视频的开始帧"""
+        if not self.current_file:
+            QMessageBox.warning(self, "错误", "请先选择视频")
+            return
+        if not alignment_available():
+            QMessageBox.warning(self, "错误", "音频对齐需要PyAV和NumPy")
+            return
+        if self.aligner is not None:
+            return
+        reference, _ = QFileDialog.getOpenFileName(
+            self,
+            "选择参考机位的视频（开始帧为0）",
+            self.last_open_dir,
+            "视频文件 (*.mp4 *.avi *.mov *.mkv *.wmv *.flv);;所有文件 (*.*)"
+        )
+        if not reference:
+            return
+        self.aligner = AudioAligner(reference, [self.current_file], self)
+        self.aligner.alignReady.connect(self.on_align_ready)
+        self.aligner.alignFailed.connect(self.on_align_failed)
+        self.aligner.finished.connect(self.on_align_finished)
+        self.ui.alignAudio_Button.setEnabled(False)
+        self.aligner.start()
+
+    def on_align_ready(self, results):
+        """把对齐结果写入开始帧"""
+        if self.current_file not in results:
+            return
+        offset_ms, confidence = results[self.current_file]
+        frames = int(round(offset_ms * self.max_fps / 1000.0))
+        self.ui.spinBox.setValue(frames)
+        if confidence < ALIGN_MIN_CONFIDENCE:
+            QMessageBox.warning(self, "音频对齐", f"音频相关性较弱，开始帧 {frames} 可能不准确，请检查")
+
+    def on_align_failed(self, error):
+        QMessageBox.warning(self, "音频对齐", f"音频对齐失败:\n{error}")
+
+    def on_align_finished(self):
+        self.aligner.deleteLater()
+        self.aligner = None
+        self.ui.alignAudio_Button.setEnabled(True)
+
     def load_video(self, file_path):
         """加载视频文件"""
         try:
+            self.init_player()
+            self.save_session()
+            self.cancel_proxy_builder()
+            self.cancel_export()
+            self.sync_scheduler.reset()
+            self.current_file = str(file_path)
+            self.session.add_recent(file_path)
+            # 上次打开这个视频时保存的元数据和状态，不必等播放器报告时长就能恢复
+            media = self.session.media(file_path) or {}
+            # 先播放源文件；代理按内容哈希查找，哈希要读文件，交给后台的ProxyBuilder计算，
+            # 已有代理时它很快报告proxyReady，没有时就地生成，两种情况都由on_proxy_ready切换过去
+            self.proxy_file = None
+            self._restore_position = media.get("position_ms") or None
+            self.reference.reset()
+            # 上一个视频的时长作废，新时长从会话、文件头或播放器中最先到达的那个得到
+            self.total_duration = 0
+            self.waveform.set_duration(0)
+            self.frame_index = None
+            self._range_pending = True
+            self.load_progress.start(file_path)
+            if media.get("duration_ms"):
+                self.update_duration(media["duration_ms"])
+            else:
+                self.start_probe(file_path)
+            if media.get("offset") is not None:
+                self.ui.spinBox.setValue(media["offset"])
+            self.loop_in_ms = media.get("loop_in_ms")
+            self.loop_out_ms = media.get("loop_out_ms")
+            # 先丢掉上一个视频的区间缓冲，退出区间播放时不会跳到旧视频的区间位置、覆盖恢复的播放位置
+            self.loop_player.set_buffer(None)
+            self.update_loop_range()
             self._player.setSource(QUrl.fromLocalFile(file_path))
-            self._player.play()
+            if self.engine is not None:
+                # 播放由独立进程负责，Max进程内的播放器保持暂停
+                self._engine_position_ms = self._restore_position or 0
+                self.engine.open(file_path, None)
+                self.engine.play(self._engine_position_ms)
+            else:
+                self._player.play()
+            self.start_frame_index(file_path)
+            self.start_proxy_builder(file_path)
+            self.start_filmstrip(file_path)
+            self.start_motion_curve(file_path)
+            self.start_waveform(file_path)
             # self._player.setPosition(1)
             
             # 更新窗口标题显示当前播放的文件
@@ -151,13 +429,72 @@ class PlayVideo(MainWindow):
             
             # 启用滑块
             self.ui.slider.setEnabled(True)
-            
-            # 自动设置3ds Max的开始和结束时间
-            self.auto_set_max_time_range()
+            if hasattr(self.ui, 'export_Button'):
+                self.ui.export_Button.setEnabled(export_available())
             
         except Exception as e:
             QMessageBox.warning(self, "错误", f"无法播放视频:\n{str(e)}")
 
+    # ========== 加载进度 ==========
+
+    def start_probe(self, file_path):
+        """后台读取文件头中的时长"""
+        probe = MediaProbe(file_path, self)
+        probe.probed.connect(self.on_probed)
+        probe.probeFailed.connect(self.on_probe_failed)
+        probe.finished.connect(probe.deleteLater)
+        probe.start()
+
+    def on_probed(self, file_path, info):
+        if file_path != self.current_file:
+            return
+        self.session.update_media(file_path, duration_ms=info["duration_ms"])
+        if not self.total_duration:
+            self.update_duration(info["duration_ms"])
+
+    def on_probe_failed(self, file_path, error):
+        # 等播放器报告时长
+        print(f"读取视频时长失败: {error}")
+
+    def on_load_progress(self, text, percent):
+        if hasattr(self.ui, 'load_label'):
+            self.ui.load_label.setText(text)
+
+    # ========== 会话 ==========
+
+    def save_session(self):
+        """记下当前视频的播放位置、开始帧和入出点，下次打开时恢复"""
+        if not self.current_file:
+            return
+        self.session.update_media(
+            self.current_file,
+            position_ms=self.current_position(),
+            offset=self.ui.spinBox.value(),
+            loop_in_ms=self.loop_in_ms,
+            loop_out_ms=self.loop_out_ms,
+        )
+
+    def update_recent_menu(self):
+        """展开“最近”菜单时重新列出最近打开的视频"""
+        menu = self.ui.recent_Button.menu()
+        menu.clear()
+        recent = self.session.recent_files()
+        if not recent:
+            menu.addAction("（没有最近打开的视频）").setEnabled(False)
+        for path in recent:
+            action = menu.addAction(Path(path).name)
+            action.setToolTip(path)
+            action.triggered.connect(lambda checked=False, path=path: self.open_recent(path))
+
+    def open_recent(self, file_path):
+        if not Path(file_path).is_file():
+            self.session.remove_recent(file_path)
+            QMessageBox.warning(self, "错误", f"视频文件已不存在:\n{file_path}")
+            return
+        self.last_open_dir = str(Path(file_path).parent)
+        self.session.last_open_dir = self.last_open_dir
+        self.load_video(file_path)
+
     def format_time(self, ms):
         """将毫秒转换为 MM:SS 格式"""
         seconds = int(ms / 1000)
@@ -177,28 +514,44 @@ class PlayVideo(MainWindow):
     
     def ms_to_frames(self, ms):
         """将毫秒转换为帧数"""
+        if self.frame_index is not None:
+            # 先确定该时间显示的视频帧，再按该帧的真实时间戳换算成Max帧
+            video_frame = self.frame_index.frame_at_ms(ms)
+            ms = self.frame_index.time_ms(video_frame)
+            return int(ms / 1000.0 * self.max_fps + 1e-6)
         seconds = ms / 1000.0
         return int(seconds * self.max_fps)
     
     def frames_to_ms(self, frames):
         """将帧数转换为毫秒"""
+        if self.frame_index is not None:
+            # Max帧对应的视频帧唯一确定，返回该帧的时间戳，播放器seek后正好落在这一帧
+            video_frame = self.frame_index.frame_at_ms(frames * 1000.0 / self.max_fps)
+            return int(math.ceil(self.frame_index.time_ms(video_frame)))
         seconds = frames / self.max_fps
         return int(seconds * 1000)
     
     def update_duration(self, duration):
         """更新视频总时长"""
         if duration > 0:
+            if self.current_file and self.sender() is self._player:
+                # 记下时长，下次打开时不必等播放器
+                self.session.update_media(self.current_file, duration_ms=duration)
             self.total_duration = duration
+            self.max_to_video.duration_ms = duration
+            self.waveform.set_duration(duration)
             self.ui.slider.setMaximum(duration)
             self.ui.slider.setSingleStep(self.max_fps)
             self.ui.slider.setPageStep(self.max_fps)
             self.ui.slider.setTickInterval(self.max_fps)
-            self.update_time_label(self._player.position())
+            self.update_time_label(self.current_position())
             
             # 显示包含帧数的时间
             if hasattr(self.ui, 'frame_label'):
                 total_frames = self.ms_to_frames(duration)
                 self.ui.frame_label.setText(f"总帧数: {total_frames}")
+            self.load_progress.mark(self.current_file, LOAD_STAGE_PROBE)
+            self.auto_set_max_time_range()
 
     def update_time_label(self, position):
         """更新时间显示标签"""
@@ -221,6 +574,7 @@ class PlayVideo(MainWindow):
         
         # 更新时间标签
         self.update_time_label(position)
+        self.update_filmstrip_playhead(position)
         
         # 同步到3ds Max（如果启用）
         self.sync_to_max()
@@ -231,13 +585,18 @@ class PlayVideo(MainWindow):
 
     def slider_pressed(self):
         """滑块被按下时暂停视频"""
+        self.follow_clock.stop()
+        self.shuttle.stop()
         self._player.pause()
+        # 提前开始解码当前位置附近的帧
+        if self.prefetcher is not None:
+            self.prefetcher.set_playhead(self.prefetcher.decoder.ms_to_index(self.ui.slider.value()))
     
     def slider_released(self):
         """滑块释放时设置位置并继续播放"""
         position = self.ui.slider.value()
 
-        self._player.setPosition(position)
+        self.show_frame_at(position)
         # 同步到3ds Max
         self.sync_video_to_max(position)
     
@@ -245,7 +604,7 @@ class PlayVideo(MainWindow):
 
     def set_video_position(self, position):
         """设置视频位置"""
-        self._player.setPosition(position)
+        self.show_frame_at(position)
 
         self._player.pause()
         # 同步到3ds Max
@@ -261,87 +620,904 @@ class PlayVideo(MainWindow):
     
     def handle_media_status(self, status):
         """处理媒体状态变化"""
-        if status == QMediaPlayer.EndOfMedia:
-            # 视频播放结束时重置
+        if status == QMediaPlayer.LoadedMedia and self._restore_position is not None:
+            # 切换到代理文件后回到原来的位置
+            self._player.setPosition(self._restore_position)
+            self._restore_position = None
+        elif status == QMediaPlayer.BufferedMedia:
+            self.load_progress.mark(self.current_file, LOAD_STAGE_FRAME)
+        elif status == QMediaPlayer.EndOfMedia:
+            self.on_end_of_media()
+
+    def on_end_of_media(self):
+        """视频播放结束时重置"""
+        self.shuttle.stop()
+        if self.engine is not None:
+            self.show_frame_at(0)
+        else:
             self._player.setPosition(0)
-            # 同步重置3ds Max时间
-            self.sync_video_to_max(0)
+        # 同步重置3ds Max时间
+        self.sync_video_to_max(0)
 
-    # ========== 3ds Max 同步功能 ==========
-    
-    def toggle_max_sync(self, state):
-        """切换3ds Max同步功能"""
-        if state == Qt.Checked:
-            self.sync_timer.start()
+    def current_position(self):
+        """当前视频位置（毫秒）"""
+        if self.loop_active():
+            return self.loop_player.position_ms
+        if self.engine is not None:
+            return self._engine_position_ms
+        if self.shuttle.rate < 0:
+            return self.shuttle.position_ms
+        if self._player is None:
+            return 0
+        return self._player.position()
+
+    def handle_playback_state(self, state):
+        """开始播放时切回videoWidget显示"""
+        if state == QMediaPlayer.PlayingState:
+            self.apply_pending_seek()
+            self._wanted_frame = -1
+            self.video_stack.setCurrentWidget(self.videoWidget)
+
+    # ========== 帧索引 ==========
+
+    def start_frame_index(self, file_path):
+        """后台加载或建立帧索引，完成后再启动帧缓存"""
+        self.stop_frame_cache()
+        self.stop_roi_decoder()
+        self.frame_view.reset_view()
+        self.frame_index = None
+        if not decoder_available():
+            self.load_progress.mark(file_path, LOAD_STAGE_INDEX)
+            return
+        builder = FrameIndexBuilder(file_path, self)
+        builder.indexReady.connect(self.on_frame_index_ready)
+        builder.indexFailed.connect(self.on_frame_index_failed)
+        builder.finished.connect(builder.deleteLater)
+        builder.start()
+
+    def on_frame_index_ready(self, file_path, index):
+        """帧索引就绪"""
+        if file_path != self.current_file:
+            return
+        self.frame_index = index
+        self.load_progress.mark(file_path, LOAD_STAGE_INDEX)
+        self.session.update_media(file_path, fps=index.fps, frame_count=index.frame_count,
+                                  frame_index=str(FrameIndex.cache_path(file_path)))
+        # 放大区域的解码器改用帧索引定位
+        self.stop_roi_decoder()
+        if self.engine is None:
+            self.start_frame_cache(file_path)
+
+    def on_frame_index_failed(self, file_path, error):
+        """帧索引建立失败时退回恒定帧率换算"""
+        if file_path != self.current_file:
+            return
+        print(f"建立帧索引失败: {error}")
+        self.load_progress.mark(file_path, LOAD_STAGE_INDEX)
+        if self.engine is None:
+            self.start_frame_cache(file_path)
+
+    # ========== 代理文件 ==========
+
+    def start_proxy_builder(self, file_path):
+        """后台生成全关键帧代理文件"""
+        if not decoder_available():
+            return
+        self.proxy_builder = ProxyBuilder(file_path, self)
+        self.proxy_builder.progress.connect(self.on_proxy_progress)
+        self.proxy_builder.proxyReady.connect(self.on_proxy_ready)
+        self.proxy_builder.proxyFailed.connect(self.on_proxy_failed)
+        self.proxy_builder.finished.connect(self.proxy_builder.deleteLater)
+        self.proxy_builder.start()
+
+    def cancel_proxy_builder(self):
+        """放弃正在生成的代理"""
+        if self.proxy_builder is not None:
+            self.proxy_builder.cancel()
+            self.proxy_builder = None
+
+    def on_proxy_progress(self, percent):
+        """在窗口标题显示代理生成进度"""
+        if self.sender() is not self.proxy_builder or self.current_file is None:
+            return
+        name = Path(self.current_file).name
+        if percent < 100:
+            self.setWindowTitle(f'个人模仿秀 - {name}（生成代理 {percent}%）')
         else:
-            self.sync_timer.stop()
-    
-    def sync_to_max(self):
-        """将视频时间同步到3ds Max时间轴"""
-        if not hasattr(self, 'total_duration') or self.total_duration == 0:
+            self.setWindowTitle(f'个人模仿秀 - {name}')
+
+    def on_proxy_ready(self, file_path, proxy_path):
+        """找到已有的代理或代理生成完成后，无缝切换播放源"""
+        self.proxy_builder = None
+        if file_path != self.current_file:
             return
-            
-        # 检查是否启用同步
-        if hasattr(self.ui, 'syncToMax_CheckBox') and not self.ui.syncToMax_CheckBox.isChecked():
+        self.proxy_file = proxy_path
+
+        playing = self._player.playbackState() == QMediaPlayer.PlayingState
+        self.apply_pending_seek()
+        if self._restore_position is None:
+            # 源文件还没加载完时保留会话中要恢复的位置
+            self._restore_position = self._player.position()
+        self._player.setSource(QUrl.fromLocalFile(proxy_path))
+        if playing:
+            self._player.play()
+        else:
+            self._player.pause()
+
+        # 帧缓存也改为从代理解码
+        if self.engine is not None:
+            self.engine.open(file_path, proxy_path)
+            self.engine.show(self.engine_frame_index(self._engine_position_ms))
+        elif self.prefetcher is not None:
+            self.start_frame_cache(file_path)
+
+    def on_proxy_failed(self, file_path, error):
+        """代理生成失败时继续使用源文件"""
+        self.proxy_builder = None
+        if file_path == self.current_file:
+            self.setWindowTitle(f'个人模仿秀 - {Path(file_path).name}')
+        print(f"生成代理文件失败: {error}")
+
+    # ========== 缩略图胶片 ==========
+
+    def start_filmstrip(self, file_path):
+        """后台生成缩略图胶片"""
+        self.stop_filmstrip()
+        if not decoder_available():
             return
-            
-        if self.is_syncing_to_max:
+        self.filmstrip_worker = FilmstripWorker(file_path, self.proxy_file, self)
+        self.filmstrip_worker.thumbReady.connect(self.on_filmstrip_thumb)
+        self.filmstrip_worker.finished.connect(self.on_filmstrip_finished)
+        self.filmstrip_worker.start()
+
+    def on_filmstrip_thumb(self, position, image):
+        """只接收当前线程的缩略图，已取消的线程排队中的结果直接丢弃"""
+        if self.sender() is self.filmstrip_worker:
+            self.filmstrip.add_thumbnail(position, image)
+
+    def on_filmstrip_finished(self):
+        """生成结束后释放线程对象"""
+        worker = self.sender()
+        if worker is self.filmstrip_worker:
+            self.filmstrip_worker = None
+        worker.deleteLater()
+
+    def stop_filmstrip(self):
+        """停止生成并清空胶片"""
+        if self.filmstrip_worker is not None:
+            self.filmstrip_worker.thumbReady.disconnect(self.on_filmstrip_thumb)
+            self.filmstrip_worker.cancel()  # 不等待，线程结束后由on_filmstrip_finished释放
+            self.filmstrip_worker = None
+        self.filmstrip.clear()
+
+    def update_filmstrip_playhead(self, position_ms):
+        """在胶片上标出当前位置"""
+        if getattr(self, 'total_duration', 0):
+            self.filmstrip.set_playhead(position_ms / self.total_duration)
+            self.motion_curve.set_playhead(position_ms / self.total_duration)
+            self.waveform.set_playhead(position_ms / self.total_duration)
+
+    def on_filmstrip_clicked(self, fraction):
+        """点击胶片跳到对应位置"""
+        if not getattr(self, 'total_duration', 0):
             return
-            
-        self.is_syncing_to_max = True
-        
+        self._player.pause()
+        position = int(fraction * self.total_duration)
+        self.ui.slider.setValue(position)
+        self.show_frame_at(position)
+        self.update_time_label(position)
+        self.sync_video_to_max(position)
+
+    # ========== 运动曲线 ==========
+
+    def start_motion_curve(self, file_path):
+        """后台计算运动能量曲线（有缓存时直接读取）"""
+        self.stop_motion_curve()
+        if not motion_available():
+            return
+        self.motion_worker = MotionWorker(file_path, self.proxy_file, self)
+        self.motion_worker.curveReady.connect(self.on_motion_curve_ready)
+        self.motion_worker.curveFailed.connect(self.on_motion_curve_failed)
+        self.motion_worker.finished.connect(self.on_motion_worker_finished)
+        self.motion_worker.start()
+
+    def stop_motion_curve(self):
+        if self.motion_worker is not None:
+            self.motion_worker.curveReady.disconnect(self.on_motion_curve_ready)
+            self.motion_worker.curveFailed.disconnect(self.on_motion_curve_failed)
+            self.motion_worker.cancel()  # 不等待，线程结束后由on_motion_worker_finished释放
+            self.motion_worker = None
+        self.motion_curve.clear()
+
+    def on_motion_worker_finished(self):
+        worker = self.sender()
+        if worker is self.motion_worker:
+            self.motion_worker = None
+        worker.deleteLater()
+
+    def on_motion_curve_ready(self, file_path, curve):
+        if self.sender() is self.motion_worker and file_path == self.current_file:
+            self.motion_curve.set_curve(curve)
+
+    def on_motion_curve_failed(self, file_path, error):
+        print(f"计算运动曲线失败: {error}")
+
+    def jump_to_pose(self, direction):
+        """跳到上一个（-1）或下一个（1）候选关键姿势"""
+        curve = self.motion_curve.curve
+        if curve is None:
+            return
+        position_ms = self.current_position()
+        decoder = self.prefetcher.decoder if self.prefetcher is not None else None
+        index = decoder.ms_to_index(position_ms) if decoder else int(position_ms * curve.fps / 1000)
+        target = curve.next_pose(index, direction)
+        if target is None:
+            return
+        self.shuttle.stop()
+        self.slider_released_action(decoder.index_to_ms(target) if decoder else int(target * 1000 / curve.fps))
+
+    # ========== 音频波形 ==========
+
+    def start_waveform(self, file_path):
+        """后台生成音频波形的峰值金字塔（有缓存时直接读取）"""
+        self.stop_waveform()
+        if not waveform_available():
+            return
+        # 代理不一定带音轨，始终从源文件解码
+        self.waveform_worker = WaveformWorker(file_path, self)
+        self.waveform_worker.waveformReady.connect(self.on_waveform_ready)
+        self.waveform_worker.waveformFailed.connect(self.on_waveform_failed)
+        self.waveform_worker.finished.connect(self.on_waveform_worker_finished)
+        self.waveform_worker.start()
+
+    def stop_waveform(self):
+        # 整条音轨的解码无法中途停止，旧线程断开信号后自行结束，不阻塞切换视频
+        if self.waveform_worker is not None:
+            self.waveform_worker.waveformReady.disconnect(self.on_waveform_ready)
+            self.waveform_worker = None
+        self.waveform.clear()
+
+    def on_waveform_worker_finished(self):
+        worker = self.sender()
+        if worker is self.waveform_worker:
+            self.waveform_worker = None
+        worker.deleteLater()
+
+    def on_waveform_ready(self, file_path, pyramid):
+        if file_path == self.current_file:
+            self.waveform.set_pyramid(pyramid)
+
+    def on_waveform_failed(self, file_path, error):
+        print(f"生成音频波形失败: {error}")
+
+    # ========== 独立解码进程 ==========
+
+    def toggle_engine(self, checked):
+        """切换独立进程解码"""
+        if checked:
+            self.start_engine()
+        else:
+            self.stop_engine()
+
+    def start_engine(self):
+        """启动独立解码进程，接管当前视频的解码、缓存和播放"""
+        if self.engine is not None:
+            return
+        if not decoder_available():
+            QMessageBox.warning(self, "错误", "未安装PyAV，无法使用独立进程解码")
+            self.ui.engine_CheckBox.setChecked(False)
+            return
+        engine = EngineClient(self)
+        if not engine.start():
+            QMessageBox.warning(self, "错误", "无法启动独立解码进程")
+            self.ui.engine_CheckBox.setChecked(False)
+            return
+        engine.frameReady.connect(self.on_engine_frame)
+        engine.opened.connect(self.on_engine_opened)
+        engine.ended.connect(self.on_end_of_media)
+        engine.failed.connect(self.on_engine_failed)
+        self.engine = engine
+
+        # 本进程内的后台解码停掉，播放器停在当前位置
+        self.follow_clock.stop()
+        if self._player is not None:
+            self._engine_position_ms = self._player.position()
+            self._player.pause()
+        self.stop_frame_cache()
+        if self.current_file:
+            self.engine.open(self.current_file, self.proxy_file)
+            self.engine.show(self.engine_frame_index(self._engine_position_ms))
+
+    def stop_engine(self):
+        """关闭独立解码进程，回到本进程解码"""
+        if self.engine is None:
+            return
+        engine, self.engine = self.engine, None
+        engine.stop()
+        engine.deleteLater()
+        if self._player is not None:
+            self._player.setPosition(self._engine_position_ms)
+        if self.current_file:
+            self.start_frame_cache(self.current_file)
+
+    def engine_frame_index(self, position_ms):
+        """独立进程中的帧序号"""
+        if self.frame_index is not None:
+            return self.frame_index.frame_at_ms(position_ms)
+        return int(position_ms / 1000.0 * (self._engine_fps or self.max_fps))
+
+    def on_engine_opened(self, info):
+        """独立进程打开视频后拿到时长和帧率"""
+        self._engine_fps = info.get("fps", 0.0)
+        if not getattr(self, 'total_duration', 0):
+            self.update_duration(info.get("duration_ms", 0))
+
+    def on_engine_frame(self, index, position_ms, image):
+        """显示独立进程送来的画面"""
+        if self.engine is None:
+            return
+        self.load_progress.mark(self.current_file, LOAD_STAGE_FRAME)
+        if perf.enabled:
+            perf.tick("decode")
+            perf.finish("seek", index)
+        self.frame_view.set_frame(index, image)
+        self.video_stack.setCurrentWidget(self.frame_view)
+        if self.engine.playing:
+            self._engine_position_ms = position_ms
+            self.update_position(position_ms)
+
+    def on_engine_failed(self, message):
+        """独立进程出错时退回本进程解码"""
+        print(f"独立解码进程出错: {message}")
+        self.ui.engine_CheckBox.setChecked(False)
+
+    # ========== J/K/L 穿梭 ==========
+
+    def keyPressEvent(self, event):
+        """J/K/L穿梭，逗号/句号跳到上一个/下一个关键姿势；区间播放时J/L逐帧、K暂停"""
+        if self.current_file and not event.isAutoRepeat():
+            key = event.key()
+            if self.loop_active() and key in (Qt.Key_J, Qt.Key_K, Qt.Key_L):
+                if key == Qt.Key_K:
+                    self.loop_player.pause()
+                else:
+                    self.loop_player.step(-1 if key == Qt.Key_J else 1)
+                return
+            if key in (Qt.Key_Comma, Qt.Key_Period):
+                self.jump_to_pose(-1 if key == Qt.Key_Comma else 1)
+                return
+            if self.shuttle.key_pressed(key):
+                return
+        super().keyPressEvent(event)
+
+    def keyReleaseEvent(self, event):
+        if not event.isAutoRepeat() and self.shuttle.key_released(event.key()):
+            return
+        super().keyReleaseEvent(event)
+
+    def on_shuttle_rate(self, rate):
+        """穿梭速率改变：正向交给播放器，倒放由穿梭时钟从帧缓存取帧"""
+        previous, self._shuttle_rate = self._shuttle_rate, rate
+        self.follow_clock.stop()
+        if rate == 0:
+            self.ui.shuttle_label.setText("")
+        else:
+            self.ui.shuttle_label.setText(f"{'▶' if rate > 0 else '◀'} {abs(rate):g}x")
+
+        if self.engine is not None:
+            if rate:
+                self.engine.play(self._engine_position_ms, rate)
+            else:
+                self.engine.pause()
+            return
+        if self.prefetcher is not None:
+            self.prefetcher.set_direction(-1 if rate < 0 else 1)
+        if rate > 0:
+            self.apply_pending_seek()
+            self._player.setPlaybackRate(rate)
+            self._player.play()
+        elif rate < 0:
+            self._player.pause()
+        else:
+            self._player.setPlaybackRate(1.0)
+            if previous < 0:
+                # 倒放停下：显示停下位置的画面，播放器随后定位过去
+                self.show_frame_at(self.shuttle.position_ms)
+            else:
+                self._player.pause()
+
+    def on_shuttle_reverse(self, position_ms):
+        """倒放时显示时钟位置的画面"""
+        if self.engine is not None:
+            return
+        self.show_frame_at(position_ms)
+        self.ui.slider.blockSignals(True)
+        self.ui.slider.setValue(position_ms)
+        self.ui.slider.blockSignals(False)
+        self.update_time_label(position_ms)
+        self.sync_video_to_max(position_ms)
+
+    def step_frames(self, delta):
+        """逐帧前进/后退"""
+        self.shuttle.stop()
+        position_ms = self.current_position()
+        if self.prefetcher is not None:
+            decoder = self.prefetcher.decoder
+            index = max(0, decoder.ms_to_index(position_ms) + delta)
+            if decoder.frame_count:
+                index = min(index, decoder.frame_count - 1)
+            position_ms = decoder.index_to_ms(index)
+        else:
+            position_ms = max(0, int(position_ms + delta * 1000 / self.max_fps))
+        self.slider_released_action(position_ms)
+
+    # ========== 入出点区间播放 ==========
+
+    def loop_active(self):
+        """是否处于区间播放"""
+        return self.loop_player.buffer is not None and self.ui.loop_Button.isChecked()
+
+    def set_loop_in(self):
+        """当前位置设为入点"""
+        self.loop_in_ms = self.current_position()
+        if self.loop_out_ms is not None and self.loop_out_ms <= self.loop_in_ms:
+            self.loop_out_ms = None
+        self.update_loop_range()
+
+    def set_loop_out(self):
+        """当前位置设为出点"""
+        self.loop_out_ms = self.current_position()
+        if self.loop_in_ms is not None and self.loop_in_ms >= self.loop_out_ms:
+            self.loop_in_ms = None
+        self.update_loop_range()
+
+    def clear_loop_range(self):
+        self.loop_in_ms = None
+        self.loop_out_ms = None
+        self.update_loop_range()
+
+    def update_loop_range(self):
+        """入出点改变：更新显示，两端都有时开始缓冲"""
+        self.cancel_loop_buffer()
+        self.ui.loop_Button.setChecked(False)
+        self.ui.loop_Button.setEnabled(False)
+        self.loop_player.set_buffer(None)
+
+        in_text = self.format_time(self.loop_in_ms) if self.loop_in_ms is not None else "--:--"
+        out_text = self.format_time(self.loop_out_ms) if self.loop_out_ms is not None else "--:--"
+        if self.loop_in_ms is None and self.loop_out_ms is None:
+            self.ui.range_label.setText("未设置区间")
+        else:
+            self.ui.range_label.setText(f"{in_text} - {out_text}")
+
+        duration = getattr(self, 'total_duration', 0)
+        if duration and self.loop_in_ms is not None and self.loop_out_ms is not None:
+            self.filmstrip.set_range(self.loop_in_ms / duration, self.loop_out_ms / duration)
+            self.start_loop_buffer()
+        else:
+            self.filmstrip.set_range(None, None)
+
+    def start_loop_buffer(self):
+        """后台把区间内的帧全部解码进内存"""
+        if not decoder_available() or not self.current_file:
+            return
+        # 与帧缓存一致：有代理时从代理解码，使用代理自己的帧索引
+        decode_path = self.proxy_file or self.current_file
+        frame_index = proxy_index(self.proxy_file) if self.proxy_file else self.frame_index
+        self.loop_builder = LoopBufferBuilder(decode_path, self.loop_in_ms, self.loop_out_ms, frame_index, parent=self)
+        self.loop_builder.progress.connect(self.on_loop_buffer_progress)
+        self.loop_builder.bufferReady.connect(self.on_loop_buffer_ready)
+        self.loop_builder.bufferFailed.connect(self.on_loop_buffer_failed)
+        self.loop_builder.finished.connect(self.loop_builder.deleteLater)
+        self.loop_builder.start()
+
+    def cancel_loop_buffer(self):
+        if self.loop_builder is not None:
+            # 不等待线程结束；迟到的结果按sender丢弃，线程结束后自行释放
+            self.loop_builder.cancel()
+            self.loop_builder = None
+
+    def on_loop_buffer_progress(self, percent):
+        if self.sender() is not self.loop_builder:
+            return
+        self.ui.range_label.setText(
+            f"{self.format_time(self.loop_in_ms)} - {self.format_time(self.loop_out_ms)}（缓冲 {percent}%）")
+
+    def on_loop_buffer_ready(self, buffer):
+        """区间缓冲完成，可以开始区间播放"""
+        if self.sender() is not self.loop_builder:
+            return
+        self.loop_builder = None
+        self.loop_player.set_buffer(buffer)
+        self.set_loop_mode(self.ui.loopMode_ComboBox.currentIndex())
+        self.ui.loop_Button.setEnabled(True)
+        self.ui.range_label.setText(
+            f"{self.format_time(self.loop_in_ms)} - {self.format_time(self.loop_out_ms)}"
+            f"（{buffer.count}帧 {buffer.width}x{buffer.height} {buffer.nbytes // (1024 * 1024)}MB）")
+
+    def on_loop_buffer_failed(self, error):
+        if self.sender() is not self.loop_builder:
+            return
+        self.loop_builder = None
+        self.ui.range_label.setText("区间缓冲失败")
+        print(f"区间缓冲失败: {error}")
+
+    def set_loop_mode(self, mode_index):
+        self.loop_player.mode = LOOP_MODE_PINGPONG if mode_index == 1 else LOOP_MODE_LOOP
+
+    def toggle_loop_playback(self, checked):
+        """开始/停止区间播放"""
+        # 洋葱皮的邻近帧来源随之改变
+        self.onion_skin.clear()
+        if checked:
+            if self.loop_player.buffer is None:
+                return
+            self.shuttle.stop()
+            # 播放器和独立进程都停下，画面只来自内存缓冲
+            self.follow_clock.stop()
+            self.seek_timer.stop()
+            self._pending_seek_ms = None
+            self._player.pause()
+            if self.engine is not None:
+                self.engine.pause()
+            self.loop_player.play()
+        else:
+            position_ms = self.loop_player.position_ms
+            self.loop_player.pause()
+            if self.loop_player.index >= 0:
+                # 退出时普通播放停在区间播放的位置
+                self.show_frame_at(position_ms)
+
+    def on_loop_frame(self, index, image):
+        """显示区间缓冲中的一帧"""
+        if not self.loop_active():
+            return
+        self.frame_view.set_frame(index, image)
+        self.video_stack.setCurrentWidget(self.frame_view)
+        position_ms = self.loop_player.position_ms
+        self.ui.slider.blockSignals(True)
+        self.ui.slider.setValue(position_ms)
+        self.ui.slider.blockSignals(False)
+        self.update_time_label(position_ms)
+        self.update_filmstrip_playhead(position_ms)
+        self.sync_video_to_max(position_ms)
+
+    # ========== 图片序列导出 ==========
+
+    def export_frame_range(self):
+        """让用户选择导出范围，返回Max帧(开始, 结束)，取消时返回None"""
+        offset = self.ui.spinBox.value()
+        ranges = {}
+        if self.loop_in_ms is not None and self.loop_out_ms is not None:
+            ranges["入出点区间"] = (self.ms_to_frames(self.loop_in_ms) - offset,
+                               self.ms_to_frames(self.loop_out_ms) - offset)
         try:
-            # 获取当前视频位置
-            video_position = self._player.position()
-            
-            # 转换为3ds Max帧
-            current_frame = self.ms_to_frames(video_position)
-            
-            # 设置3ds Max当前时间
-            rt.sliderTime = current_frame
-            
+            ranges["3ds Max动画范围"] = self.host.get_animation_range()
         except Exception as e:
-            print(f"同步到3ds Max失败: {e}")
-        finally:
-            self.is_syncing_to_max = False
+            print(f"读取3ds Max动画范围失败: {e}")
+        ranges["整段视频"] = (-offset, self.ms_to_frames(self.total_duration) - offset)
+        name, ok = QInputDialog.getItem(self, "导出序列", "导出范围:", list(ranges), 0, False)
+        if not ok:
+            return None
+        return ranges[name]
+
+    def export_sequence(self):
+        """把一段视频按Max帧号导出为图片序列；导出中再次点击则取消"""
+        if self.exporter is not None:
+            self.cancel_export()
+            return
+        if not self.current_file or not getattr(self, 'total_duration', 0):
+            return
+        frame_range = self.export_frame_range()
+        if frame_range is None:
+            return
+        fmt, ok = QInputDialog.getItem(self, "导出序列", "图片格式:", list(SEQUENCE_FORMATS), 0, False)
+        if not ok:
+            return
+        out_dir = QFileDialog.getExistingDirectory(self, "选择导出目录", str(Path(self.current_file).parent))
+        if not out_dir:
+            return
+
+        # 与Max→视频同步使用同一换算，导出的每张图正是该Max帧在视口里对照的画面
+        self.max_to_video.offset = self.ui.spinBox.value()
+        start, end = frame_range
+        if end < 0:
+            QMessageBox.warning(self, "错误", "导出范围全部在第0帧之前，图片序列按Max帧号命名，不能导出负帧")
+            return
+        # 负帧号的文件名无法与正帧号一起按名称正确排序，只导出第0帧及之后
+        start = max(0, start)
+        targets = [(frame, self.max_to_video.target_position(frame)) for frame in range(start, end + 1)]
+        # 总是从源文件按源分辨率导出，不使用代理
+        self.exporter = SequenceExporter(self.current_file, targets, out_dir, Path(self.current_file).stem,
+                                         fmt, self.frame_index, self)
+        self.exporter.progress.connect(self.on_export_progress)
+        self.exporter.exportFinished.connect(self.on_export_finished)
+        self.exporter.exportFailed.connect(self.on_export_failed)
+        self.exporter.finished.connect(self.exporter.deleteLater)
+        self.exporter.start()
+        self.ui.export_Button.setText("导出 0%")
+
+    def cancel_export(self):
+        if self.exporter is not None:
+            # 不等待线程结束；迟到的结果按sender丢弃，线程结束后自行释放
+            self.exporter.cancel()
+            self.exporter = None
+            self.ui.export_Button.setText("导出序列")
+
+    def on_export_progress(self, done, total):
+        if self.sender() is not self.exporter:
+            return
+        self.ui.export_Button.setText(f"导出 {done * 100 // max(1, total)}%")
+
+    def on_export_finished(self, out_dir, written, skipped):
+        if self.sender() is not self.exporter:
+            return
+        self.exporter = None
+        self.ui.export_Button.setText("导出序列")
+        message = f"已导出 {written} 张图片到:\n{out_dir}"
+        if skipped:
+            message += f"\n已存在而跳过 {skipped} 张"
+        QMessageBox.information(self, "导出完成", message)
+
+    def on_export_failed(self, error):
+        if self.sender() is not self.exporter:
+            return
+        self.exporter = None
+        self.ui.export_Button.setText("导出序列")
+        QMessageBox.warning(self, "错误", f"导出图片序列失败:\n{error}")
+
+    # ========== 解码帧缓存 ==========
+
+    def cache_memory(self):
+        """性能浮层显示的各缓存内存占用"""
+        memory = [("帧缓存", self.frame_cache.nbytes)]
+        if self.loop_player.buffer is not None:
+            memory.append(("区间", self.loop_player.buffer.nbytes))
+        return memory
+
+    def start_frame_cache(self, file_path):
+        """为当前视频启动后台解码线程"""
+        self.stop_frame_cache()
+        if not decoder_available():
+            return
+        try:
+            if self.proxy_file:
+                # 代理保留了源时间戳，但时间基不同，按代理自己的帧索引定位
+                decoder = VideoDecoder(self.proxy_file, frame_index=proxy_index(self.proxy_file))
+            else:
+                decoder = VideoDecoder(file_path, frame_index=self.frame_index)
+        except Exception as e:
+            print(f"无法打开解码器，帧缓存不可用: {e}")
+            return
+        try:
+            self.frame_store = FrameStore.open(file_path, decoder.width, decoder.height, decoder.frame_count,
+                                              self.proxy_file)
+        except (OSError, ValueError) as e:
+            print(f"无法打开磁盘帧仓库: {e}")
+            self.frame_store = None
+        self.prefetcher = FramePrefetcher(decoder, self.frame_cache, store=self.frame_store)
+        self.prefetcher.frameReady.connect(self.on_frame_cached)
+        self.prefetcher.start()
+
+    def stop_frame_cache(self):
+        """停止后台解码并清空缓存"""
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+            self.prefetcher = None
+        if self.frame_store is not None:
+            self.frame_store.close()
+            self.frame_store = None
+        self.frame_cache.clear()
+        self.frame_view.clear()
+        self._wanted_frame = -1
+
+    def show_frame_at(self, position_ms):
+        """显示指定位置的画面：命中缓存时直接显示，播放器的seek延后合并执行"""
+        if self.loop_active():
+            # 区间播放时只在内存缓冲内定位
+            self.loop_player.seek(self.loop_player.buffer.ms_to_index(position_ms))
+            return
+        if self.engine is not None:
+            # 由独立进程取帧，画面通过共享内存送回
+            self._engine_position_ms = position_ms
+            index = self.engine_frame_index(position_ms)
+            if perf.enabled:
+                perf.start("seek", index)
+            self.engine.show(index)
+            self.update_filmstrip_playhead(position_ms)
+            return
+        if self.prefetcher is None:
+            self._player.setPosition(position_ms)
+            return
+
+        index = self.prefetcher.decoder.ms_to_index(position_ms)
+        if perf.enabled:
+            perf.start("seek", index)
+        self._wanted_frame = index
+        self.prefetcher.set_playhead(index)
+        self._pending_seek_ms = position_ms
+        self.seek_timer.start()
+
+        self.update_filmstrip_playhead(position_ms)
+        image = self.frame_cache.get(index)
+        if perf.enabled and image is not None:
+            perf.count("cache_hit")
+        if image is None and self.frame_store is not None:
+            # 内存里没有时从磁盘仓库取，不需要解码
+            image = self.frame_store.get(index)
+            self.frame_cache.put(index, image)
+            if perf.enabled and image is not None:
+                perf.count("store_hit")
+        if image is not None:
+            self.frame_view.set_frame(index, image)
+            self.video_stack.setCurrentWidget(self.frame_view)
+            if perf.enabled:
+                perf.finish("seek", index)
+        elif perf.enabled:
+            perf.count("cache_miss")
+
+    def on_frame_cached(self, index):
+        """后台解码出正在等待的帧时立即显示"""
+        self.reference.frame_cached(index)
+        if index != self._wanted_frame:
+            if self.onion_skin.enabled and abs(index - self.frame_view.frame_index) <= self.onion_skin.count:
+                # 邻近帧刚进入缓存，补上它的残影
+                self.frame_view.refresh()
+            return
+        image = self.frame_cache.peek(index)
+        if image is not None:
+            self.frame_view.set_frame(index, image)
+            self.video_stack.setCurrentWidget(self.frame_view)
+            if perf.enabled:
+                perf.finish("seek", index)
+
+    # ========== 放大与平移 ==========
+
+    def eventFilter(self, obj, event):
+        if obj is self.videoWidget and event.type() == QEvent.Wheel and self.prefetcher is not None:
+            # 播放时在画面上滚动滚轮：暂停并切到可以放大的缓存帧画面
+            self._player.pause()
+            self.shuttle.stop()
+            self.show_frame_at(self._player.position())
+            self.frame_view.wheelEvent(event)
+            return True
+        return super().eventFilter(obj, event)
+
+    def request_roi(self, index, region, width, height):
+        """放大后缓存帧分辨率不够，从源文件解码可见区域"""
+        if not roi_available() or not self.current_file:
+            return
+        if self.roi_decoder is None:
+            self.roi_decoder = RoiDecoder(self.current_file, self.frame_index, self)
+            self.roi_decoder.roiReady.connect(self.frame_view.set_roi)
+            self.roi_decoder.roiFailed.connect(self.on_roi_failed)
+            self.roi_decoder.finished.connect(self.roi_decoder.deleteLater)
+            self.roi_decoder.start()
+        self.roi_decoder.request(index, region, width, height)
+
+    def stop_roi_decoder(self):
+        if self.roi_decoder is not None:
+            # 不等待正在进行的解码；断开信号丢弃迟到的画面，线程结束后自行释放
+            self.roi_decoder.stop()
+            detach_thread(self.roi_decoder)
+            self.roi_decoder = None
+
+    def on_roi_failed(self, error):
+        print(f"解码放大区域失败: {error}")
+        if self.roi_decoder is self.sender():
+            self.roi_decoder = None
+
+    # ========== 洋葱皮 ==========
+
+    def update_onion_skin(self, *args):
+        """读取界面上的洋葱皮设置并重新合成当前帧"""
+        self.onion_skin.enabled = self.ui.onion_CheckBox.isChecked()
+        self.onion_skin.count = self.ui.onionCount_SpinBox.value()
+        self.onion_skin.falloff = self.ui.onionFalloff_SpinBox.value()
+        self.frame_view.refresh()
+
+    def onion_neighbour(self, index):
+        """洋葱皮的邻近帧：区间播放时取自区间缓冲，否则只查帧缓存，不触发解码"""
+        if self.loop_active():
+            buffer = self.loop_player.buffer
+            return buffer.image(index) if buffer.contains(index) else None
+        if self.engine is not None:
+            # 帧缓存在独立进程里，取不到邻近帧
+            return None
+        return self.frame_cache.peek(index)
+
+    def apply_pending_seek(self):
+        """把合并后的最后一次seek交给播放器"""
+        self.seek_timer.stop()
+        if self._pending_seek_ms is not None:
+            self._player.setPosition(self._pending_seek_ms)
+            self._pending_seek_ms = None
+
+    # ========== 3ds Max 同步功能 ==========
+    
+    def sync_to_max(self):
+        """将视频时间同步到3ds Max时间轴"""
+        if not hasattr(self, 'total_duration') or self.total_duration == 0:
+            return
+        self.sync_video_to_max(self.current_position())
     
     def sync_video_to_max(self, position_ms):
-        """将指定视频位置同步到3ds Max"""
+        """将指定视频位置同步到3ds Max（交给调度器合并、限速后写入）"""
         if hasattr(self.ui, 'syncToMax_CheckBox') and not self.ui.syncToMax_CheckBox.isChecked():
             return
-            
-        try:
-            current_frame = self.ms_to_frames(position_ms)
-            rt.sliderTime = current_frame
-        except Exception as e:
-            print(f"同步视频位置到3ds Max失败: {e}")
+        self.sync_scheduler.request(self.ms_to_frames(position_ms))
     
     def on_max_time_changed(self):
         """当3ds Max时间改变时的回调函数"""
+        try:
+            self.sync_scheduler.note_max_time(self.host.get_time())
+        except Exception:
+            pass
         # 检查是否启用从3ds Max到视频的同步
-        if hasattr(self.ui, 'syncFromMax_CheckBox') and self.ui.syncFromMax_CheckBox.isChecked():
-            try:
-                current_frame = rt.sliderTime+self.ui.spinBox.value()
-
-                position_ms = self.frames_to_ms(current_frame)
-                
-                # 确保不超过视频总时长
-                if hasattr(self, 'total_duration'):
-                    position_ms = min(position_ms, self.total_duration)
-
-                # 设置视频位置
-                self._player.setPosition(position_ms)
-                self.ui.slider.setValue(position_ms)
-                self.update_time_label(position_ms)
-                self._player.pause()
-            except Exception as e:
-                print(f"从3ds Max同步到视频失败: {e}")
+        self.max_to_video.enabled = self.ui.syncFromMax_CheckBox.isChecked()
+        self.max_to_video.offset = self.ui.spinBox.value()
+        self.max_to_video.on_time_changed()
+        self.update_reference()
+    
+    # ========== Max视口参考画面 ==========
+
+    def toggle_reference(self, checked):
+        self.reference.set_enabled(checked)
+        self.update_reference(redraw=True)
+
+    def set_reference_target(self, index):
+        self.reference.set_target(REFERENCE_TARGET_PLANE if index == 1 else REFERENCE_TARGET_BACKGROUND)
+        self.update_reference(redraw=True)
+
+    def reference_frame(self, index):
+        """参考画面只取已解码的帧：先查内存缓存，再查磁盘帧仓库"""
+        image = self.frame_cache.peek(index)
+        if image is None and self.frame_store is not None:
+            image = self.frame_store.get(index)
+            self.frame_cache.put(index, image)
+        return image
+
+    def update_reference(self, redraw=False):
+        """把Max当前时间对应的帧送到视口；帧不在缓存时让后台先解码它和之后的帧"""
+        if not self.reference.enabled or self.prefetcher is None:
+            return
+        try:
+            self.max_to_video.offset = self.ui.spinBox.value()
+            position_ms = self.max_to_video.target_position(self.host.get_time())
+        except Exception as e:
+            print(f"读取3ds Max时间失败: {e}")
+            return
+        index = self.prefetcher.decoder.ms_to_index(position_ms)
+        if self._player.playbackState() != QMediaPlayer.PlayingState:
+            # 视频窗口自己没在播放时，预取跟着Max时间走
+            self.prefetcher.set_playhead(index)
+        self.reference.show(index, redraw)
+    
+    def show_max_position(self, position_ms):
+        """显示Max时间对应的视频画面"""
+        if self._player is None:
+            # 还没有打开过视频
+            return
+        if self.engine is None and not self.loop_active() and self.follow_clock.on_max_position(position_ms):
+            # 跟随模式下播放器自己在播放，只更新界面
+            self.seek_timer.stop()
+            self._pending_seek_ms = None
+            self.ui.slider.blockSignals(True)
+            self.ui.slider.setValue(position_ms)
+            self.ui.slider.blockSignals(False)
+            self.update_time_label(position_ms)
+            return
+        self.show_frame_at(position_ms)
+        self.ui.slider.setValue(position_ms)
+        self.update_time_label(position_ms)
+        self._player.pause()
     
     def set_max_start_time(self):
         """设置3ds Max动画开始时间为视频当前时间"""
         try:
-            current_frame = self.ms_to_frames(self._player.position())
-            rt.animationRange = rt.interval(current_frame, rt.animationRange.end)
+            current_frame = self.ms_to_frames(self.current_position())
+            start, end = self.host.get_animation_range()
+            self.host.set_animation_range(current_frame, end)
             QMessageBox.information(self, "成功", f"已设置开始时间为第 {current_frame} 帧")
         except Exception as e:
             QMessageBox.warning(self, "错误", f"设置开始时间失败:\n{str(e)}")
@@ -349,29 +1525,21 @@ class PlayVideo(MainWindow):
     def set_max_end_time(self):
         """设置3ds Max动画结束时间为视频当前时间"""
         try:
-            current_frame = self.ms_to_frames(self._player.position())
-            rt.animationRange = rt.interval(rt.animationRange.start, current_frame)
+            current_frame = self.ms_to_frames(self.current_position())
+            start, end = self.host.get_animation_range()
+            self.host.set_animation_range(start, current_frame)
             QMessageBox.information(self, "成功", f"已设置结束时间为第 {current_frame} 帧")
         except Exception as e:
             QMessageBox.warning(self, "错误", f"设置结束时间失败:\n{str(e)}")
     
     def auto_set_max_time_range(self):
-        """自动设置3ds Max的动画时间范围为视频时长"""
-        if not hasattr(self, 'total_duration') or self.total_duration == 0:
+        """时长一确定就把3ds Max的动画时间范围设为视频时长，每个视频只设置一次"""
+        if not getattr(self, 'total_duration', 0) or not self._range_pending:
             return
-            
-        try:
-            # 等待一下确保视频时长已加载
-            from PySide6.QtCore import QTimer
-            QTimer.singleShot(500, self._do_auto_set_time_range)
-        except:
-            pass
-    
-    def _do_auto_set_time_range(self):
-        """执行自动设置时间范围"""
+        self._range_pending = False
         try:
             total_frames = self.ms_to_frames(self.total_duration)
-            rt.animationRange = rt.interval(0, total_frames)
+            self.host.set_animation_range(0, total_frames)
             
             if hasattr(self.ui, 'autoSync_CheckBox') and self.ui.autoSync_CheckBox.isChecked():
                 QMessageBox.information(self, "自动设置", 
@@ -381,27 +1549,70 @@ class PlayVideo(MainWindow):
                                       f"时长: {self.format_time(self.total_duration)}")
         except Exception as e:
             print(f"自动设置时间范围失败: {e}")
+        self.load_progress.mark(self.current_file, LOAD_STAGE_RANGE)
 
     def closeEvent(self, event):
         """窗口关闭事件"""
-        self._player.stop()
-        self.sync_timer.stop()
+        # 在播放器停止（位置归零）之前记下播放状态
+        self.save_session()
+        self.perf_hud.set_enabled(False)
+        if self._player is not None:
+            self._player.stop()
+        self.sync_scheduler.cancel()
+        self.seek_timer.stop()
+        self.stop_frame_cache()
+        self.stop_roi_decoder()
+        self.reference.set_enabled(False)
+        self.cancel_proxy_builder()
+        self.stop_filmstrip()
+        self.stop_motion_curve()
+        self.stop_waveform()
+        self.stop_engine()
+        shutdown_pool()
+        self.cancel_loop_buffer()
+        self.cancel_export()
+        self.loop_player.pause()
+        if self.multi_angle is not None:
+            self.multi_angle.close()
+        # 窗口关闭后会被删除；还在收尾的后台线程（波形、帧索引、音频对齐等无法中途取消）不再等待，
+        # 脱离窗口运行到结束后自行释放，关闭窗口不会卡住Max
+        for worker in self.findChildren(QThread):
+            if worker.isRunning():
+                detach_thread(worker)
         
         # 移除3ds Max回调
         try:
-            # rt.callbacks.removeScripts(rt.Name('timeChanged'))
-            rt.unRegisterTimeCallback(self.on_max_time_changed)
+            self.host.unregister_time_callback(self.on_max_time_changed)
         except:
             pass
             
         super().closeEvent(event)
 
 # 主程序
-window = PlayVideo()
-# 窗口置顶
-window.setWindowFlags(window.windowFlags() | Qt.WindowStaysOnTopHint)
-# 窗口标题
-window.setWindowTitle('个人模仿秀 - 3ds Max视频同步')
-# 窗口大小
-window.resize(800, 500)  # 稍微调大窗口以容纳更多控件
-window.show()
\ No newline at end of file
+# Max里每次运行脚本都会执行到这里：已有打开着的窗口时直接把它显示到前面，
+# 解码器、缓存和已注册的时间回调都保留，不再新建播放器和回调
+# 只在作为脚本执行时运行（Max里执行脚本时__name__同样是"__main__"），被其他进程导入时不创建窗口
+if __name__ == "__main__":
+    _window_start = time.perf_counter()
+    window = find_live_window(WINDOW_OBJECT_NAME)
+    if window is not None:
+        if window.isMinimized():
+            window.showNormal()
+        window.raise_()
+        window.activateWindow()
+        _startup_phases = [("导入", (_window_start - _startup_time) * 1000), ("复用窗口", 0.0)]
+    else:
+        window = PlayVideo()
+        window.setObjectName(WINDOW_OBJECT_NAME)
+        # 关闭后释放窗口，下次运行重新创建
+        window.setAttribute(Qt.WA_DeleteOnClose)
+        # 窗口置顶
+        window.setWindowFlags(window.windowFlags() | Qt.WindowStaysOnTopHint)
+        # 窗口标题
+        window.setWindowTitle('个人模仿秀 - 3ds Max视频同步')
+        # 窗口大小
+        window.resize(800, 500)  # 稍微调大窗口以容纳更多控件
+        window.show()
+        _startup_phases = [("导入", (_window_start - _startup_time) * 1000), ("UI", window.ui_load_ms)]
+    _startup_phases.append(("总计", (time.perf_counter() - _startup_time) * 1000))
+    record_startup("PlayVideo", _startup_phases, _startup_warm)
@@ -0,0 +1,179 @@
+"""同步延迟基准测试：不需要3ds Max，用FakeHost模拟视口重绘耗时
+
+用法（任意装有PySide6的Python）：
+    python sync_benchmark.py --redraw-ms 40 --seconds 3 --video D:/test.mp4
+
+Max→视频的测试需要PyAV和一个视频文件（--video），不指定时只测视频→Max。
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PySide6.QtCore import QCoreApplication
+from Code.frame_cache import FrameCache
+from Code.frame_prefetcher import FramePrefetcher
+from Code.host import FakeHost
+from Code.sync_scheduler import MaxSyncScheduler
+from Code.time_sync import MaxToVideoSync
+from Code.video_decoder import VideoDecoder
+
+
+def percentile(values, p):
+    """p取0~100"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def report(name, latencies_ms, extra=""):
+    print(f"{name:<22} n={len(latencies_ms):<5} "
+          f"p50={percentile(latencies_ms, 50):7.1f}ms "
+          f"p90={percentile(latencies_ms, 90):7.1f}ms "
+          f"p99={percentile(latencies_ms, 99):7.1f}ms "
+          f"max={max(latencies_ms or [0]):7.1f}ms  {extra}")
+
+
+def pump(app, until):
+    """运行事件循环直到指定的perf_counter时间"""
+    while time.perf_counter() < until:
+        app.processEvents()
+        time.sleep(0.0005)
+
+
+def bench_video_to_max(app, args, workload):
+    """视频→Max：按workload产生目标帧，统计从请求到Max显示该帧（或更新的帧）的延迟"""
+    host = FakeHost(fps=args.fps, redraw_cost_ms=args.redraw_ms, jitter_ms=args.redraw_ms * 0.25)
+    requests = []  # (请求时间, 帧)
+    writes = []  # (完成时间, 对应请求的时间)
+
+    def writer(frame):
+        request_time = requests[-1][0]
+        host.set_time(frame)
+        writes.append((time.perf_counter(), request_time))
+
+    scheduler = MaxSyncScheduler(writer)
+    rng = random.Random(1)
+    frame = 0
+    rate_hz = 250 if workload == "scrub" else 60
+    start = time.perf_counter()
+    end = start + args.seconds
+    next_request = start
+    while time.perf_counter() < end:
+        now = time.perf_counter()
+        if now >= next_request:
+            if workload == "scrub":
+                # 拖动：小幅来回移动，偶尔大跳
+                frame = max(0, frame + (rng.randint(-40, 40) if rng.random() < 0.05 else rng.randint(-3, 4)))
+            else:
+                frame = int((now - start) * args.fps)
+            requests.append((now, frame))
+            scheduler.request(frame)
+            next_request += 1.0 / rate_hz
+        pump(app, min(next_request, end))
+    pump(app, time.perf_counter() + 1.0)
+
+    latencies = []
+    w = 0
+    for request_time, requested in requests:
+        while w < len(writes) and writes[w][1] < request_time:
+            w += 1
+        if w < len(writes):
+            latencies.append((writes[w][0] - request_time) * 1000)
+    report(f"video->max {workload}", latencies,
+           f"writes={scheduler.writes} coalesced={scheduler.skipped} redraw={scheduler.redraw_cost_ms:.1f}ms")
+
+
+def bench_max_to_video(app, args, workload):
+    """Max→视频：Max时间改变到对应画面进入帧缓存（可显示）的延迟
+
+    走与PlayVideo相同的路径：宿主时间回调 → MaxSyncScheduler.note_max_time → MaxToVideoSync，
+    画面取自FrameCache，未命中时由FramePrefetcher在后台解码，解码出目标帧时才算完成。
+    """
+    decoder = VideoDecoder(args.video)
+    cache = FrameCache()
+    prefetcher = FramePrefetcher(decoder, cache)
+    host = FakeHost(fps=args.fps, redraw_cost_ms=args.redraw_ms, jitter_ms=args.redraw_ms * 0.25)
+    last_frame = int(decoder.index_to_ms(max(0, decoder.frame_count - 1)) * args.fps / 1000)
+    host.set_animation_range(0, max(1, last_frame))
+    scheduler = MaxSyncScheduler(host.set_time)
+    latencies = []
+    changed_at = [0.0]
+    wanted = [None]  # (帧序号, Max时间改变的时刻)：还在等后台解码的帧
+    hits = [0]
+    dropped = [0]  # 没等到解码完成就被下一次时间改变取代的帧
+
+    def show_position(position_ms):
+        index = decoder.ms_to_index(position_ms)
+        prefetcher.set_playhead(index)
+        if wanted[0] is not None:
+            dropped[0] += 1
+        if cache.get(index) is not None:
+            hits[0] += 1
+            latencies.append((time.perf_counter() - changed_at[0]) * 1000)
+            wanted[0] = None
+        else:
+            wanted[0] = (index, changed_at[0])
+
+    def on_frame_ready(index):
+        if wanted[0] is not None and wanted[0][0] == index:
+            latencies.append((time.perf_counter() - wanted[0][1]) * 1000)
+            wanted[0] = None
+
+    sync = MaxToVideoSync(host, lambda f: int(f * 1000 / args.fps), show_position)
+
+    def on_max_time_changed():
+        scheduler.note_max_time(host.get_time())
+        sync.on_time_changed()
+
+    host.register_time_callback(on_max_time_changed)
+    prefetcher.frameReady.connect(on_frame_ready)
+    prefetcher.start()
+
+    rng = random.Random(2)
+    start = time.perf_counter()
+    end = start + args.seconds
+    try:
+        while time.perf_counter() < end:
+            changed_at[0] = time.perf_counter()
+            if workload == "scrub":
+                host.set_time(max(0, min(last_frame, host.get_time() + rng.randint(-5, 5))))
+            else:
+                host.play_step()
+            # Max播放按帧率步进；拖动按鼠标事件频率
+            pump(app, changed_at[0] + (1.0 / args.fps if workload == "playback" else 0.008))
+        pump(app, time.perf_counter() + 0.5)
+    finally:
+        prefetcher.stop()
+        decoder.close()
+    report(f"max->video {workload}", latencies, f"cache_hits={hits[0]} dropped={dropped[0]} redraws={host.redraws}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PlayVideo 同步延迟基准测试")
+    parser.add_argument("--fps", type=int, default=30, help="Max帧率")
+    parser.add_argument("--redraw-ms", type=float, default=30.0, help="模拟的视口重绘耗时")
+    parser.add_argument("--video", help="Max→视频测试使用的视频文件")
+    parser.add_argument("--seconds", type=float, default=3.0, help="每项测试时长")
+    args = parser.parse_args()
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    print(f"fps={args.fps} redraw={args.redraw_ms}ms")
+    for workload in ("scrub", "playback"):
+        bench_video_to_max(app, args, workload)
+    if not args.video:
+        print("未指定--video，跳过Max->视频测试")
+        return
+    for workload in ("scrub", "playback"):
+        bench_max_to_video(app, args, workload)
+
+
+if __name__ == "__main__":
+    main()